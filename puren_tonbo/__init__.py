@@ -1,6 +1,7 @@
 import bisect
 import datetime
 import errno
+import hashlib
 import inspect
 from io import BytesIO as FakeFile
 import json
@@ -8,13 +9,24 @@ import locale
 import logging
 import os
 import re
+import shutil
+import stat
 import sqlite3  # TODO make optional?
+import struct
 import subprocess
 import sys
 import tempfile
+import threading
+import time
 import uuid
 import zlib
 
+try:
+    import queue
+except ImportError:
+    # Python 2
+    import Queue as queue
+
 try:
     maketrans = bytearray.maketrans
 except AttributeError:
@@ -144,6 +156,7 @@ except ImportError:
 
 try:
     import whoosh  #  pip install whoosh-reloaded  -- whoosh.__version__ == (2, 7, 5)
+    import whoosh.fields
     import whoosh.filedb
     import whoosh.highlight
     import whoosh.index
@@ -222,6 +235,7 @@ log.debug(
 )
 
 IN_MEMORY = ':memory:'  # sqlite special value, also used to indicate memory for non-sqlite3
+CATALOG_COMMIT_EVERY = 100  # NoteCatalog.record_contents() commit interval inside batch_start()/batch_end()
 if whoosh:
     DEFAULT_FTS_ENGINE = 'whoosh'
 else:
@@ -264,6 +278,65 @@ class SearchCancelled(SearchException):
         return repr(self.value)
 
 
+class SearchLimits(object):
+    """Early termination limits for search(), None means no limit. Walking and decrypting
+    stops once a limit is reached, results so far are returned.
+    Thread safe. For concurrent searches use search_notes(), which applies the limits in notes_list order
+    (sharing one instance between concurrent search() calls drops hits from whichever is slowest, not the last).
+
+      * max_matches  # total hit lines (filename search and files_with_matches hits count as one)
+      * max_files_with_matches  # total files with hits
+      * deadline_seconds  # time budget, from first use. NOTE checked between files, a single (slow) decrypt is not interrupted
+
+    After searching, truncated is None if every file was searched, else the name of the limit that stopped the search.
+    """
+
+    def __init__(self, max_matches=None, max_files_with_matches=None, deadline_seconds=None):
+        self.max_matches = max_matches
+        self.max_files_with_matches = max_files_with_matches
+        self.deadline_seconds = deadline_seconds
+        self.matches = 0
+        self.files_with_matches = 0
+        self.deadline = None
+        self.truncated = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.deadline is None and self.deadline_seconds is not None:
+                self.deadline = time.time() + self.deadline_seconds
+
+    def stop_search(self):
+        """Called before searching (another) file, returns True if the search should stop (and flags truncated)"""
+        with self.lock:
+            if self.truncated is None:
+                if self.max_matches is not None and self.matches >= self.max_matches:
+                    self.truncated = 'max_matches'
+                elif self.max_files_with_matches is not None and self.files_with_matches >= self.max_files_with_matches:
+                    self.truncated = 'max_files_with_matches'
+                elif self.deadline is not None and time.time() >= self.deadline:
+                    self.truncated = 'deadline_seconds'
+            return self.truncated is not None
+
+    def add_hits(self, hit_detail):
+        """Record hit_detail (list of line hits) for a file, returns hit_detail trimmed to max_matches (empty list if no room left)"""
+        with self.lock:
+            if self.max_files_with_matches is not None and self.files_with_matches >= self.max_files_with_matches:
+                self.truncated = self.truncated or 'max_files_with_matches'
+                return []
+            if self.max_matches is not None:
+                remaining = self.max_matches - self.matches
+                if remaining <= 0:
+                    self.truncated = self.truncated or 'max_matches'
+                    return []
+                if len(hit_detail) > remaining:
+                    hit_detail = hit_detail[:remaining]
+                    self.truncated = self.truncated or 'max_matches'
+            self.matches += len(hit_detail)
+            self.files_with_matches += 1
+            return hit_detail
+
+
 """The core of the encryption/decryption API revolves around file objects, that is file-like API objects
 This differs substantially from PEP 272 - API for Block Encryption Algorithms v1.0 - https://peps.python.org/pep-0272/
 which is based on block input.
@@ -320,6 +393,31 @@ class BaseFile:
         """Encrypt"""
         raise NotImplementedError
 
+    @classmethod
+    def inspect(cls, file_object):
+        """Header-only metadata, does NOT need a key/password and does NOT decrypt (or run the KDF).
+        Returns dict, values are None when unknown/not recorded by the format:
+            version - format version
+            plaintext_size - size in bytes of decrypted/uncompressed content
+            kdf - dict of key derivation parameters, e.g. name, iterations
+            salt - bytes
+        """
+        return {
+            'description': cls.description,
+            'version': None,
+            'plaintext_size': None,
+            'kdf': None,
+            'salt': None,
+        }
+
+
+def file_object_size(file_object):
+    """Return size in bytes of seekable file_object, leaves position at start of file"""
+    file_object.seek(0, 2)  # end
+    result = file_object.tell()
+    file_object.seek(0)
+    return result
+
 
 class EncryptedFile(BaseFile):
     pass
@@ -344,6 +442,12 @@ class RawFile(BaseFile):
     def write_to(self, file_object, byte_data):
         file_object.write(byte_data)
 
+    @classmethod
+    def inspect(cls, file_object):
+        result = super(RawFile, cls).inspect(file_object)
+        result['plaintext_size'] = file_object_size(file_object)
+        return result
+
 
 class CompressedFile(BaseFile):
     description = 'Compressed file Base Class - not encrypted'
@@ -377,6 +481,17 @@ class CompressedZlib(CompressedFile):
     def write_to(self, file_object, byte_data):
         file_object.write(zlib.compress(byte_data))
 
+    @classmethod
+    def inspect(cls, file_object):
+        result = super(CompressedZlib, cls).inspect(file_object)
+        if file_object.read(2) == b'\x1f\x8b':
+            # gzip, ISIZE trailer is uncompressed size modulo 2^32
+            result['version'] = 'gzip'
+            file_object.seek(-4, 2)
+            result['plaintext_size'] = struct.unpack('<I', file_object.read(4))[0]
+        file_object.seek(0)
+        return result
+
 
 class SubstitutionCipher(EncryptedFile):
     description = '*Unsecure* Substitution Cipher Base Class - do NOT use for sensitive data, provided for testing purposes!'
@@ -408,6 +523,12 @@ class Rot13(SubstitutionCipher):
     def write_to(self, file_object, byte_data):
         file_object.write(byte_data.translate(self.substitution_table))
 
+    @classmethod
+    def inspect(cls, file_object):
+        result = super(Rot13, cls).inspect(file_object)
+        result['plaintext_size'] = file_object_size(file_object)
+        return result
+
 
 class Rot47(Rot13):
     description = 'rot-47 UNSECURE!'
@@ -454,6 +575,26 @@ class VimDecrypt(EncryptedFile):
             # TODO chain exception...
             raise PurenTonboException(info)
 
+    @classmethod
+    def inspect(cls, file_object):
+        result = super(VimDecrypt, cls).inspect(file_object)
+        header = file_object.read(12 + 8 + 8)  # magic, salt, seed
+        if header[:9] == b'VimCrypt~':
+            result['version'] = header[:12].decode('us-ascii')
+            if header[:12] == b'VimCrypt~01!':
+                header_size = 12  # zip (PKZIP traditional), no salt
+            elif header[:12] in (b'VimCrypt~02!', b'VimCrypt~03!'):
+                # stream cipher (CFB), plaintext is the same length as the ciphertext
+                header_size = len(header)
+                result['kdf'] = {'name': 'sha256', 'iterations': 1000, 'seed': header[20:28]}
+                result['salt'] = header[12:20]
+            else:
+                header_size = None
+            if header_size is not None:
+                result['plaintext_size'] = file_object_size(file_object) - header_size
+        file_object.seek(0)
+        return result
+
 
 #############################
 
@@ -826,6 +967,17 @@ class OpenSslEnc10k(EncryptedFile):
         crypted_bytes = cipher.encrypt(byte_data)
         file_object.write(crypted_bytes)
 
+    @classmethod
+    def inspect(cls, file_object):
+        result = super(OpenSslEnc10k, cls).inspect(file_object)
+        result['kdf'] = {'name': 'pbkdf2-hmac-sha256', 'iterations': 10000}
+        header = file_object.read(16)
+        if header[:8] == b'Salted__':
+            # binary (not base64) file, plaintext size is not recorded (CBC padding)
+            result['salt'] = header[8:]
+        file_object.seek(0)
+        return result
+
 
 class Jenc(EncryptedFile):
     description = 'Markor / jpencconverter pbkdf2-hmac-sha512 iterations 10000 AES-256-GCM'
@@ -1090,6 +1242,7 @@ class ZipEncryptedFileBase(EncryptedFile):
         '.aes256.zip',  # Zip file with AES-256 - Standard WinZip/7z (not the old ZipCrypto!)
         '.aeszip',  # Catch all Zip file with AES encryption of some sort
     ]
+    _kdf = {'name': 'pbkdf2-hmac-sha1', 'iterations': 1000}  # WinZip AE-1/AE-2
 
 
 class PurePyZipAES(ZipEncryptedFileBase):
@@ -1137,6 +1290,23 @@ class PurePyZipAES(ZipEncryptedFileBase):
             # raise PurenTonboException(info.message)
             raise PurenTonboException(info)
 
+    @classmethod
+    def inspect(cls, file_object):
+        result = super(PurePyZipAES, cls).inspect(file_object)
+        try:
+            header = mzipaes.parse_local_header(file_object)  # first file in zip, same as read_from()
+        except mzipaes.UnsupportedFile as info:
+            raise UnsupportedFile(info)
+        except struct.error as info:
+            raise UnsupportedFile(info)  # truncated file
+        finally:
+            file_object.seek(0)
+        result['version'] = 'AE-%d' % header['ae_version']
+        result['plaintext_size'] = header['usize']
+        result['kdf'] = dict(cls._kdf, key_bits=header['key_bits'])
+        result['salt'] = header['salt']
+        return result
+
 
 class ZipNoCompressionPurePyZipAES(PurePyZipAES):
     description = 'AES-256 ZIP AE-1 STORED (uncompressed)'
@@ -1196,6 +1366,34 @@ class ZipAES(ZipEncryptedFileBase):
             zf.setpassword(self.key)
             zf.writestr(self._filename, byte_data)  # pyzipper can take string or bytes
 
+    @classmethod
+    def inspect(cls, file_object):
+        result = super(ZipAES, cls).inspect(file_object)
+        try:
+            # central directory only, no password needed
+            with pyzipper.AESZipFile(file_object) as zf:
+                zinfo = zf.getinfo(cls._filename)
+            if getattr(zinfo, 'wz_aes_version', None):
+                # salt immediately follows the local file header
+                file_object.seek(zinfo.header_offset)
+                local_header = file_object.read(30)
+                namelen, xhlen = struct.unpack('<2H', local_header[26:30])
+                file_object.seek(namelen + xhlen, 1)
+                result['salt'] = file_object.read(4 * (zinfo.wz_aes_strength + 1))
+        except KeyError as info:
+            raise UnsupportedFile(info)
+        except Exception as info:
+            raise PurenTonboException(info)
+        finally:
+            file_object.seek(0)
+        result['plaintext_size'] = zinfo.file_size
+        if getattr(zinfo, 'wz_aes_version', None):  # WinZip AES extra field present
+            result['version'] = 'AE-%d' % zinfo.wz_aes_version
+            result['kdf'] = dict(cls._kdf, key_bits=64 * (zinfo.wz_aes_strength + 1))
+        elif zinfo.flag_bits & 0x1:
+            result['version'] = 'ZipCrypto'
+        return result
+
 
 class ZipNoCompressionAES(ZipAES):
     description = 'AES-256 ZIP AE-1 STORED (uncompressed)'
@@ -1714,6 +1912,85 @@ def grep_string(
     return results
 
 
+def casefold(text):
+    """Case fold for case insensitive comparisons, str.lower() on Python 2"""
+    try:
+        return text.casefold()
+    except AttributeError:
+        return text.lower()
+
+
+def grep_string_literal(
+    search_text,
+    search_term,
+    regex_object,
+    highlight_text_start=None,
+    highlight_text_stop=None,
+    files_with_matches=False,
+    ignore_case=False,
+):
+    """Same as grep_string() for a literal (non-regex) search_term. Candidate lines are located with str.find()
+    over the whole (case folded, if ignore_case) text, rather than running regex_object on every line;
+    regex_object (compiled from search_term) only runs on candidate lines, to confirm and highlight.
+    Much faster than a re.IGNORECASE scan, text with no hits costs one casefold() and one find().
+    """
+    if ignore_case and (
+        any(ord(c) > 127 for c in search_term) or
+        u'\u0131' in search_text or u'\u0130' in search_text
+    ):
+        # re.IGNORECASE and casefold() disagree on some characters, e.g. re treats dotless i (U+0131)
+        # and dotted I (U+0130) as equal to i/I. Only ASCII terms, against text without those, are safe for find()
+        return grep_string(search_text, regex_object, highlight_text_start, highlight_text_stop, files_with_matches=files_with_matches)
+    if ignore_case:
+        haystack, needle = casefold(search_text), casefold(search_term)
+    else:
+        haystack, needle = search_text, search_term
+    # NOTE case folding can change the length of text, but not the number of newlines, so line numbers are stable
+
+    def process_matches(match):
+        return highlight_text_start + match.group(0) + highlight_text_stop
+
+    lines = None
+    results = []
+    line_index = 0  # line containing last_pos
+    last_pos = 0
+    pos = haystack.find(needle)
+    while pos != -1:
+        line_index += haystack.count('\n', last_pos, pos)
+        line_end = haystack.find('\n', pos)
+        if line_end == -1:
+            line_end = len(haystack)
+        if lines is None:
+            lines = search_text.split('\n')
+        x = lines[line_index]
+        if regex_object.search(x):
+            if not highlight_text_start:
+                results.append((line_index + 1, x))
+            else:
+                results.append((line_index + 1, regex_object.sub(process_matches, x)))
+            if files_with_matches:
+                break  # stop after first hit
+        last_pos = line_end
+        pos = haystack.find(needle, line_end + 1)
+    return results
+
+
+def compile_search_patterns(patterns, search_term_is_a_regex=False, ignore_case=False):
+    """Single compiled regex that matches any of patterns (list of strings), i.e. an alternation,
+    so text is scanned once regardless of the number of patterns.
+    Literal (non-regex) patterns are escaped and tried longest first, so the longest of overlapping literals is highlighted.
+    """
+    if not search_term_is_a_regex:
+        patterns = [re.escape(pattern) for pattern in sorted(set(patterns), key=len, reverse=True)]
+    if len(patterns) == 1:
+        pattern = patterns[0]
+    else:
+        pattern = '|'.join('(?:%s)' % pattern for pattern in patterns)
+    if ignore_case:
+        return re.compile(pattern, re.IGNORECASE)
+    return re.compile(pattern)
+
+
 class BaseNotes(object):
     restrict_to_note_root = True  # if True do not allow access to files outside of self.note_root
 
@@ -2435,6 +2712,11 @@ def recent_files_filter(full_path, extra_params_dict=None):
 ORDER_ASCENDING = 'ascending'
 ORDER_DESCENDING = 'descending'
 
+# search() file orders
+SORT_PATH = 'path'  # directory depth first, alphabetical, i.e. recurse_notes() order
+SORT_MTIME_DESC = 'mtime-desc'  # most recently modified first
+SEARCH_SORT_ORDERS = (SORT_PATH, SORT_MTIME_DESC)
+
 
 def find_recent_files(test_path, number_of_files=20, order=ORDER_ASCENDING, ignore_folders=None):
     extra_params_dict = {
@@ -2535,6 +2817,20 @@ def recurse_notes(path_to_search, filename_filter, ignore_folders=None):
                 yield temp_filename
 
 
+def recurse_notes_by_mtime(path_to_search, filename_filter, ignore_folders=None):
+    """Same as recurse_notes() but most recently modified first, returns list
+    Walk is stat only, no file reads, so is cheap compared with decrypting/searching in the same order.
+    """
+    mtime_filenames = []
+    for filename in recurse_notes(path_to_search, filename_filter, ignore_folders=ignore_folders):
+        try:
+            mtime_filenames.append((os.stat(filename).st_mtime, filename))
+        except OSError:
+            pass  # removed during walk
+    mtime_filenames.sort(key=lambda x: (-x[0], x[1]))
+    return [filename for _, filename in mtime_filenames]
+
+
 def fake_recurse_notes(path_to_search, filename_filter):
     """Same API as recurse_notes(), returns generator
     BUT used on a single file (and ignores filename_filter)
@@ -2609,6 +2905,10 @@ class FullTextSearch:
             contents_size = len(contents)
         raise NotImplementedError()
 
+    def remove_from_index(self, filename):
+        """Remove all entries for filename, for incremental updates"""
+        raise NotImplementedError()
+
     # TODO date (size) query parameter restrictions (with ranges)
     # FIXME context_distance / snippet length parameter support needed - ideas; here as parameter, init parameter, attribute that can be changed at runtime - leaning towards the later
     def search(
@@ -2661,12 +2961,12 @@ class FullTextSearchWhoosh:
 
         # TODO line_number
         self.schema = whoosh.fields.Schema(
-            filename=whoosh.fields.TEXT(stored=True),
+            filename=whoosh.fields.ID(stored=True, unique=True),  # ID (single term) so remove_from_index() can delete by filename
             contents=whoosh.fields.TEXT(stored=True),
             contents_size=whoosh.fields.NUMERIC(stored=True),
             mtime=whoosh.fields.NUMERIC(stored=True),
         )
-        ## FIXME
+        self.ix = None
         ## FIXME
         # FIXME close index
 
@@ -2674,19 +2974,26 @@ class FullTextSearchWhoosh:
         raise NotImplementedError()
 
     def index_delete(self):
-        pass  ## FIXME
-        # raise NotImplementedError()
+        """Empty index, next create_index_start() starts from scratch"""
+        self.ix = None
+        if self.index_location != IN_MEMORY and os.path.isdir(self.index_location) and whoosh.index.exists_in(self.index_location):
+            whoosh.index.create_in(self.index_location, self.schema)  # replaces existing index
 
-    def create_index_start(self):
+    def index_open(self):
+        """Open existing index (e.g. created by another process), or create a new (empty) one"""
         index_location = self.index_location
-        if index_location == IN_MEMORY:
-            self.ix = whoosh.filedb.filestore.RamStorage().create_index(self.schema)
-        else:
-            safe_mkdir(index_location)  # TODO don't always create dir?
-            self.ix = whoosh.index.create_in(
-                index_location, self.schema
-            )  # FIXME don't recreate each time
-        self.writer = self.ix.writer()
+        if self.ix is None:
+            if index_location == IN_MEMORY:
+                self.ix = whoosh.filedb.filestore.RamStorage().create_index(self.schema)
+            elif os.path.isdir(index_location) and whoosh.index.exists_in(index_location):
+                self.ix = whoosh.index.open_dir(index_location)
+            else:
+                safe_mkdir(index_location)
+                self.ix = whoosh.index.create_in(index_location, self.schema)
+        return self.ix
+
+    def create_index_start(self):
+        self.writer = self.index_open().writer()
 
     def create_index_end(self):
         self.writer.commit()
@@ -2703,6 +3010,14 @@ class FullTextSearchWhoosh:
             filename=filename, contents=contents, contents_size=contents_size, mtime=mtime
         )  # TODO line_number
 
+    def remove_from_index(self, filename):
+        """Remove filename from index, call between create_index_start() and create_index_end()"""
+        if not isinstance(self.ix.schema['filename'], whoosh.fields.ID):
+            self.writer.cancel()  # release lock, caller falls back to a full re-index
+            self.writer = None
+            raise NotImplementedError('index created before filename was an ID field, needs a full re-index')
+        self.writer.delete_by_term('filename', filename)
+
     # TODO date (size) query parameter restrictions (with ranges)
     # FIXME context_distance / snippet length parameter support needed - ideas; here as parameter, init parameter, attribute that can be changed at runtime - leaning towards the later
     def search(
@@ -2722,7 +3037,7 @@ class FullTextSearchWhoosh:
                 tokentext = whoosh.highlight.get_text(text, token, replace)
                 return '%s%s%s' % (highlight_text_start, tokentext, highlight_text_stop)
 
-        ix = self.ix
+        ix = self.index_open()
         with ix.searcher() as searcher:
             query = whoosh.qparser.QueryParser(
                 'contents', ix.schema, termclass=whoosh.qparser.query.Variations
@@ -2799,9 +3114,9 @@ class FullTextSearchSqlite:  # TODO either inherit from or document why not inhe
         index_lines = self.index_lines
         # defaults to unicode61, TODO test with options, also ascii
         # TODO check out trigram
-        ddl_sql = "CREATE VIRTUAL TABLE note USING fts5(filename, contents, size, tokenize='porter')"  # TODO mtime/date/timestamp unindexed (https://www.sqlite.org/fts5.html#the_unindexed_column_option)
+        ddl_sql = "CREATE VIRTUAL TABLE IF NOT EXISTS note USING fts5(filename, contents, size, tokenize='porter')"  # TODO mtime/date/timestamp unindexed (https://www.sqlite.org/fts5.html#the_unindexed_column_option)
         if index_lines:
-            ddl_sql = "CREATE VIRTUAL TABLE note USING fts5(filename, contents, size, line_number, tokenize='porter')"  # TODO mtime/date/timestamp unindexed (https://www.sqlite.org/fts5.html#the_unindexed_column_option)
+            ddl_sql = "CREATE VIRTUAL TABLE IF NOT EXISTS note USING fts5(filename, contents, size, line_number, tokenize='porter')"  # TODO mtime/date/timestamp unindexed (https://www.sqlite.org/fts5.html#the_unindexed_column_option)
 
         cur.execute(ddl_sql)
         # Checkout https://www.sqlite.org/fts5.html#prefix_indexes
@@ -2828,6 +3143,11 @@ class FullTextSearchSqlite:  # TODO either inherit from or document why not inhe
                 (filename, contents, contents_size),
             )
 
+    def remove_from_index(self, filename):
+        """Remove all entries for filename (e.g. before re-adding a changed file), or if a directory everything under it"""
+        prefix = os.path.join(filename, '')
+        self.cursor.execute("""DELETE FROM note WHERE filename = ? OR substr(filename, 1, ?) = ?""", (filename, len(prefix), prefix))
+
     def search(
         self,
         search_term,
@@ -2948,13 +3268,298 @@ class FullTextSearchSqlite:  # TODO either inherit from or document why not inhe
             raise SearchException(str(info))
 
 
+##############################
+
+# Note metadata catalog, for listings (ls, recent, find) without walking and stat'ing the whole tree
+
+
+class NoteCatalog:
+    """Persistent (SQLite) catalog of note metadata for one note root; path, handler, size, mtime and,
+    where known (i.e. the note has been read), detected encoding, title (first line) and sha256 of the plain text.
+
+    refresh() is incremental, only directories whose mtime changed since the last refresh are
+    listed and their files stat'ed. NOTE in-place edits (rather than write to temp file and rename,
+    as Puren Tonbo and most editors do) do not change the directory mtime, use refresh(full=True) to pick those up.
+
+    filenames are relative to note_root, directories are not included, ignore_folders are skipped.
+    """
+    def __init__(self, note_root, index_location=IN_MEMORY, ignore_folders=None):
+        self.note_root = os.path.abspath(note_root)
+        self.index_location = index_location
+        self.ignore_folders = ignore_folders or ['.git']
+        self.lock = threading.RLock()  # connection is shared between threads, e.g. ptwebcp
+        self.batch_depth = 0  # record_contents() only commits every CATALOG_COMMIT_EVERY records when > 0
+        self.pending_records = 0
+        self.db = sqlite3.connect(index_location, check_same_thread=False)
+        cur = self.db.cursor()
+        cur.execute("""CREATE TABLE IF NOT EXISTS catalog_info (key TEXT PRIMARY KEY, value TEXT)""")
+        cur.execute("""CREATE TABLE IF NOT EXISTS catalog_directory (dirname TEXT PRIMARY KEY, parent TEXT, mtime REAL)""")
+        cur.execute("""CREATE TABLE IF NOT EXISTS catalog_note (
+                            filename TEXT PRIMARY KEY,
+                            dirname TEXT,
+                            name TEXT,
+                            handler TEXT,
+                            size INTEGER,
+                            mtime REAL,
+                            encoding TEXT,
+                            title TEXT,
+                            plaintext_sha256 TEXT)""")
+        cur.execute("""CREATE INDEX IF NOT EXISTS catalog_directory_parent ON catalog_directory(parent)""")
+        cur.execute("""CREATE INDEX IF NOT EXISTS catalog_note_dirname ON catalog_note(dirname)""")
+        cur.execute("""CREATE INDEX IF NOT EXISTS catalog_note_mtime ON catalog_note(mtime)""")
+        cur.execute("""SELECT value FROM catalog_info WHERE key = 'note_root'""")
+        row = cur.fetchone()
+        if row is None or row[0] != self.note_root:
+            # new, or a catalog for a different tree
+            self.catalog_clear()
+            cur.execute("""INSERT OR REPLACE INTO catalog_info (key, value) VALUES ('note_root', ?)""", (self.note_root,))
+        self.db.commit()
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+    def commit(self):
+        """Commit any outstanding record_contents() updates"""
+        with self.lock:
+            self.db.commit()
+            self.pending_records = 0
+
+    def batch_start(self):
+        """Defer record_contents() commits (e.g. for the duration of a search) until batch_end(),
+        committing every CATALOG_COMMIT_EVERY records along the way. Calls nest"""
+        with self.lock:
+            self.batch_depth += 1
+
+    def batch_end(self):
+        with self.lock:
+            self.batch_depth -= 1
+            if self.batch_depth <= 0:
+                self.batch_depth = 0
+                if self.pending_records:
+                    self.commit()
+
+    def catalog_clear(self):
+        with self.lock:
+            cur = self.db.cursor()
+            cur.execute("""DELETE FROM catalog_directory""")
+            cur.execute("""DELETE FROM catalog_note""")
+            self.commit()
+
+    def native_full_path(self, filename):
+        if filename:
+            return os.path.join(self.note_root, filename)
+        return self.note_root
+
+    def refresh(self, full=False):
+        """Bring the catalog up to date with the file system.
+        full=True re-lists every directory (and stats every file) regardless of directory mtime.
+        """
+        scan_start = time.time()
+        with self.lock:
+            cur = self.db.cursor()
+            stack = ['']  # relative directory names, '' is note_root
+            while stack:
+                dirname = stack.pop()
+                try:
+                    dir_mtime = os.stat(self.native_full_path(dirname)).st_mtime
+                except OSError:
+                    self._remove_directory(cur, dirname)
+                    continue
+                cur.execute("""SELECT mtime FROM catalog_directory WHERE dirname = ?""", (dirname,))
+                row = cur.fetchone()
+                if not full and row is not None and row[0] == dir_mtime:
+                    cur.execute("""SELECT dirname FROM catalog_directory WHERE parent = ?""", (dirname,))
+                    stack.extend(subdir for (subdir,) in cur.fetchall())
+                    continue
+                subdirs = self._scan_directory(cur, dirname)
+                if dir_mtime >= scan_start - 2:
+                    # may be modified again within the file system timestamp resolution, do not trust, rescan next time
+                    dir_mtime = None
+                cur.execute("""INSERT OR REPLACE INTO catalog_directory (dirname, parent, mtime) VALUES (?, ?, ?)""", (dirname, os.path.dirname(dirname) if dirname else None, dir_mtime))
+                stack.extend(subdirs)
+            self.commit()
+
+    def invalidate(self, filenames):
+        """Mark the directories containing (absolute) filenames, and any directories in filenames, as changed
+        so the next refresh() rescans them. For change notifications (e.g. puren_tonbo.watcher), this also picks up
+        in-place edits that do not change the directory mtime.
+        """
+        abs_ignore_path = os.path.join(self.note_root, '')
+        with self.lock:
+            cur = self.db.cursor()
+            for filename in filenames:
+                filename = os.path.abspath(filename)
+                if filename == self.note_root:
+                    filename = ''
+                elif filename.startswith(abs_ignore_path):
+                    filename = filename[len(abs_ignore_path):]
+                else:
+                    continue  # not in this tree
+                for dirname in (filename, os.path.dirname(filename)):
+                    cur.execute("""UPDATE catalog_directory SET mtime = NULL WHERE dirname = ?""", (dirname,))
+            self.commit()
+
+    def _scan_directory(self, cur, dirname):
+        """Update catalog entries for files in (relative) dirname, returns list of (relative) sub directories"""
+        dir_path = self.native_full_path(dirname)
+        subdirs = []
+        files = {}
+        for name in os.listdir(dir_path):
+            full_path = os.path.join(dir_path, name)
+            try:
+                stat_info = os.stat(full_path)
+            except OSError:
+                continue  # e.g. dangling symlink, or removed since listdir()
+            if stat.S_ISDIR(stat_info.st_mode):
+                if name not in self.ignore_folders:
+                    subdirs.append(os.path.join(dirname, name))
+            elif stat.S_ISREG(stat_info.st_mode):
+                files[os.path.join(dirname, name)] = (name, stat_info)
+
+        cur.execute("""SELECT filename, size, mtime FROM catalog_note WHERE dirname = ?""", (dirname,))
+        existing = dict((filename, (size, mtime)) for filename, size, mtime in cur.fetchall())
+        for filename, (name, stat_info) in files.items():
+            if existing.get(filename) == (stat_info.st_size, stat_info.st_mtime):
+                continue
+            try:
+                handler_name = filename2handler(name).__name__
+            except UnsupportedFile:
+                handler_name = None
+            # new or changed, content derived metadata is no longer known
+            cur.execute("""INSERT OR REPLACE INTO catalog_note (filename, dirname, name, handler, size, mtime, encoding, title, plaintext_sha256)
+                                VALUES (?, ?, ?, ?, ?, ?, NULL, NULL, NULL)""",
+                        (filename, dirname, name, handler_name, stat_info.st_size, stat_info.st_mtime))
+        for filename in existing:
+            if filename not in files:
+                cur.execute("""DELETE FROM catalog_note WHERE filename = ?""", (filename,))
+
+        cur.execute("""SELECT dirname FROM catalog_directory WHERE parent = ?""", (dirname,))
+        for (subdir,) in cur.fetchall():
+            if subdir not in subdirs:
+                self._remove_directory(cur, subdir)
+        return subdirs
+
+    def _remove_directory(self, cur, dirname):
+        """Remove directory, and everything under it, from catalog"""
+        prefix = os.path.join(dirname, '')
+        cur.execute("""DELETE FROM catalog_directory WHERE dirname = ? OR substr(dirname, 1, ?) = ?""", (dirname, len(prefix), prefix))
+        cur.execute("""DELETE FROM catalog_note WHERE dirname = ? OR substr(dirname, 1, ?) = ?""", (dirname, len(prefix), prefix))
+
+    def record_contents(self, filename, plain_bytes, note_encoding='utf-8'):
+        """Record content derived metadata (encoding, title and sha256) for relative filename, if not already known
+        @plain_bytes decrypted contents
+        NOTE the catalog database is not encrypted, content derived metadata is only recorded for
+        plain text (RawFile) notes, unless the catalog is IN_MEMORY"""
+        with self.lock:
+            cur = self.db.cursor()
+            cur.execute("""SELECT handler, plaintext_sha256 FROM catalog_note WHERE filename = ?""", (filename,))
+            row = cur.fetchone()
+            if row is None or row[1] is not None:
+                return  # not in catalog (yet), or already known
+            if row[0] != RawFile.__name__ and self.index_location != IN_MEMORY:
+                return  # do not write (hints of) plain text of encrypted notes to disk in the clear
+            if isinstance(note_encoding, basestring):
+                note_encoding = [note_encoding]
+            detected_encoding, title = None, None
+            for encoding in note_encoding:
+                try:
+                    title = plain_bytes.decode(encoding)
+                    detected_encoding = encoding
+                    break
+                except UnicodeDecodeError:
+                    pass  # try next
+            if title is not None:
+                title = title.lstrip().split('\n', 1)[0].strip()
+            cur.execute("""UPDATE catalog_note SET encoding = ?, title = ?, plaintext_sha256 = ? WHERE filename = ?""",
+                        (detected_encoding, title, hashlib.sha256(plain_bytes).hexdigest(), filename))
+            self.pending_records += 1
+            if not self.batch_depth or self.pending_records >= CATALOG_COMMIT_EVERY:
+                self.commit()
+
+    def note_info(self, filename):
+        """Returns dict of catalog metadata for relative filename, or None if not in catalog"""
+        with self.lock:
+            cur = self.db.cursor()
+            cur.execute("""SELECT filename, handler, size, mtime, encoding, title, plaintext_sha256 FROM catalog_note WHERE filename = ?""", (filename,))
+            row = cur.fetchone()
+        if row is None:
+            return None
+        return dict(zip(('filename', 'handler', 'size', 'mtime', 'encoding', 'title', 'plaintext_sha256'), row))
+
+    def notes(self, filename_filter=any_filename_filter, sort=SORT_PATH):
+        """Iterator of (absolute) filenames, ordered by directory name then filename.
+        Within a directory this is the same order as recurse_notes(), but directories are in sorted order
+        rather than the os.walk() (depth first, directory listing) order of recurse_notes().
+        sort=SORT_MTIME_DESC for most recently modified first, same as recurse_notes_by_mtime()"""
+        with self.lock:
+            cur = self.db.cursor()
+            if sort == SORT_MTIME_DESC:
+                cur.execute("""SELECT filename, name FROM catalog_note ORDER BY mtime DESC, filename""")
+            else:
+                cur.execute("""SELECT filename, name FROM catalog_note ORDER BY dirname, name""")
+            rows = cur.fetchall()
+        for filename, name in rows:
+            if filename_filter(name):
+                yield self.native_full_path(filename)
+
+    def recent(self, number_of_files=20, order=ORDER_ASCENDING):
+        """Iterator of (absolute) filenames, the number_of_files most recently modified, same as find_recent_files()"""
+        with self.lock:
+            cur = self.db.cursor()
+            cur.execute("""SELECT filename FROM catalog_note ORDER BY CAST(mtime AS INTEGER) DESC, filename DESC LIMIT ?""", (number_of_files,))
+            rows = cur.fetchall()
+        if ORDER_ASCENDING == order:
+            rows.reverse()
+        for (filename,) in rows:
+            yield self.native_full_path(filename)
+
+    def directory_contents(self, sub_dir='', filename_filter=None):
+        """Returns tuple (list of directories, list of files) in relative @sub_dir, same as directory_contents()"""
+        filename_filter = filename_filter or supported_filename_filter
+        sub_dir = sub_dir or ''
+        with self.lock:
+            cur = self.db.cursor()
+            cur.execute("""SELECT dirname FROM catalog_directory WHERE parent = ? ORDER BY dirname""", (sub_dir,))
+            dir_list = [os.path.basename(subdir) for (subdir,) in cur.fetchall()]
+            cur.execute("""SELECT name FROM catalog_note WHERE dirname = ? ORDER BY name""", (sub_dir,))
+            file_list = [name for (name,) in cur.fetchall() if filename_filter(name)]
+        return dir_list, file_list
+
+    def unsupported_files(self, order=ORDER_ASCENDING, ignore_files=None):
+        """Iterator of (absolute) filenames with no handler, same as find_unsupported_files()"""
+        ignore_files = ignore_files or []
+        with self.lock:
+            cur = self.db.cursor()
+            cur.execute("""SELECT filename FROM catalog_note WHERE handler IS NULL ORDER BY dirname, name""")
+            rows = cur.fetchall()
+        if ORDER_DESCENDING == order:
+            rows.reverse()
+        for (filename,) in rows:
+            if not filename.endswith(tuple(ignore_files)):
+                yield self.native_full_path(filename)
+
+
+def catalog_location_for_root(catalog_location, note_root):
+    """Catalog pathname for one of multiple note roots sharing a single config 'catalog' entry.
+    A catalog only holds one note root, so each root gets its own database, named after a hash of the root.
+    """
+    if not catalog_location or catalog_location == IN_MEMORY:
+        return catalog_location
+    base, extension = os.path.splitext(catalog_location)
+    root_hash = hashlib.sha1(os.path.abspath(note_root).encode('utf-8')).hexdigest()[:8]
+    return '%s_%s%s' % (base, root_hash, extension)
+
+
 ##############################
 
 
 class FileSystemNotes(BaseNotes):
     """PyTombo notes on local file system, just like original Windows Tombo"""
 
-    def __init__(self, note_root, note_encoding=None, fts_options=None):
+    def __init__(self, note_root, note_encoding=None, fts_options=None, catalog_location=None, ignore_folders=None):
+        """catalog_location - optional NoteCatalog (SQLite) database for listings, pathname or IN_MEMORY. None to always walk the file system
+        """
         note_root = self.unicode_path(note_root)  # either a file or a directory of files
         self.note_root = os.path.abspath(note_root)
         self.abs_ignore_path = os.path.join(
@@ -2975,6 +3580,9 @@ class FileSystemNotes(BaseNotes):
             fts_class = None
         self.fts_class = fts_class
         self.fts_instance = None
+        self.catalog = None
+        if catalog_location and os.path.isdir(self.note_root):
+            self.catalog = NoteCatalog(self.note_root, catalog_location, ignore_folders=ignore_folders)
 
     def abspath2relative(self, input_path):
         """validate absolute native path, return relative path with with (leading) self.note_root removed.
@@ -3020,6 +3628,9 @@ class FileSystemNotes(BaseNotes):
     ):
         """Recursive Tombo note lister for recently updated/modified files.
         Iterator of files in @sub_dir"""
+        if self.catalog:
+            self.catalog.refresh()
+            return self.catalog.recent(number_of_files=number_of_files, order=order)
         return find_recent_files(
             self.note_root,
             number_of_files=number_of_files,
@@ -3030,8 +3641,26 @@ class FileSystemNotes(BaseNotes):
     def recurse_notes(self, sub_dir=None, filename_filter=any_filename_filter):
         """Recursive Tombo note lister.
         Iterator of files in @sub_dir"""
+        if self.catalog:
+            self.catalog.refresh()
+            return self.catalog.notes(filename_filter)
         return recurse_notes(self.note_root, filename_filter)
 
+    def recurse_notes_by_mtime(self, sub_dir=None, filename_filter=any_filename_filter):
+        """Recursive Tombo note lister, most recently modified first.
+        Iterator of files in @sub_dir"""
+        if self.catalog:
+            self.catalog.refresh()
+            return self.catalog.notes(filename_filter, sort=SORT_MTIME_DESC)
+        return recurse_notes_by_mtime(self.note_root, filename_filter)
+
+    def unsupported_notes(self, order=ORDER_ASCENDING, ignore_files=None, ignore_folders=None):
+        """Recursive lister of files not supported by Puren Tonbo, see find_unsupported_files()"""
+        if self.catalog:
+            self.catalog.refresh()
+            return self.catalog.unsupported_files(order=order, ignore_files=ignore_files)
+        return find_unsupported_files(self.note_root, order=order, ignore_files=ignore_files, ignore_folders=ignore_folders)
+
     def directory_contents(self, sub_dir=None):
         """Simple non-recursive Tombo note lister.
         Returns tuple (list of directories, list of files) in @sub_dir"""
@@ -3039,8 +3668,38 @@ class FileSystemNotes(BaseNotes):
             sub_dir = self.native_full_path(sub_dir)  # see if path is valid, get native path
         else:
             sub_dir = self.note_root
+        if self.catalog and os.path.isdir(sub_dir):
+            self.catalog.refresh()
+            return self.catalog.directory_contents(self.abspath2relative(sub_dir).rstrip(os.sep))
         return directory_contents(dirname=sub_dir)
 
+    def search_recurse_notes_func(self, sort=None):
+        """Return note lister used by search(), note_root may be a single file
+        sort is one of SEARCH_SORT_ORDERS, None means SORT_PATH"""
+        if os.path.isfile(self.note_root):
+            return fake_recurse_notes
+        if sort == SORT_MTIME_DESC:
+            return self.recurse_notes_by_mtime
+        return self.recurse_notes
+
+    def candidate_notes_func(self, candidate_files, sort=None):
+        """Return note lister for search() that only lists candidate_files (relative or absolute filenames),
+        rather than walking note_root. Same API as search_recurse_notes_func() result"""
+        def candidate_notes(path_to_search, filename_filter):
+            filenames = []
+            seen = set()
+            for filename in candidate_files:
+                filename = os.path.abspath(os.path.join(self.note_root, self.unicode_path(filename)))  # absolute filenames unchanged by join
+                if filename in seen:
+                    continue
+                seen.add(filename)
+                if filename.startswith(self.abs_ignore_path) and filename_filter(filename) and os.path.isfile(filename):
+                    filenames.append(filename)
+            if sort == SORT_MTIME_DESC:
+                filenames.sort(key=lambda x: -os.path.getmtime(x))
+            return filenames
+        return candidate_notes
+
     def fts_search(self, s, highlight_text_start=None, highlight_text_stop=None):  # FIXME API
         if self.fts_instance:
             fts_instance = self.fts_instance
@@ -3084,6 +3743,25 @@ class FileSystemNotes(BaseNotes):
         else:
             is_note_filename_filter = plaintext_filename_filter
 
+        fts_instance = self.fts_instance_get()
+        fts_instance.index_delete()
+        fts_instance.create_index_start()
+        if self.catalog:
+            self.catalog.batch_start()
+        try:
+            for tmp_filename in recurse_notes_func(search_path, is_note_filename_filter):
+                if verbose:
+                    # TODO use logger instead of print? re-use above?
+                    print('FTS index: %s' % (self.abspath2relative(tmp_filename),))
+                self.fts_add_note(fts_instance, tmp_filename, get_password_callback=get_password_callback)
+        finally:
+            if self.catalog:
+                self.catalog.batch_end()
+
+        fts_instance.create_index_end()
+
+    def fts_instance_get(self):
+        """Returns (and stores) the full text search instance, creating it from self.fts_options if needed"""
         # FIXME store constructed
         if self.fts_instance:
             fts_instance = self.fts_instance
@@ -3098,42 +3776,61 @@ class FileSystemNotes(BaseNotes):
                 *args, **kwargs
             )  # note if missing args entries in fts config will see errors like; TypeError: FullTextSearchWhoosh.__init__() missing 1 required positional argument: 'index_location'
         self.fts_instance = fts_instance
-        fts_instance.index_delete()
-        fts_instance.create_index_start()
+        return fts_instance
+
+    def fts_add_note(self, fts_instance, tmp_filename, get_password_callback=None, ignore_unsupported_filetypes=True):
+        """Add (absolute) tmp_filename to fts_instance index, see fts_index()"""
         index_lines = fts_instance.index_lines
-        ignore_unsupported_filetypes = True
-        for tmp_filename in recurse_notes_func(search_path, is_note_filename_filter):
-            filename = self.abspath2relative(tmp_filename)
-            log.debug('index %r', filename)
-            log.info('index %s', filename)
-            if verbose:
-                # TODO use logger instead of print? re-use above?
-                print('FTS index: %s' % (filename,))
-            try:
-                contents = self.note_contents(
-                    filename, get_pass=get_password_callback, dos_newlines=True
-                )
-                # TODO contents_size, mtime
-                # stored_filename = filename  # relative
-                stored_filename = tmp_filename  # absolute
-                if not index_lines:
-                    fts_instance.add_to_index(stored_filename, contents=contents)
-                else:
-                    for line_number, line in enumerate(contents.split('\n')):
-                        line = line.strip()
-                        if line:
-                            fts_instance.add_to_index(
-                                stored_filename, contents=line, line_number=line_number
-                            )
-            except UnsupportedFile as error_info:
-                # TODO - what!? options; ignore, raise, treat as RawFile type
-                log.warning('UnsupportedFile Ignored %r - reason %r', filename, error_info)
-                if ignore_unsupported_filetypes:
-                    continue
-                else:
-                    log.error('UnsupportedFile %r', filename)  # todo exception trace?
-                    raise
+        filename = self.abspath2relative(tmp_filename)
+        log.debug('index %r', filename)
+        log.info('index %s', filename)
+        try:
+            contents = self.note_contents(
+                filename, get_pass=get_password_callback, dos_newlines=True
+            )
+            # TODO contents_size, mtime
+            # stored_filename = filename  # relative
+            stored_filename = tmp_filename  # absolute
+            if not index_lines:
+                fts_instance.add_to_index(stored_filename, contents=contents)
+            else:
+                for line_number, line in enumerate(contents.split('\n')):
+                    line = line.strip()
+                    if line:
+                        fts_instance.add_to_index(
+                            stored_filename, contents=line, line_number=line_number
+                        )
+        except UnsupportedFile as error_info:
+            # TODO - what!? options; ignore, raise, treat as RawFile type
+            log.warning('UnsupportedFile Ignored %r - reason %r', filename, error_info)
+            if not ignore_unsupported_filetypes:
+                log.error('UnsupportedFile %r', filename)  # todo exception trace?
+                raise
 
+    def fts_update(self, filenames, get_password_callback=None, verbose=False):
+        """Incrementally update full text search index for (absolute) filenames that were added, changed or removed.
+        Same filename filtering as fts_index(). Engines without incremental update support get a full fts_index().
+        Files that can not be read (e.g. bad password, corrupt or half written) are logged and skipped,
+        they are picked up again on their next change.
+        """
+        if get_password_callback:
+            is_note_filename_filter = supported_filename_filter
+        else:
+            is_note_filename_filter = plaintext_filename_filter
+        fts_instance = self.fts_instance_get()
+        try:
+            fts_instance.create_index_start()  # ensure index exists
+            for tmp_filename in filenames:
+                fts_instance.remove_from_index(tmp_filename)
+                if os.path.isfile(tmp_filename) and is_note_filename_filter(os.path.basename(tmp_filename)):
+                    if verbose:
+                        print('FTS update: %s' % (self.abspath2relative(tmp_filename),))
+                    try:
+                        self.fts_add_note(fts_instance, tmp_filename, get_password_callback=get_password_callback)
+                    except (PurenTonboException, IOError, OSError) as error_info:
+                        log.warning('FTS update skipped %r - reason %r', tmp_filename, error_info)
+        except NotImplementedError:
+            return self.fts_index(get_password_callback=get_password_callback, verbose=verbose)
         fts_instance.create_index_end()
 
     # TODO remove (or depreicate) search_term_is_a_regex and replace with search_type=(plain, regex, fts)
@@ -3152,6 +3849,11 @@ class FileSystemNotes(BaseNotes):
         progess_callback=None,
         highlight_text_start=None,
         highlight_text_stop=None,
+        sort=None,
+        limits=None,
+        candidate_files=None,
+        all_of=None,
+        none_of=None,
     ):
         """search note directory, grep/regex like actualy an iterator
 
@@ -3168,6 +3870,14 @@ class FileSystemNotes(BaseNotes):
           * files_with_matches=False  # only display filename, do not include file content matches, just filenames in results
           * highlight_text_start=None  # (ANSI escape) characters to prefix search start
           * highlight_text_stop=None  # (ANSI escape) characters to prefix search end/stop
+          * sort=None  # order files are searched (and results returned) in, one of SEARCH_SORT_ORDERS, None means SORT_PATH. SORT_MTIME_DESC gets recent hits first
+          * limits=None  # SearchLimits instance, stop early on max hits/files or time budget. Check limits.truncated afterwards
+          * candidate_files=None  # only search these filenames (relative to note_root, or absolute), e.g. previous results to refine. Filenames outside of note_root are ignored
+          * all_of=None  # list of patterns, files must contain every one (on any line)
+          * none_of=None  # list of patterns, files must contain none of them
+
+        search_term may be a list of patterns, files containing any of them match. Matching lines are
+        those with any search_term or all_of pattern. Each file is read/decrypted once whatever the number of patterns.
 
         """
         # print('get_password_callback %r' % get_password_callback)
@@ -3177,12 +3887,31 @@ class FileSystemNotes(BaseNotes):
         if (highlight_text_start or highlight_text_stop) and None in (highlight_text_start or highlight_text_stop):
             raise SearchException('highlight_text_start and highlight_text_stop need to both be set or both not-set %r %r' % (highlight_text_start, highlight_text_stop))
         """
-        if not search_term_is_a_regex:
-            search_term = re.escape(search_term)
-        if ignore_case:
-            regex_object = re.compile(search_term, re.IGNORECASE)
+        if isinstance(search_term, (list, tuple)):
+            any_of = list(search_term)
         else:
-            regex_object = re.compile(search_term)
+            any_of = [search_term] if search_term else []
+        all_of = list(all_of or [])
+        if not any_of and not all_of:
+            raise SearchException('missing search term')
+        regex_object = compile_search_patterns(any_of + all_of, search_term_is_a_regex=search_term_is_a_regex, ignore_case=ignore_case)  # line matches and highlighting
+        literal_search_term = None  # single literal, use str.find() fast path rather than regex for lines
+        if not search_term_is_a_regex and len(any_of + all_of) == 1:
+            literal_search_term = (any_of + all_of)[0]
+        file_level_regexes = []  # (regex, required) all must be satisfied for a file to match
+        if all_of and any_of:
+            file_level_regexes.append((compile_search_patterns(any_of, search_term_is_a_regex=search_term_is_a_regex, ignore_case=ignore_case), True))
+        for pattern in all_of:
+            file_level_regexes.append((compile_search_patterns([pattern], search_term_is_a_regex=search_term_is_a_regex, ignore_case=ignore_case), True))
+        if none_of:
+            file_level_regexes.append((compile_search_patterns(none_of, search_term_is_a_regex=search_term_is_a_regex, ignore_case=ignore_case), False))
+
+        def file_level_match(text):
+            for file_regex, required in file_level_regexes:
+                if bool(file_regex.search(text)) != required:
+                    return False
+            return True
+
         filename_filter_str = None
         if find_only_filename:
             filename_filter_str = regex_object
@@ -3195,59 +3924,89 @@ class FileSystemNotes(BaseNotes):
         else:
             # plain text only, right now this is hard coded
             is_note_filename_filter = plaintext_filename_filter
-        if os.path.isfile(search_path):
-            recurse_notes_func = fake_recurse_notes
-        else:
-            recurse_notes_func = self.recurse_notes
+        if sort not in (None,) + SEARCH_SORT_ORDERS:
+            raise SearchException('unsupported sort order %r' % (sort,))
+        recurse_notes_func = self.search_recurse_notes_func(sort=sort)
+        if candidate_files is not None and recurse_notes_func != fake_recurse_notes:
+            recurse_notes_func = self.candidate_notes_func(candidate_files, sort=sort)
         ignore_unsupported_filetypes = True
         # ignore_unsupported_filetypes = False  # original behavior
-        for tmp_filename in recurse_notes_func(search_path, is_note_filename_filter):
-            if recurse_notes_func == fake_recurse_notes:
-                filename = tmp_filename  # already absolute?  TODO check abspath2relative() - could sanity check already absoloute?
-            else:
-                filename = self.abspath2relative(tmp_filename)
-            if progess_callback:
-                progess_callback(filename=x)
-            if filename_filter_str:
-                if regex_object.search(filename):
-                    yield (filename, [(1, 'FILENAME SEARCH HIT\n')])
-            include_contents = True  # possible override to include line matches but ONLY doing that for filename matches
-            include_contents = False
-            ## TODO decide what to do with include_contents - default or make a parameter
-            if not filename_filter_str or include_contents:
-                # import pdb ; pdb.set_trace()
-                try:
-                    note_text = self.note_contents(
-                        filename, get_pass=get_password_callback, dos_newlines=True
-                    )  # FIXME determine what to do about dos_newlines (rename?)
-                except UnsupportedFile as error_info:
-                    # TODO - what!? options; ignore, raise, treat as RawFile type
-                    log.warning('UnsupportedFile Ignored %r - reason %r', filename, error_info)
-                    if ignore_unsupported_filetypes:
-                        pass
-                        note_text = ''
-                        continue
-                    else:
-                        log.error('UnsupportedFile %r', filename)  # todo exception trace?
+        if limits:
+            limits.start()
+        if self.catalog:
+            self.catalog.batch_start()  # one catalog commit per batch of notes read, rather than per note
+        try:
+            for tmp_filename in recurse_notes_func(search_path, is_note_filename_filter):
+                if limits and limits.stop_search():
+                    break
+                if recurse_notes_func == fake_recurse_notes:
+                    filename = tmp_filename  # already absolute?  TODO check abspath2relative() - could sanity check already absoloute?
+                else:
+                    filename = self.abspath2relative(tmp_filename)
+                if progess_callback:
+                    progess_callback(filename=filename)
+                if filename_filter_str:
+                    if regex_object.search(filename) and file_level_match(filename):
+                        search_res = [(1, 'FILENAME SEARCH HIT\n')]
+                        if limits:
+                            search_res = limits.add_hits(search_res)
+                        if search_res:
+                            yield (filename, search_res)
+                include_contents = True  # possible override to include line matches but ONLY doing that for filename matches
+                include_contents = False
+                ## TODO decide what to do with include_contents - default or make a parameter
+                if not filename_filter_str or include_contents:
+                    # import pdb ; pdb.set_trace()
+                    try:
+                        note_text = self.note_contents(
+                            filename, get_pass=get_password_callback, dos_newlines=True
+                        )  # FIXME determine what to do about dos_newlines (rename?)
+                    except UnsupportedFile as error_info:
+                        # TODO - what!? options; ignore, raise, treat as RawFile type
+                        log.warning('UnsupportedFile Ignored %r - reason %r', filename, error_info)
+                        if ignore_unsupported_filetypes:
+                            pass
+                            note_text = ''
+                            continue
+                        else:
+                            log.error('UnsupportedFile %r', filename)  # todo exception trace?
+                            raise
+                    except:
+                        # we have no idea what happened :-(
+                        if is_py3:
+                            log.error(
+                                'UnsupportedFile %r', filename, exc_info=1, stack_info=1
+                            )  # include traceback, and and Python 3 only full stack/trace
+                        else:
+                            log.error('UnsupportedFile %r', filename, exc_info=1)  # include traceback
                         raise
-                except:
-                    # we have no idea what happened :-(
-                    if is_py3:
-                        log.error(
-                            'UnsupportedFile %r', filename, exc_info=1, stack_info=1
-                        )  # include traceback, and and Python 3 only full stack/trace
+                    if file_level_regexes and not file_level_match(note_text):
+                        continue
+                    if literal_search_term is not None:
+                        search_res = grep_string_literal(
+                            note_text,
+                            literal_search_term,
+                            regex_object,
+                            highlight_text_start,
+                            highlight_text_stop,
+                            files_with_matches=files_with_matches,
+                            ignore_case=ignore_case,
+                        )
                     else:
-                        log.error('UnsupportedFile %r', filename, exc_info=1)  # include traceback
-                    raise
-                search_res = grep_string(
-                    note_text,
-                    regex_object,
-                    highlight_text_start,
-                    highlight_text_stop,
-                    files_with_matches=files_with_matches,
-                )
-                if search_res:
-                    yield (filename, search_res)
+                        search_res = grep_string(
+                            note_text,
+                            regex_object,
+                            highlight_text_start,
+                            highlight_text_stop,
+                            files_with_matches=files_with_matches,
+                        )
+                    if search_res and limits:
+                        search_res = limits.add_hits(search_res)
+                    if search_res:
+                        yield (filename, search_res)
+        finally:
+            if self.catalog:
+                self.catalog.batch_end()
 
     def note_contents(
         self, filename, get_pass=None, dos_newlines=True, return_bytes=False, handler_class=None
@@ -3273,6 +4032,8 @@ class FileSystemNotes(BaseNotes):
             return_bytes=True,
             handler_class=handler_class,
         )
+        if self.catalog:
+            self.catalog.record_contents(self.abspath2relative(fullpath_filename), plain_str, self.note_encoding)
         if return_bytes:
             return plain_str
         else:
@@ -3412,8 +4173,453 @@ class FileSystemNotes(BaseNotes):
         pass
 
     def note_size(self, filename):
-        return 9999999999  # more likely to be noticed as an anomaly
-        return -1
+        """Plaintext size in bytes of note, without decrypting.
+        Falls back to the on-disk size when the format does not record the plaintext size.
+        """
+        filename = self.unicode_path(filename)
+        fullpath_filename = self.native_full_path(filename)
+        handler_class = filename2handler(fullpath_filename, default_handler=RawFile)
+        try:
+            with open(fullpath_filename, 'rb') as file_object:
+                plaintext_size = handler_class.inspect(file_object)['plaintext_size']
+        except (IOError, OSError) as info:
+            raise PurenTonboIO(info)
+        if plaintext_size is None:
+            plaintext_size = os.path.getsize(fullpath_filename)
+        return plaintext_size
+
+
+SEARCH_MAX_WORKERS = 8  # threads used for concurrent searches of multiple note roots
+
+
+def locking_password_callback(get_password_callback):
+    """Wrap a (caching) password prompt callback, e.g. caching_console_password_prompt, so that concurrent
+    searches prompt one at a time, and so only once as the first answer is cached by the callback.
+    Non-callables (password bytes or None) are returned as-is.
+    """
+    if not callable(get_password_callback):
+        return get_password_callback
+    lock = threading.RLock()
+
+    def get_pass(*args, **kwargs):
+        with lock:
+            return get_password_callback(*args, **kwargs)
+    return get_pass
+
+
+def map_notes(func, notes_list, max_workers=None):
+    """Call func(notes) for each entry in notes_list concurrently (threads), returns list of results in notes_list order.
+    First exception raised by func is re-raised.
+    """
+    if len(notes_list) <= 1:
+        return [func(notes) for notes in notes_list]
+    results = [None] * len(notes_list)
+    errors = []
+    work = queue.Queue()
+    for index in range(len(notes_list)):
+        work.put(index)
+
+    def worker():
+        while not errors:
+            try:
+                index = work.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results[index] = func(notes_list[index])
+            except Exception as info:
+                errors.append(info)
+
+    threads = [threading.Thread(target=worker) for _ in range(min(len(notes_list), max_workers or SEARCH_MAX_WORKERS))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+def search_notes(notes_list, search_term, max_workers=None, **search_kwargs):
+    """Concurrent search() of multiple notes instances (e.g. FileSystemNotes for each note root), using up to
+    max_workers threads. Generator of (notes, filename, hit_detail) in notes_list order; results for later
+    entries are buffered until earlier entries complete, so output is the same as searching one at a time
+    but total time is (close to) that of the slowest entry.
+
+    search_kwargs are passed to search(), get_password_callback is shared (see locking_password_callback()).
+    limits (SearchLimits) are overall limits, applied here as results are yielded in notes_list order;
+    each concurrent search gets its own copy (same deadline) so no one entry does more work than needed.
+    Exceptions (e.g. SearchCancelled) from any search are re-raised, remaining searches are stopped.
+    """
+    if len(notes_list) == 1:
+        notes = notes_list[0]
+        for filename, hit_detail in notes.search(search_term, **search_kwargs):
+            yield notes, filename, hit_detail
+        return
+
+    search_kwargs['get_password_callback'] = locking_password_callback(search_kwargs.get('get_password_callback'))
+    limits = search_kwargs.pop('limits', None)
+    root_limits = [None] * len(notes_list)
+    if limits:
+        limits.start()
+        for index in range(len(notes_list)):
+            root_limits[index] = SearchLimits(limits.max_matches, limits.max_files_with_matches, limits.deadline_seconds)
+            root_limits[index].deadline = limits.deadline
+    stop_event = threading.Event()
+    progess_callback = search_kwargs.get('progess_callback')
+
+    def check_stop(*args, **kwargs):
+        if stop_event.is_set():
+            raise SearchCancelled('search stopped')
+        if progess_callback:
+            progess_callback(*args, **kwargs)
+    search_kwargs['progess_callback'] = check_stop
+
+    work = queue.Queue()
+    for index in range(len(notes_list)):
+        work.put(index)
+    messages = queue.Queue()  # (index, filename, hit_detail), hit_detail None means index completed
+
+    def worker():
+        while not stop_event.is_set():
+            try:
+                index = work.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                for filename, hit_detail in notes_list[index].search(search_term, limits=root_limits[index], **search_kwargs):
+                    messages.put((index, filename, hit_detail))
+                    if stop_event.is_set():
+                        return
+            except SearchCancelled:
+                if stop_event.is_set():
+                    return  # consumer went away
+                messages.put((index, None, sys.exc_info()[1]))
+                return
+            except Exception:
+                messages.put((index, None, sys.exc_info()[1]))
+                return
+            messages.put((index, None, None))
+
+    threads = [threading.Thread(target=worker) for _ in range(min(len(notes_list), max_workers or SEARCH_MAX_WORKERS))]
+    for thread in threads:
+        thread.daemon = True  # may be blocked on a decrypt, do not hold up exit
+        thread.start()
+
+    pending = [[] for _ in notes_list]
+    completed = [False] * len(notes_list)
+    current = 0
+    try:
+        while current < len(notes_list):
+            index, filename, hit_detail = messages.get()
+            if filename is None:
+                if isinstance(hit_detail, Exception):
+                    raise hit_detail
+                completed[index] = True
+            else:
+                pending[index].append((filename, hit_detail))
+            while current < len(notes_list):
+                for filename, hit_detail in pending[current]:
+                    if limits:
+                        hit_detail = limits.add_hits(hit_detail)
+                        if not hit_detail:
+                            return  # overall limit reached (add_hits() flagged truncated)
+                    yield notes_list[current], filename, hit_detail
+                pending[current] = []
+                if not completed[current]:
+                    break
+                if limits and root_limits[current].truncated:
+                    # results for this entry are incomplete, so overall results are too (also at/over overall limit)
+                    limits.truncated = limits.truncated or root_limits[current].truncated
+                    return
+                current += 1
+    finally:
+        stop_event.set()
+
+
+class ZipArchiveNotes(FileSystemNotes):
+    """Notebook archive - many notes in a single AES ZIP file, see mzipaes.MiniZipAEArchive
+    @note_root is the archive filename, note filenames are the (relative) entry names.
+
+    Listing, note_size() and recent_notes() only read the central directory (no password needed).
+    The password is verified once, then kept (along with derived keys) for the life of the instance,
+    search() and fts_index() read entries directly from the archive, nothing is extracted to disk.
+    """
+
+    def __init__(self, note_root, note_encoding=None, fts_options=None):
+        if not mzipaes:
+            raise UnsupportedFile('mzipaes (and a crypto kit) required for zip archive notes')
+        FileSystemNotes.__init__(self, note_root, note_encoding=note_encoding, fts_options=fts_options)
+        self.archive = None
+        self.archive_stat = None
+        self.archive_password = None
+
+    def close(self):
+        if self.archive:
+            self.archive.close()
+        self.archive = None
+        self.archive_stat = None
+
+    def get_archive(self):
+        """Return archive instance, re-reading the central directory if archive changed on disk"""
+        if os.path.exists(self.note_root):
+            file_stat = os.stat(self.note_root)
+            archive_stat = (file_stat.st_mtime, file_stat.st_size)
+        else:
+            archive_stat = None
+        if self.archive is None or archive_stat != self.archive_stat:
+            self.close()
+            if archive_stat is None:
+                self.archive = mzipaes.MiniZipAEArchive(FakeFile(), self.archive_password)  # new, empty
+            else:
+                try:
+                    self.archive = mzipaes.MiniZipAEArchive(open(self.note_root, 'rb'), self.archive_password)
+                except mzipaes.AesZipException as info:
+                    raise UnsupportedFile(info)
+            self.archive_stat = archive_stat
+        return self.archive
+
+    def unlock(self, get_pass):
+        """Obtain and verify archive password (once)
+        @get_pass is either plaintext (bytes) password or a callback function that returns a password, see note_contents()
+        """
+        if self.archive_password is not None:
+            return
+        archive = self.get_archive()
+        reset_password = False
+        while True:
+            if callable(get_pass):
+                password = get_pass(filename=self.note_root, reset=reset_password, for_decrypt=True)
+            else:
+                password = get_pass
+            if password is None:
+                raise SearchCancelled('empty password for for %s' % self.note_root)
+            if not isinstance(password, bytes):
+                password = password.encode('utf-8')
+            archive.password = password
+            archive.key_cache = {}
+            try:
+                archive.check_password()
+                self.archive_password = password
+                return
+            except mzipaes.BadPassword as info:
+                archive.password = None
+                if not callable(get_pass):
+                    raise BadPassword(info)
+                reset_password = True
+
+    def entry_name(self, filename):
+        """validate and convert relative (or native absolute) filename into archive entry name"""
+        filename = self.unicode_path(filename)
+        if os.path.isabs(filename):
+            filename = self.abspath2relative(filename)
+        entry_name = os.path.normpath(filename).replace(os.sep, '/')
+        if entry_name.startswith('../') or entry_name == '..':
+            raise PurenTonboIO('outside of note tree root')
+        return entry_name
+
+    def sorted_notes(self, filenames, sort=None):
+        """Order (native absolute style) entry filenames for search()
+        sort is one of SEARCH_SORT_ORDERS, None means SORT_PATH (entry name order).
+        SORT_MTIME_DESC uses the zip (DOS) timestamps from the central directory"""
+        if sort not in (None,) + SEARCH_SORT_ORDERS:
+            raise SearchException('unsupported sort order %r' % (sort,))
+        filenames = list(filenames)
+        if sort == SORT_MTIME_DESC:
+            archive = self.get_archive()
+            prefix_len = len(os.path.join(self.note_root, ''))
+            filenames.sort(key=lambda x: archive.getinfo(x[prefix_len:])['mtime'], reverse=True)  # stable, ties stay in name order
+        return filenames
+
+    def search_recurse_notes_func(self, sort=None):
+        """Return note lister used by search(), see FileSystemNotes.search_recurse_notes_func()"""
+        if sort not in (None,) + SEARCH_SORT_ORDERS:
+            raise SearchException('unsupported sort order %r' % (sort,))
+
+        def archive_notes(path_to_search, filename_filter):
+            return self.sorted_notes(sorted(self.recurse_notes(filename_filter=filename_filter)), sort=sort)
+        return archive_notes
+
+    def candidate_notes_func(self, candidate_files, sort=None):
+        candidate_files = set(os.path.join(self.note_root, filename) for filename in candidate_files)
+
+        def candidate_notes(path_to_search, filename_filter):
+            filenames = sorted(filename for filename in self.recurse_notes(filename_filter=filename_filter) if filename in candidate_files)
+            return self.sorted_notes(filenames, sort=sort)
+        return candidate_notes
+
+    def recurse_notes(self, sub_dir=None, filename_filter=any_filename_filter):
+        """Recursive note lister, iterator of (native absolute style) filenames of entries in archive"""
+        for entry_name in self.get_archive().namelist():
+            if filename_filter(entry_name):
+                yield os.path.join(self.note_root, entry_name)
+
+    def recent_notes(
+        self, sub_dir=None, number_of_files=20, order=ORDER_ASCENDING, ignore_folders=None
+    ):
+        """Recently updated/modified entries, based on zip timestamps"""
+        archive = self.get_archive()
+        recent_files = sorted((archive.getinfo(entry_name)['mtime'], entry_name) for entry_name in archive.namelist())
+        recent_files = recent_files[-number_of_files:]
+        if ORDER_DESCENDING == order:
+            recent_files.reverse()
+        for mtime, entry_name in recent_files:
+            yield os.path.join(self.note_root, entry_name)
+
+    def directory_contents(self, sub_dir=None):
+        """Simple non-recursive note lister.
+        Returns tuple (list of directories, list of files) in @sub_dir"""
+        prefix = ''
+        if sub_dir:
+            prefix = self.entry_name(sub_dir) + '/'
+        dir_list = set()
+        file_list = []
+        for entry_name in self.get_archive().namelist():
+            if not entry_name.startswith(prefix):
+                continue
+            entry_name = entry_name[len(prefix) :]
+            if '/' in entry_name:
+                dir_list.add(entry_name.split('/', 1)[0])
+            else:
+                file_list.append(entry_name)
+        return sorted(dir_list), sorted(file_list)
+
+    def note_contents(
+        self, filename, get_pass=None, dos_newlines=True, return_bytes=False, handler_class=None
+    ):
+        """load/read/decrypt note from archive, see FileSystemNotes.note_contents()
+        @handler_class is ignored, entries are encrypted by the archive
+        """
+        self.unlock(get_pass)
+        try:
+            plain_str = self.get_archive().get(self.entry_name(filename))
+        except mzipaes.BadPassword as info:
+            raise BadPassword(info)
+        except mzipaes.UnsupportedFile as info:
+            raise UnsupportedFile(info)
+        except mzipaes.AesZipException as info:
+            raise PurenTonboException(info)
+        if dos_newlines:
+            plain_str = plain_str.replace(b'\r\n', b'\n')
+        if return_bytes:
+            return plain_str
+        else:
+            return self.to_string(plain_str)
+
+    def note_contents_save(
+        self,
+        note_text,
+        filename=None,
+        original_filename=None,
+        folder=None,
+        get_pass=None,
+        dos_newlines=True,
+        backup=True,
+        use_tempfile=True,
+        filename_generator=FILENAME_FIRSTLINE,
+        handler_class=None,
+    ):
+        """Save/write/encrypt note into archive (add or replace), see FileSystemNotes.note_contents_save()
+        If @backup the previous archive is kept as .bak
+        @use_tempfile (default) writes a new, compacted, archive to a temporary file then replaces the original,
+        a failure part way through leaves the original untouched. Otherwise the archive is updated in-place.
+        """
+        if filename is None:
+            filename = original_filename
+        if filename is None:
+            if folder is None:
+                folder = ''
+            if filename_generator:
+                validate_filename_generator(filename_generator)
+                filename = filename_generators[filename_generator](note_text) + '.md'
+            else:
+                raise PurenTonboBadCall('filename required')
+            filename = os.path.join(folder, filename)
+        entry_name = self.entry_name(filename)
+        self.unlock(get_pass)
+        if is_bytes(note_text):
+            plain_str_bytes = note_text
+        else:
+            plain_str_bytes = self.to_bytes(note_text)
+        if dos_newlines:
+            plain_str_bytes = simple_unix2dos(plain_str_bytes)
+
+        if use_tempfile:
+            return self.replace_archive_entry(entry_name, plain_str_bytes, backup=backup)
+
+        self.close()
+        if backup and os.path.exists(self.note_root):
+            shutil.copy2(self.note_root, self.note_root + '.bak')
+        if os.path.exists(self.note_root):
+            mode = 'r+b'
+        else:
+            mode = 'w+b'
+        with open(self.note_root, mode) as archive_file:
+            archive = mzipaes.MiniZipAEArchive(archive_file, self.archive_password)
+            archive.put(entry_name, plain_str_bytes)
+            archive.flush()
+
+    def note_delete(self, filename, backup=True):
+        entry_name = self.entry_name(filename)
+        self.replace_archive_entry(entry_name, None, backup=backup)
+
+    def replace_archive_entry(self, entry_name, plain_str_bytes, backup=True):
+        """Write a new archive, without entry_name (if present) and then with entry_name containing
+        plain_str_bytes (None means remove entry_name), to a temporary file in the same directory
+        and then replace the original with it. Entries are copied still encrypted (see MiniZipAEArchive.compact())
+        so the new archive has no dead space from replaced/removed entries.
+        """
+        self.close()
+        timestamp_now = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        out_file = tempfile.NamedTemporaryFile(
+            mode='w+b',
+            dir=os.path.dirname(os.path.abspath(self.note_root)),
+            prefix=os.path.basename(self.note_root) + timestamp_now,
+            delete=False,
+        )
+        tmp_out_filename = out_file.name
+        try:
+            if os.path.exists(self.note_root):
+                with open(self.note_root, 'rb') as archive_file:
+                    archive = mzipaes.MiniZipAEArchive(archive_file)
+                    if entry_name in archive.entries:
+                        archive.remove(entry_name)
+                    elif plain_str_bytes is None:
+                        raise PurenTonboIO('NO ENTRY NAMED %r' % (entry_name,))
+                    archive.compact(out_file)
+            elif plain_str_bytes is None:
+                raise PurenTonboIO('NO ENTRY NAMED %r' % (entry_name,))
+            if plain_str_bytes is not None:
+                archive = mzipaes.MiniZipAEArchive(out_file, self.archive_password)
+                archive.put(entry_name, plain_str_bytes)
+                archive.flush()
+            out_file.close()
+        except:
+            out_file.close()
+            os.remove(tmp_out_filename)
+            raise
+        if backup and os.path.exists(self.note_root):
+            shutil.copy2(self.note_root, self.note_root + '.bak')
+        file_replace(tmp_out_filename, self.note_root)
+
+    def note_size(self, filename):
+        """Plaintext size in bytes of note, from the central directory (no password needed)"""
+        try:
+            return self.get_archive().getinfo(self.entry_name(filename))['usize']
+        except mzipaes.AesZipException as info:
+            raise PurenTonboIO(info)
+
+
+def notes_for_root(note_root, note_encoding=None, archive=False, fts_options=None):
+    """Return notes instance for command line tools.
+    @archive True means @note_root is a ZipArchiveNotes notebook archive (many notes in one AES ZIP file),
+    otherwise FileSystemNotes; directory of notes or a single (possibly encrypted) note file.
+    A single .aes256.zip file is NOT treated as an archive unless requested, it is normally a single encrypted note.
+    """
+    if archive:
+        return ZipArchiveNotes(note_root, note_encoding=note_encoding, fts_options=fts_options)
+    return FileSystemNotes(note_root, note_encoding=note_encoding, fts_options=fts_options)
 
 
 class FileLike:
@@ -3614,6 +4820,7 @@ def get_config(config_filename=None):
             '.git'
         ],  # '.hg', '__pycache__'  TODO doc, other options ['.git', '.hg', '__pycache__', '.mozilla', '.cache'] (also check notes on ignore locations like Mac Dstore)
         'ignore_file_extensions': ['.bak', '~', '_MOD'],  # currently ptig only
+        'catalog': None,  # NoteCatalog SQLite file for fast ls/recent/find listings (ptig, ptwebcp), e.g. "~/.cache/puren_tonbo_catalog.sqlite" or ":memory:". None/null to disable
         'ptig': {
             'editors': {  # if specified in config, defaults for editors WILL be lost
                 'pttkview': 'pttkview',  # part of PT
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# -*- coding: us-ascii -*-
+# vim:ts=4:sw=4:softtabstop=4:smarttab:expandtab
+"""pt-agent, ssh-agent like daemon that holds the (unlocked) password and
+a plain text cache in memory, answering decrypt, encrypt and search requests
+from thin clients (see puren_tonbo.agent_client) over a Unix domain socket.
+
+Clients avoid Python package import, backend probing, password prompts and
+(for repeat reads of unchanged files) decryption/KDF costs.
+
+See puren_tonbo.tools.ptagent to start the agent.
+"""
+
+from collections import OrderedDict
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import socketserver
+except ImportError:
+    # Python 2
+    import SocketServer as socketserver
+
+import puren_tonbo
+from puren_tonbo import forcebad_dos2unix, simple_unix2dos
+from puren_tonbo.agent_client import b64decode, b64encode
+
+try:
+    from puren_tonbo import vimdecrypt
+except ImportError:
+    vimdecrypt = None
+
+
+log = logging.getLogger(__name__)
+
+
+DEFAULT_PASSWORD_TIMEOUT = 15 * 60  # seconds, None means never forget
+PLAINTEXT_CACHE_SIZE = 64  # number of files
+
+
+class PasswordRequired(puren_tonbo.PurenTonboException):
+    '''No password held by agent (never set or timed out), and none in request'''
+
+
+class Agent(object):
+    """Request handling and state, independent of transport.
+    handle() takes a request dict and returns a response dict.
+    """
+
+    def __init__(self, password=None, password_timeout=DEFAULT_PASSWORD_TIMEOUT, plaintext_cache_size=PLAINTEXT_CACHE_SIZE, note_encoding=None):
+        self.lock = threading.RLock()
+        self.password_timeout = password_timeout
+        self.plaintext_cache_size = plaintext_cache_size
+        self.note_encoding = note_encoding or ('utf8', 'cp1252')
+        self.password = None
+        self.password_set_time = None
+        self.plaintext_cache = OrderedDict()  # abs filename -> (mtime, size, plain bytes)
+        self.shutdown_requested = False
+        if password:
+            self.set_password(password)
+
+    def set_password(self, password):
+        if not isinstance(password, bytes):
+            password = password.encode('us-ascii')
+        with self.lock:
+            if self.password is not None and password != self.password:
+                self.forget()  # cached plain text was decrypted with a different password
+            self.password = password
+            self.password_set_time = time.time()
+
+    def forget(self):
+        with self.lock:
+            self.password = None
+            self.password_set_time = None
+            self.plaintext_cache.clear()
+            if vimdecrypt:
+                vimdecrypt.wipe_key_cache()
+
+    def expire_password(self):
+        """Forget password (and cached plain text) if it has timed out, called periodically by AgentServer"""
+        with self.lock:
+            if self.password is not None and self.password_timeout and time.time() - self.password_set_time > self.password_timeout:
+                log.info('password timed out')
+                self.forget()
+
+    def get_password(self, request):
+        """Password from request (used for that request only, see handle()), else the agent's unexpired password"""
+        self.expire_password()
+        request_password = request.get('password')
+        if request_password:
+            if not isinstance(request_password, bytes):
+                request_password = request_password.encode('us-ascii')
+            return request_password
+        with self.lock:
+            if self.password is None:
+                raise PasswordRequired('agent has no password, set one with the password request parameter')
+            return self.password
+
+    def handle(self, request):
+        op = request.get('op')
+        func = getattr(self, 'op_' + str(op), None)
+        if func is None:
+            return {'error': 'unknown op %r' % (op,), 'error_type': 'UnknownOp'}
+        try:
+            response = func(request)
+        except Exception as info:
+            if not isinstance(info, puren_tonbo.PurenTonboException):
+                log.error('op %s failed', op, exc_info=1)
+            return {'error': str(info) or repr(info), 'error_type': info.__class__.__name__}
+        if request.get('password'):
+            # remember a request password once it has worked, only if none held.
+            # Never silently replace a held password, use the forget op first to change it
+            with self.lock:
+                if self.password is None:
+                    self.set_password(request['password'])
+        return response
+
+    def op_ping(self, request):
+        with self.lock:
+            has_password = self.password is not None
+        return {'message': 'pt-agent %s, password %s' % (puren_tonbo.__version__, 'set' if has_password else 'not set')}
+
+    def op_list_formats(self, request):
+        """Request: optional list_all
+        Response: version and formats list of [file_extension, file_type, file_description], see puren_tonbo.print_version_info()
+        """
+        return {
+            'version': puren_tonbo.__version__,
+            'formats': [list(info) for info in puren_tonbo.supported_filetypes_info(list_all=request.get('list_all', False))],
+        }
+
+    def op_forget(self, request):
+        self.forget()
+        return {'message': 'forgotten'}
+
+    def op_shutdown(self, request):
+        self.forget()
+        self.shutdown_requested = True
+        return {'message': 'shutting down'}
+
+    def op_decrypt(self, request):
+        """Request: filename (absolute) or data_b64 and cipher, optional force_newline
+        Response: data_b64 plain text bytes
+        """
+        handler_class = self.handler_class_for(request, request.get('filename'))
+        password = self.get_password(request) if handler_class.needs_key else ''  # also, no password (timed out) means no cached plain text
+        filename = request.get('filename')
+        if filename:
+            stat_info = os.stat(filename)
+            with self.lock:
+                # plain text cache is only for the held password, a different (request) password must decrypt
+                use_cache = not handler_class.needs_key or self.password in (None, password)  # none held, a working request password becomes the held one (see handle())
+                cached = self.plaintext_cache.get(filename) if use_cache else None
+                if cached and cached[:2] == (stat_info.st_mtime, stat_info.st_size):
+                    self.plaintext_cache[filename] = self.plaintext_cache.pop(filename)  # most recently used
+                    plain_bytes = cached[2]
+                else:
+                    plain_bytes = None
+            if plain_bytes is None:
+                handler = handler_class(key=password)
+                with open(filename, 'rb') as in_file:
+                    plain_bytes = handler.read_from(in_file)
+                with self.lock:
+                    if not handler_class.needs_key or self.password in (None, password):
+                        self.plaintext_cache[filename] = (stat_info.st_mtime, stat_info.st_size, plain_bytes)
+                        while len(self.plaintext_cache) > self.plaintext_cache_size:
+                            self.plaintext_cache.popitem(last=False)
+        else:
+            handler = handler_class(key=password)
+            plain_bytes = handler.read_from(puren_tonbo.FakeFile(b64decode(request['data_b64'])))
+        return {'data_b64': b64encode(force_newline(plain_bytes, request.get('force_newline')))}
+
+    def op_encrypt(self, request):
+        """Request: data_b64 (or filename of plain text), cipher and/or out_filename (absolute), optional force_newline
+        Response: data_b64 encrypted bytes, or if out_filename specified the file is written (with .bak backup) and nothing returned
+        """
+        out_filename = request.get('out_filename')
+        handler_class = self.handler_class_for(request, out_filename)
+        if request.get('filename'):
+            with open(request['filename'], 'rb') as in_file:
+                plain_bytes = in_file.read()
+        else:
+            plain_bytes = b64decode(request['data_b64'])
+        plain_bytes = force_newline(plain_bytes, request.get('force_newline'))
+        password = self.get_password(request) if handler_class.needs_key else ''
+        handler = handler_class(key=password)
+        out_file = puren_tonbo.FakeFile()
+        handler.write_to(out_file, plain_bytes)
+        crypted_bytes = out_file.getvalue()
+        if not out_filename:
+            return {'data_b64': b64encode(crypted_bytes)}
+        fd, tmp_out_filename = tempfile.mkstemp(dir=os.path.dirname(out_filename), prefix=os.path.basename(out_filename))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(crypted_bytes)
+        if os.path.exists(out_filename):
+            puren_tonbo.file_replace(out_filename, out_filename + '.bak')  # backup existing, same as ptcipher
+        puren_tonbo.file_replace(tmp_out_filename, out_filename)
+        with self.lock:
+            self.plaintext_cache.pop(out_filename, None)
+        return {'message': 'written %s' % out_filename}
+
+    def op_search(self, request):
+        """Request: note_root, search_term, optional regex (default True), ignore_case, search_encrypted
+        Response: results list of [filename, [[line_number, line], ...]]
+        """
+        get_password_callback = None
+        if request.get('search_encrypted'):
+            get_password_callback = self.get_password(request)
+        notes = puren_tonbo.FileSystemNotes(request['note_root'], request.get('note_encoding') or self.note_encoding)
+        results = []
+        for filename, hits in notes.search(
+            request['search_term'],
+            search_term_is_a_regex=request.get('regex', True),
+            ignore_case=request.get('ignore_case', False),
+            search_encrypted=request.get('search_encrypted', False),
+            get_password_callback=get_password_callback,
+        ):
+            results.append([filename, [[line_number, line.rstrip('\r\n')] for line_number, line in hits]])
+        return {'results': results}
+
+    def handler_class_for(self, request, filename):
+        if request.get('cipher'):
+            return puren_tonbo.filename2handler('_.' + request['cipher'].lstrip('.'))  # same convention as ptcipher
+        if filename:
+            return puren_tonbo.filename2handler(filename)
+        raise puren_tonbo.PurenTonboBadCall('need a cipher or filename')
+
+
+def force_newline(data, newline):
+    """newline is None (no change), or same values as ptcipher --force-newline"""
+    if not newline:
+        return data
+    data = forcebad_dos2unix(data)
+    if newline in ('dos', 'windows', 'crlf'):
+        data = simple_unix2dos(data)
+    return data
+
+
+class AgentRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        agent = self.server.agent
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line.decode('utf-8'))
+            except ValueError:
+                response = {'error': 'invalid JSON request', 'error_type': 'BadRequest'}
+            else:
+                response = agent.handle(request)
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+            if agent.shutdown_requested:
+                # shutdown() blocks until serve_forever() exits, can not call it from this (request) thread
+                threading.Thread(target=self.server.shutdown).start()
+                return
+
+
+class AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, agent):
+        self.agent = agent
+        self.socket_path = socket_path
+        if os.path.exists(socket_path):
+            os.remove(socket_path)  # stale
+        old_umask = os.umask(0o077)  # socket only accessible by this user
+        try:
+            socketserver.UnixStreamServer.__init__(self, socket_path, AgentRequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def service_actions(self):
+        # called by serve_forever() every poll_interval, password expires even when there are no requests
+        self.agent.expire_password()
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def default_socket_path():
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, 'pt-agent.sock')
+    return os.path.join(tempfile.gettempdir(), 'pt-agent-%d.sock' % os.getuid())
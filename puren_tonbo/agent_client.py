@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: us-ascii -*-
+# vim:ts=4:sw=4:softtabstop=4:smarttab:expandtab
+"""Thin client for pt-agent, see puren_tonbo.agent and puren_tonbo.tools.ptagent
+
+Standard library only, run it by pathname (rather than "-m") so that the
+puren_tonbo package (and crypto backends) are NOT imported, start up is
+then only Python itself:
+
+    python /path/to/puren_tonbo/agent_client.py --ping
+    python /path/to/puren_tonbo/agent_client.py -d puren_tonbo/tests/data/aesop.chi
+    python /path/to/puren_tonbo/agent_client.py --cipher chi -e -o - < plain.txt > new.chi
+    python /path/to/puren_tonbo/agent_client.py --search aesop --note-root puren_tonbo/tests/data
+
+Encrypt/decrypt (and --list-formats) options are a subset of ptcipher, so it
+can be used as PTCIPHER_EXE for the vim and SciTE integrations. Integrations
+that run PTCIPHER_EXE as a single program name (rather than via a shell), like
+the SciTE Python plugin, need the installed ``ptagent_client`` script instead
+(which imports the puren_tonbo package, so is slower to start).
+Agent socket comes from OS env PT_AGENT_SOCK.
+
+Protocol is one JSON object per line, request has "op", response has
+"error" (and "error_type") on failure. Binary data is base64 encoded in
+"data_b64".
+"""
+
+import base64
+import getpass
+import json
+from optparse import OptionParser
+import os
+import socket
+import sys
+
+
+is_py3 = sys.version_info >= (3,)
+
+AGENT_SOCKET_ENV = 'PT_AGENT_SOCK'
+
+
+class AgentError(Exception):
+    def __init__(self, message, error_type=None):
+        Exception.__init__(self, message)
+        self.error_type = error_type
+
+
+def b64encode(data):
+    return base64.b64encode(data).decode('us-ascii')
+
+
+def b64decode(data):
+    return base64.b64decode(data.encode('us-ascii'))
+
+
+def request(op, socket_path=None, **kwargs):
+    """Send a single request to the agent, returns response dict
+    raises AgentError if agent reports a failure
+    """
+    socket_path = socket_path or os.environ.get(AGENT_SOCKET_ENV)
+    if not socket_path:
+        raise AgentError('agent socket not specified, is %s set?' % AGENT_SOCKET_ENV)
+    kwargs['op'] = op
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(kwargs).encode('utf-8') + b'\n')
+        sock_file = sock.makefile('rb')
+        line = sock_file.readline()
+        sock_file.close()
+    finally:
+        sock.close()
+    if not line:
+        raise AgentError('no response from agent')
+    response = json.loads(line.decode('utf-8'))
+    if 'error' in response:
+        raise AgentError(response['error'], response.get('error_type'))
+    return response
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+
+    usage = "usage: %prog [options] [in_filename]"
+    parser = OptionParser(usage=usage)
+    parser.add_option("--socket", help="agent socket, default OS env " + AGENT_SOCKET_ENV)
+    parser.add_option("-o", "--output", dest="out_filename", default='-', help="write output to FILE", metavar="FILE")
+    parser.add_option("-d", "--decrypt", action="store_true", dest="decrypt", default=True, help="decrypt in_filename")
+    parser.add_option("-e", "--encrypt", action="store_false", dest="decrypt", help="encrypt in_filename")
+    parser.add_option("--cipher", help="Which encryption mechanism to use (file extension used as hint)")
+    parser.add_option("--force-newline", "--force_newline", help="If set, force newlines. Options; dos, windows, CRLF, unix, LF")
+    parser.add_option("-p", "--password", help="password, if omitted but OS env PT_PASSWORD is set use that, if missing the agent's password is used")
+    parser.add_option("--no-prompt", "--no_prompt", help="do not prompt for password", action="store_true")
+    parser.add_option("-s", "--silent", help="ignored, for ptcipher compatibility", action="store_false", default=True)
+    parser.add_option("--password-prompt", "--password_prompt", help="ignored, for ptcipher compatibility (only prompts on a terminal)")
+    parser.add_option("--list-formats", help="Which encryption/file formats are available (to the agent)", action="store_true")
+    parser.add_option("--list-all-formats", help="List all (including unavailable) encryption/file formats", action="store_true")
+    parser.add_option("--ping", help="check agent is running", action="store_true")
+    parser.add_option("--forget", help="agent forgets password and cached plain text", action="store_true")
+    parser.add_option("--shutdown", help="stop the agent", action="store_true")
+    parser.add_option("--search", help="search note-root for term (regex), print filename:line_number:line")
+    parser.add_option("--note-root", help="Directory of notes for --search")
+    parser.add_option("-i", "--ignore-case", "--ignore_case", action="store_true")
+    parser.add_option("--search-encrypted", "--search_encrypted", action="store_true")
+    (options, args) = parser.parse_args(argv[1:])
+
+    socket_path = options.socket
+    password = options.password or os.environ.get('PT_PASSWORD')
+    request_kwargs = {}
+    if password:
+        request_kwargs['password'] = password
+
+    try:
+        if options.ping or options.forget or options.shutdown:
+            op = options.ping and 'ping' or options.forget and 'forget' or 'shutdown'
+            response = request(op, socket_path=socket_path)
+            print('%s' % response.get('message', 'ok'))
+            return 0
+
+        if options.list_formats or options.list_all_formats:
+            # same layout as ptcipher --list-formats (puren_tonbo.print_version_info()), integrations parse it
+            response = request('list_formats', socket_path=socket_path, list_all=bool(options.list_all_formats))
+            print(sys.version.replace('\n', ' '))
+            print('')
+            print('Puren Tonbo puren_tonbo version %s (pt-agent)' % response['version'])
+            print('Formats:')
+            print('')
+            for file_extension, file_type, file_description in response['formats']:
+                print('%17s - %s - %s' % (file_extension[1:], file_type, file_description))
+            print('')
+            print('Libs:')
+            print('')
+            return 0
+
+        if options.search:
+            response = request('search', socket_path=socket_path, note_root=options.note_root or '.', search_term=options.search, ignore_case=options.ignore_case, search_encrypted=options.search_encrypted, **request_kwargs)
+            for filename, hits in response['results']:
+                for line_number, line in hits:
+                    print('%s:%s:%s' % (filename, line_number, line))
+            return 0
+
+        in_filename = args[0] if args else '-'
+        if options.force_newline:
+            request_kwargs['force_newline'] = options.force_newline.lower()
+        if options.cipher:
+            request_kwargs['cipher'] = options.cipher
+        if in_filename == '-':
+            in_file = sys.stdin.buffer if is_py3 else sys.stdin
+            request_kwargs['data_b64'] = b64encode(in_file.read())
+        else:
+            request_kwargs['filename'] = os.path.abspath(in_filename)
+        if options.decrypt:
+            op = 'decrypt'
+        else:
+            op = 'encrypt'
+            if options.out_filename != '-':
+                request_kwargs['out_filename'] = os.path.abspath(options.out_filename)
+            elif not options.cipher:
+                request_kwargs['cipher'] = None  # agent will report missing cipher
+
+        try:
+            response = request(op, socket_path=socket_path, **request_kwargs)
+        except AgentError as info:
+            if info.error_type not in ('BadPassword', 'PasswordRequired') or options.no_prompt or not sys.stdin.isatty():
+                raise
+            request_kwargs['password'] = getpass.getpass('pt-agent Password:')
+            response = request(op, socket_path=socket_path, **request_kwargs)
+
+        if 'data_b64' in response:
+            data = b64decode(response['data_b64'])
+            if options.out_filename == '-':
+                out_file = sys.stdout.buffer if is_py3 else sys.stdout
+                out_file.write(data)
+                out_file.flush()
+            else:
+                with open(options.out_filename, 'wb') as out_file:
+                    out_file.write(data)
+    except AgentError as info:
+        sys.stderr.write('pt-agent error: %s\n' % (info,))
+        return 1
+    except socket.error as info:
+        sys.stderr.write('pt-agent not available: %s\n' % (info,))
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
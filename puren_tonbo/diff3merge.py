@@ -13,10 +13,13 @@
 
 """Implementation of a diff3 approach to perform a 3-way merge"""
 
+from array import array
 import sys
 from difflib import diff_bytes, ndiff
-from .myersdiff import myers_diff
-from .histogramdiff import HistogramDiffer
+from .diffutils import intern_lines
+from .myersdiff import myers_matching_blocks
+from .histogramdiff import HistogramDiffer, histogram_matching_blocks
+from .patiencediff import patience_matching_blocks
 #from .merge import MergeOptions
 
 
@@ -24,6 +27,14 @@ class MergeOptions:
     pass
 
 
+# diff_type name to function(base ids, other ids) returning (base index, other index, length) matching blocks
+matching_blocks_engines = {
+    'myers': myers_matching_blocks,
+    'histogram': histogram_matching_blocks,
+    'patience': patience_matching_blocks,
+}
+
+
 def generate_common_base_file(this_file, other_file):
     """Extracts only the common lines from this_file and other_file"""
     hd = HistogramDiffer(this_file.splitlines(True), other_file.splitlines(True))
@@ -64,7 +75,7 @@ class Merge3Way(object):
                this_file  - bytestring to be merged with other_file
                other_file - bytestring to be merged with this_file
                base_file  - btyestring of common base_file to this_file and other_file
-               diff_type  - type of diff to use "myers", "ndiff", or "histogram"
+               diff_type  - type of diff to use "myers", "ndiff", "histogram", or "patience"
                strategy   - merge strategy (ort, ort-ours, ort-theirs, resolve, resolve-ours, resolve-theirs)
                             see https://git-scm.com/docs/merge-strategies
            Returns:
@@ -76,18 +87,21 @@ class Merge3Way(object):
         self.o_lines = base_file.splitlines(True)
         self.a_lines = this_file.splitlines(True)
         self.b_lines = other_file.splitlines(True)
+        # one id per distinct line across all three, shared by the diff engines
+        self.o_ids, self.a_ids, self.b_ids = intern_lines(self.o_lines, self.a_lines, self.b_lines)
         self.strategy = strategy
         self.conflicts = []
-        if diff_type.lower() == "myers":
-            self.a_matches = self._myers_matches(self.o_lines, self.a_lines)
-            self.b_matches = self._myers_matches(self.o_lines, self.b_lines)
-        elif diff_type.lower() == "ndiff":
-            self.a_matches = self._ndiff_matches(self.o_lines, self.a_lines)
-            self.b_matches = self._ndiff_matches(self.o_lines, self.b_lines)
+        diff_type = diff_type.lower()
+        if diff_type == "ndiff":
+            a_blocks = self._ndiff_blocks(self.o_lines, self.a_lines)
+            b_blocks = self._ndiff_blocks(self.o_lines, self.b_lines)
         else:
             # otherwise use histogram diff
-            self.a_matches = self._histogram_matches(self.o_lines, self.a_lines)
-            self.b_matches = self._histogram_matches(self.o_lines, self.b_lines)
+            matching_blocks = matching_blocks_engines.get(diff_type, histogram_matching_blocks)
+            a_blocks = matching_blocks(self.o_ids, self.a_ids)
+            b_blocks = matching_blocks(self.o_ids, self.b_ids)
+        self.a_matches = self._match_table(a_blocks)
+        self.b_matches = self._match_table(b_blocks)
         self.chunks = []
         self.on, self.an, self.bn = 0, 0, 0
 
@@ -99,16 +113,29 @@ class Merge3Way(object):
         """
         return self.conflicts
 
-    def _ndiff_matches(self, olines, dlines):
+    def _match_table(self, blocks):
+        """Convert matching blocks into a match table
+           Args:
+              blocks - list of (base_file index, other index, length) runs of matching lines
+           Returns:
+              array indexed by (1 based) line number in base_file of the
+              matching (1 based) line number in this_file/other_file, 0 for no match
+        """
+        matches = array('i', [0]) * (len(self.o_lines) + 1)
+        for on, dn, length in blocks:
+            matches[on + 1:on + 1 + length] = array('i', range(dn + 1, dn + 1 + length))
+        return matches
+
+    def _ndiff_blocks(self, olines, dlines):
         """Uses difflib's ndiff to find matching lines in base_file and this_file or other_file
            Args:
               olines - list of bytestrings of base_file
               dlines - list of bytestrings of either this_file or other_file
            Returns:
-              dictionary mapping matching line numbers in base_file to other
+              list of (base_file index, other index, length) runs of matching lines
         """
         on, dn = 0, 0
-        matches = {}
+        blocks = []
 
         # See difflib.diff_bytes documentation
         # https://docs.python.org/3/library/difflib.html
@@ -122,61 +149,14 @@ class Merge3Way(object):
                                b' ', b' ', n=-1, lineterm=b'\n'):
             dt = line[0:2]
             if dt == b'  ':
+                blocks.append((on, dn, 1))
                 on += 1
                 dn += 1
-                matches[on] = dn
             elif dt == b'+ ':
                 dn += 1
             elif dt == b'- ':
                 on += 1
-        return matches
-
-    def _myers_matches(self, olines, dlines):
-        """Uses myers diff implementation to find matching lines
-           in base_file and this_file or other_file
-           Args:
-              olines - list of bytestrings of base_file
-              dlines - list of bytestrings of either this_file or other_file
-           Returns:
-              dictionary mapping matching line numbers in base_file to other
-        """
-        on, dn = 0, 0
-        matches = {}
-        for line in myers_diff(olines, dlines):
-            dt = line[0:2]
-            if dt == b'  ':
-                on += 1
-                dn += 1
-                matches[on] = dn
-            elif dt == b'+ ':
-                dn += 1
-            elif dt == b'- ':
-                on += 1
-        return matches
-    
-    def _histogram_matches(self, olines, dlines):
-        """Uses histogram diff implementation to find matching lines
-           in base_file and this_file or other_file
-           Args:
-              olines - list of bytestrings of base_file
-              dlines - list of bytestrings of either this_file or other_file
-           Returns:
-              dictionary mapping matching line numbers in base_file to other
-        """
-        on, dn = 0, 0
-        matches = {}
-        hd = HistogramDiffer(olines, dlines)
-        for line in hd.histdiff():
-            dt = line[0:2]
-            if dt == b'  ':
-                on += 1
-                dn += 1
-                matches[on] = dn
-            elif dt == b'+ ':
-                dn += 1
-            elif dt == b'- ':
-                on += 1
-        return matches
+        return blocks
 
     def _generate_chunks(self):
         """Generate a list of chunks where each chunk represents
@@ -208,20 +188,14 @@ class Merge3Way(object):
             return True
         return False
 
-    def _ismatch(self, matchdict, offset, i):
-        """Using matchdict to determine line in base_file exists
-           in this_file/other_file at offset
-        """
-        if (self.on + i) in matchdict:
-            return matchdict[self.on + i] == offset + i
-        return False
-
     def _find_next_mismatch(self):
         """Walk chunks to find next mismatched chunk"""
+        # line in base_file matched at the same offset in both this_file and other_file, a match implies _inbounds()
+        on, an, bn = self.on, self.an, self.bn
+        a_matches, b_matches = self.a_matches, self.b_matches
+        o_len = len(self.o_lines)
         i = 1
-        while self._inbounds(i) and \
-                self._ismatch(self.a_matches, self.an, i) and \
-                self._ismatch(self.b_matches, self.bn, i):
+        while on + i <= o_len and a_matches[on + i] == an + i and b_matches[on + i] == bn + i:
             i += 1
         if self._inbounds(i):
             return i
@@ -229,34 +203,30 @@ class Merge3Way(object):
 
     def _find_next_match(self):
         """Find next chunk that matches across base_file, this_file, and other_file"""
+        a_matches, b_matches = self.a_matches, self.b_matches
+        o_len = len(self.o_lines)
         ov = self.on + 1
-        while (True):
-            if ov > len(self.o_lines):
-                break
-            if (ov in self.a_matches and ov in self.b_matches):
-                break
+        while ov <= o_len and not (a_matches[ov] and b_matches[ov]):
             ov += 1
-        av = bv = None
-        if ov in self.a_matches:
-            av = self.a_matches[ov]
-        if ov in self.b_matches:
-            bv = self.b_matches[ov]
-        return (ov, av, bv)
+        if ov > o_len:
+            return (ov, None, None)
+        return (ov, a_matches[ov] or None, b_matches[ov] or None)
 
     def _write_chunk(self, o_range, a_range, b_range):
         """Output merged chunk of the given ranges"""
-        oc = b''.join(self.o_lines[o_range[0]:o_range[1]])
-        ac = b''.join(self.a_lines[a_range[0]:a_range[1]])
-        bc = b''.join(self.b_lines[b_range[0]:b_range[1]])
-        if oc == ac and oc == bc:
-            self.chunks.append(oc)
-        elif oc == ac:
-            self.chunks.append(bc)
-        elif oc == bc:
-            self.chunks.append(ac)
-        elif ac == bc:
-            self.chunks.append(ac)
+        # compare line ids, only join the lines that are output
+        o_ids = self.o_ids[o_range[0]:o_range[1]]
+        a_ids = self.a_ids[a_range[0]:a_range[1]]
+        b_ids = self.b_ids[b_range[0]:b_range[1]]
+        if o_ids == a_ids and o_ids == b_ids:
+            self.chunks.append(b''.join(self.o_lines[o_range[0]:o_range[1]]))
+        elif o_ids == a_ids:
+            self.chunks.append(b''.join(self.b_lines[b_range[0]:b_range[1]]))
+        elif o_ids == b_ids or a_ids == b_ids:
+            self.chunks.append(b''.join(self.a_lines[a_range[0]:a_range[1]]))
         else:
+            ac = b''.join(self.a_lines[a_range[0]:a_range[1]])
+            bc = b''.join(self.b_lines[b_range[0]:b_range[1]])
             # use strategy to determine how to handle this potential conflict
             if self.strategy in ["ort-ours", "resolve-ours"]:
                 self.chunks.append(ac)
@@ -300,12 +270,12 @@ def main():
             this_file_path  - path to this_file
             other_file_path - path to other_file file
             base_file_path  - path to base_file file
-            diff_type       - "myers", "ndiff", "histogram"
+            diff_type       - "myers", "ndiff", "histogram", "patience"
           Prints output of 3 way merge with any conflicts marked
     """
     argv = sys.argv
     if len(argv) < 5:
-        print("diff3merge this_file_path other_file_path base_file_path myers|ndiff|histogram")
+        print("diff3merge this_file_path other_file_path base_file_path myers|ndiff|histogram|patience")
         return 0
     afile = argv[1]
     bfile = argv[2]
@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:ts=4:sw=4:softtabstop=4:smarttab:expandtab
+
+"""Helpers shared by the diff engines (myersdiff, histogramdiff) and diff3merge"""
+
+from array import array
+
+
+def intern_lines(*line_lists):
+    """Map every distinct line to a small integer id, once, across all inputs
+       The same line gets the same id in every returned sequence, so the
+       diff algorithms can hash and compare machine ints instead of
+       (potentially long) byte strings.
+       Args:
+           line_lists - one or more lists of bytestring lines, e.g. base, this and other of a merge
+       Returns:
+           list of array('i') of line ids, one per input list
+    """
+    ids = {}
+    setdefault = ids.setdefault
+    return [array('i', [setdefault(line, len(ids)) for line in lines]) for lines in line_lists]
@@ -47,7 +47,8 @@ Implementation of a Myers Optimal Diff In Python3
 
 
 import sys
-from collections import deque
+
+from .diffutils import intern_lines
 
 # Uses as closely as possible the exact notation of Myers's
 # "An O(ND) Difference Algorithm and Its Variations" and
@@ -135,82 +136,133 @@ from collections import deque
 # Length of an SES is greater than MAX
 
 
-def _myers_ses(a_lines, b_lines):
-    """ Myers algorithm to determine the shortest edit script
+# Linear space refinement (section 4b of the paper)
+#
+# The backtrace approach keeps every V array (one per D) which costs O((N+M)D) memory,
+# and is too much for two large notes with many edits. Instead run the
+# greedy algorithm simultaneously forward from (0,0) and in reverse from
+# (N,M) until the two furthest reaching D-paths overlap. The snake where
+# they meet (the "middle snake") is part of an optimal path, so the problem
+# splits into two independent sub-problems either side of it, each with
+# roughly half the edits. Only two V arrays are ever live.
+
+
+def _myers_middle_snake(a_lines, a_lo, a_hi, b_lines, b_lo, b_hi):
+    """ Find the middle snake of an optimal D-path for a_lines[a_lo:a_hi] and b_lines[b_lo:b_hi]
         Args:
-          a_lines - list of byte strings representing lines of 'from' file
-          b_lines - list of byte strings representing lines of 'to' file
+          a_lines, b_lines - sequences of lines (or interned line ids) to compare
+          a_lo, a_hi, b_lo, b_hi - bounds of the sub-problem
         Returns:
-          a list of V arrays representing the history of vertices
-          used to generate the shortest edit script
+          tuple of (d, x, y, u, v) where d is the length of the SES and
+          (x, y) to (u, v) is the middle snake, relative to (a_lo, b_lo)
     """
-    m, n = len(a_lines), len(b_lines)
-    MAX = m + n
-    trace = []
-    v = [-1 for i in range(2 * MAX + 1)]
-    v[1] = 0
-    for d in range(MAX + 1):
+    n, m = a_hi - a_lo, b_hi - b_lo
+    delta = n - m
+    odd = delta & 1
+    max_d = (n + m + 1) // 2
+    # negative diagonals index from the end of the list, as in the paper's V[-MAX .. MAX]
+    vf = [0] * (2 * max_d + 3)  # furthest x on forward diagonal k
+    vb = [0] * (2 * max_d + 3)  # furthest distance from (n, m) on reverse diagonal k (k = delta - forward k)
+    for d in range(max_d + 1):
         for k in range(-d, d + 1, 2):
-            if k == -d or (k != d and v[k - 1] < v[k + 1]):
-                x = v[k + 1]
+            if k == -d or (k != d and vf[k - 1] < vf[k + 1]):
+                x = vf[k + 1]
             else:
-                x = v[k - 1] + 1
+                x = vf[k - 1] + 1
             y = x - k
-            # Snake of diagonals
-            while x < m and y < n and a_lines[x] == b_lines[y]:
+            x0, y0 = x, y
+            while x < n and y < m and a_lines[a_lo + x] == b_lines[b_lo + y]:
                 x, y = x + 1, y + 1
-            v[k] = x
-            if x >= n and y >= m:
-                return trace
-        # Need to store away the history of vertice traces to later
-        # extract the edit script
-        trace.append(v[:])
-
-
-# Used to extract the SES (shortest edit script) by walking the trace
-# vertices history backwards by D-path length along the frontier.
-# Using the backtrace approach means the edit script itself does
-# NOT have to be stored as it is built, only the V needs be kept across
-# iterations and thereby reduces the total memory footprint
-def _myers_backtrace(trace, a_lines, b_lines):
-    """Yields in reverse order the (prev x, prevy, x, y) for each interation
-        that represents the SES from (N,M) to (0,0)
+            vf[k] = x
+            if odd and -(d - 1) <= delta - k <= d - 1 and x + vb[delta - k] >= n:
+                return 2 * d - 1, x0, y0, x, y
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vb[k - 1] < vb[k + 1]):
+                x = vb[k + 1]
+            else:
+                x = vb[k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a_lines[a_hi - 1 - x] == b_lines[b_hi - 1 - y]:
+                x, y = x + 1, y + 1
+            vb[k] = x
+            if not odd and -d <= delta - k <= d and x + vf[delta - k] >= n:
+                return 2 * d, n - x, m - y, n - x0, m - y0
+
+
+def _myers_matching_blocks(a_lines, a_lo, a_hi, b_lines, b_lo, b_hi):
+    """ Divide and conquer on middle snakes to find the matching lines of an SES
         Args:
-          trace - a list of V arrays representing the history of vertices
-                  used when generating the shortest edit script
-          a_lines - list of byte strings representing lines of 'from' file
-          b_lines - list of byte strings representing lines of 'to' file
-        Yields/Returns:
-          a tuple of prev_x, prev_y, x, y of the vertices of the SES
+          a_lines, b_lines - sequences of lines (or interned line ids) to compare
+          a_lo, a_hi, b_lo, b_hi - bounds to compare
+        Returns:
+          list of (a index, b index, length) runs of matching lines in increasing order
+    """
+    blocks = []
+    # explicit stack, sub-problems pushed right first so they are emitted in order
+    # entries are either a sub-problem (a_lo, a_hi, b_lo, b_hi) or a snake (a index, b index, length)
+    stack = [(a_lo, a_hi, b_lo, b_hi)]
+    while stack:
+        item = stack.pop()
+        if len(item) == 3:
+            blocks.append(item)
+            continue
+        a_lo, a_hi, b_lo, b_hi = item
+        n, m = a_hi - a_lo, b_hi - b_lo
+        if not n or not m:
+            continue
+        d, x, y, u, v = _myers_middle_snake(a_lines, a_lo, a_hi, b_lines, b_lo, b_hi)
+        if d > 1:
+            stack.append((a_lo + u, a_hi, b_lo + v, b_hi))
+            if u > x:
+                stack.append((a_lo + x, b_lo + y, u - x))
+            stack.append((a_lo, a_lo + x, b_lo, b_lo + y))
+        elif d == 1:
+            # one insert or delete, everything else matches either side of it
+            i = 0
+            while i < min(n, m) and a_lines[a_lo + i] == b_lines[b_lo + i]:
+                i += 1
+            if i:
+                blocks.append((a_lo, b_lo, i))
+            if n > m and m > i:
+                blocks.append((a_lo + i + 1, b_lo + i, m - i))
+            elif m > n and n > i:
+                blocks.append((a_lo + i, b_lo + i + 1, n - i))
+        else:
+            blocks.append((a_lo, b_lo, n))
+    return blocks
+
+
+def myers_matching_blocks(a_lines, b_lines):
+    """ Uses the linear space Myers's algorithm to find the lines in common
+        Args:
+          a_lines - sequence of lines of 'from' file, ideally interned line ids see diffutils.intern_lines()
+          b_lines - sequence of lines of 'to' file, ideally interned line ids
+        Returns:
+          list of (a index, b index, length) runs of matching lines in increasing order
+          (adjacent runs are merged)
     """
-    x, y = len(a_lines), len(b_lines)
-    # Each trace represents a D-path length value 1, ..., up to N+M
-    # Reverse the trace history list to get the longest D-Path trace first
-    trace_enum = list(enumerate(trace))
-    trace_enum.reverse()
-    # Determine the diagonal number from V (initial since reversed is (N,M))
-    # Extract prev k diagonal number from movement direction
-    # Then use prev k and V to get prev x and prev y
-    # Climb up any snakes if needed
-    # Rinse and repeat until D = 0 case has been processed
-    for d, v in trace_enum:
-        k = x - y
-        if k == -d or (k != d and v[k - 1] < v[k + 1]):
-            prev_k = k + 1
+    m, n = len(a_lines), len(b_lines)
+    # trim common prefix and suffix, cheap and typically most of a note
+    prefix = 0
+    while prefix < m and prefix < n and a_lines[prefix] == b_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < m - prefix and suffix < n - prefix and a_lines[m - 1 - suffix] == b_lines[n - 1 - suffix]:
+        suffix += 1
+    blocks = []
+    if prefix:
+        blocks.append((0, 0, prefix))
+    blocks.extend(_myers_matching_blocks(a_lines, prefix, m - suffix, b_lines, prefix, n - suffix))
+    if suffix:
+        blocks.append((m - suffix, n - suffix, suffix))
+    merged = []
+    for block in blocks:
+        if merged and merged[-1][0] + merged[-1][2] == block[0] and merged[-1][1] + merged[-1][2] == block[1]:
+            merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + block[2])
         else:
-            prev_k = k - 1
-        prev_x = v[prev_k]
-        prev_y = prev_x - prev_k
-        while x > prev_x and y > prev_y:
-            yield (x - 1, y - 1, x, y)
-            x, y = x - 1, y - 1
-        if d >= 0:
-            yield (prev_x, prev_y, x, y)
-        x, y = prev_x, prev_y
-    # Handle any initial snake (ie. not reached origin yet)
-    while x > 0 and y > 0:
-        yield (x - 1, y - 1, x, y)
-        x, y = x - 1, y - 1
+            merged.append(block)
+    return merged
 
 
 def myers_diff(a_lines, b_lines):
@@ -224,23 +276,15 @@ def myers_diff(a_lines, b_lines):
           indicating the required change:
           b'+ ' - insert, b'- ' - delete, b'  ' - keep
     """
-    m, n = len(a_lines), len(b_lines)
-    res = deque()
-    trace = _myers_ses(a_lines, b_lines)
-    backtrack = _myers_backtrace(trace, a_lines, b_lines)
-    # determine edit that moves from (prev_x, prev_y) to (x,y)
-    # ie. what was done: '+ ','- ','  '
-    for prev_x, prev_y, x, y in backtrack:
-        a_line = a_lines[prev_x] if prev_x < m else None
-        b_line = b_lines[prev_y] if prev_y < n else None
-        if a_line is not None and b_line is not None:
-            if x == prev_x:
-                res.appendleft(b'+ ' + b_line)
-            elif y == prev_y:
-                res.appendleft(b'- ' + a_line)
-            else:
-                res.appendleft(b'  ' + a_line)
-    return list(res)
+    res = []
+    x, y = 0, 0
+    a_ids, b_ids = intern_lines(a_lines, b_lines)
+    for a_index, b_index, length in myers_matching_blocks(a_ids, b_ids) + [(len(a_lines), len(b_lines), 0)]:
+        res.extend(b'- ' + line for line in a_lines[x:a_index])
+        res.extend(b'+ ' + line for line in b_lines[y:b_index])
+        res.extend(b'  ' + line for line in a_lines[a_index:a_index + length])
+        x, y = a_index + length, b_index + length
+    return res
 
 
 def main():
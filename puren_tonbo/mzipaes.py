@@ -29,7 +29,8 @@
 """
 
 from __future__ import print_function
-import zlib, struct, time, sys
+import array, hashlib, hmac, json, os, zlib, struct, time, sys
+from timeit import default_timer
 from ctypes import *  # FIXME only import what's explictly used, then wrap CDLL with shutil.which() - appears to be required for Python 3.12 (maybe others)
 import shutil
 
@@ -46,6 +47,13 @@ try:
 except:
     PYCRYPTOAVAILABLE=0
 
+try:
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    CRYPTOGRAPHYAVAILABLE=1
+except ImportError:
+    CRYPTOGRAPHYAVAILABLE=0
+
 
 class AesZipException(Exception):
     '''Base AES ZIP exception'''
@@ -58,6 +66,104 @@ class BadPassword(AesZipException):
 class UnsupportedFile(AesZipException):
     '''File not encrypted/not supported exception'''
 
+# WinZip AE uses a 128 bit Little Endian counter starting at 1, most
+# libraries only offer Big Endian CTR mode. Rather than encrypting one
+# counter block (and XORing one byte) at a time, build a buffer of counter
+# blocks, encrypt it with a single ECB call and XOR the whole batch.
+CTR_BATCH_BLOCKS = 65536  # 1 MiB of keystream per ECB call
+
+try:
+    array.array('Q')
+
+    def le_counter_blocks(first, count):
+        "count consecutive 128 bit Little Endian counter blocks, starting at first"
+        blocks = array.array('Q', bytes(16 * count))
+        blocks[::2] = array.array('Q', range(first, first + count))  # high 64 bits stay zero
+        if sys.byteorder != 'little':
+            blocks.byteswap()
+        return blocks.tobytes()
+except ValueError:
+    # Python 2.7 array has no 64 bit type
+    def le_counter_blocks(first, count):
+        "count consecutive 128 bit Little Endian counter blocks, starting at first"
+        return b''.join(struct.pack('<2Q', i, 0) for i in range(first, first + count))
+
+if hasattr(int, 'from_bytes'):
+    def xor_bytes(a, b):
+        "XOR equal length byte strings"
+        return (int.from_bytes(a, 'little') ^ int.from_bytes(b, 'little')).to_bytes(len(a), 'little')
+else:
+    def xor_bytes(a, b):
+        "XOR equal length byte strings"
+        return str(bytearray(x ^ y for x, y in zip(bytearray(a), bytearray(b))))
+
+
+def ctr128_le_crypt_ecb(ecb_encrypt, s):
+    """AES CTR with WinZip Little Endian counter (starting at 1),
+    using ecb_encrypt(bytes) - a bulk AES ECB encrypt function for a single key"""
+    result = []
+    counter = 1
+    offset = 0
+    while offset < len(s):
+        chunk = s[offset:offset + 16*CTR_BATCH_BLOCKS]
+        block_count = (len(chunk) + 15) // 16
+        keystream = ecb_encrypt(le_counter_blocks(counter, block_count))
+        result.append(xor_bytes(chunk, keystream[:len(chunk)]))
+        counter += block_count
+        offset += len(chunk)
+    return b''.join(result)
+
+
+class c_pointer(c_void_p):
+    """Pointer restype that ctypes does NOT convert to a Python int (c_int by
+    default, which truncates 64 bit pointers), so it can be passed back as-is"""
+
+
+class Crypto_Stdlib:
+    """hashlib/hmac for key derivation and authentication (always C speed),
+    AES from pycryptodome or cryptography"""
+    KitName = 'hashlib + pycryptodome/cryptography'
+
+    def __init__(p):
+        p.loaded = 0
+        if not hasattr(hashlib, 'pbkdf2_hmac'):
+            return  # Python 2.7.8+ or 3.4+
+        if PYCRYPTOAVAILABLE:
+            p.AE_ctr_crypt = p._pycrypto_ctr_crypt
+            p.loaded = 1
+        elif CRYPTOGRAPHYAVAILABLE:
+            p.AE_ctr_crypt = p._cryptography_ctr_crypt
+            p.loaded = 1
+
+    def AE_gen_salt(p):
+        "Genera 128 bit casuali di salt per AES-256"
+        return os.urandom(16)
+
+    def AE_derive_keys(p, password, salt):
+        "Con la password ZIP e il salt casuale, genera le chiavi per AES \
+       e HMAC-SHA1-80, e i 16 bit di controllo"
+        keylen = {8:16,12:24,16:32}[len(salt)]
+        if sys.version_info >= (3,0) and type(password)!=type(b''):
+            password = bytes(password, 'utf8')
+        s = hashlib.pbkdf2_hmac('sha1', password, salt, 1000, 2*keylen+2)
+        return s[:keylen], s[keylen:2*keylen], s[2*keylen:]
+
+    def _pycrypto_ctr_crypt(p, key, s):
+        "Cifra/decifra in AES-256 CTR con contatore Little Endian"
+        enc = AES.new(key, AES.MODE_CTR, counter=Crypto.Util.Counter.new(128, little_endian=True))
+        return enc.encrypt(s)
+
+    def _cryptography_ctr_crypt(p, key, s):
+        "Cifra/decifra in AES-256 CTR con contatore Little Endian"
+        if len(key) not in (16,24,32): raise UnsupportedFile("BAD AES KEY LENGTH")
+        encryptor = Cipher(algorithms.AES(key), modes.ECB(), backend=default_backend()).encryptor()
+        return ctr128_le_crypt_ecb(encryptor.update, s)
+
+    def AE_hmac_sha1_80(p, key, s):
+        "Autentica con HMAC-SHA1-80"
+        return hmac.new(key, s, hashlib.sha1).digest()[:10]
+
+
 class Crypto_PyCrypto:
     KitName = 'pycrypto 2.6+'
     
@@ -101,6 +207,9 @@ class Crypto_OpenSSL:
                 p.handle = CDLL('libcrypto.so') or CDLL('libcrypto.so.1.0.0')
             else:
                 p.handle = CDLL('libcrypto-1_1') or CDLL('libeay32') or CDLL('libcrypto-38')
+            for func_name in ('EVP_CIPHER_CTX_new', 'EVP_aes_128_ecb', 'EVP_aes_192_ecb', 'EVP_aes_256_ecb', 'EVP_sha1'):
+                getattr(p.handle, func_name).restype = c_pointer
+            p.handle.HMAC.restype = c_void_p
             p.loaded = 1
         except:
             pass
@@ -120,37 +229,31 @@ class Crypto_OpenSSL:
     # implementazioni in Big Endian; inoltre il contatore parte da 1 senza
     # alcun contenuto casuale.
     #
-    # NOTA: la versione C è veloce quanto quella pycrypto; questa, ibrida,
-    # circa 35 volte più lenta!
-    #
-    # !!!CAVE!!! Su Python 3.4 è circa 1,6x più lenta rispetto a Python 2.7!
+    # NOTE the original hybrid version (one AES_ecb_encrypt call per block,
+    # XOR one byte at a time) was around 35 times slower than the C version.
+    # The counter blocks are now encrypted in large batches with a single
+    # EVP ECB call each, see ctr128_le_crypt_ecb()
     def AES_ctr128_le_crypt(self, key, s):
         if len(key) not in (16,24,32): raise UnsupportedFile("BAD AES KEY LENGTH")
-        #~ # This slows down to 755 K/s
-        #~ self.handle.AES_ecb_encrypt.argtypes = [c_char_p, c_char_p, c_void_p, c_int]        
-        #~ self.handle.AES_ecb_encrypt.restype = [c_int]        
-        AES_KEY = create_string_buffer(244)
-        self.handle.AES_set_encrypt_key(key, len(key)*8, AES_KEY)
-        
-        buf = (c_byte*len(s)).from_buffer_copy(s)
-        
-        ctr = create_string_buffer(16)
-        ectr = create_string_buffer(16)
-        pectr = cast(ectr, POINTER(c_byte))
-        cnt = 0
-        j = 0
-        fuAES = self.handle.AES_ecb_encrypt
-        for i in range(len(s)):
-            j=i%16
-            if not j:
-                cnt += 1
-                struct.pack_into('<Q', ctr, 0, cnt)
-                fuAES(ctr, ectr, AES_KEY, 1)
-            buf[i] ^= pectr[j]
-        if sys.version_info >= (3,0):
-            return bytes(buf)
-        else:
-            return str(bytearray(buf))
+        cipher = {16:self.handle.EVP_aes_128_ecb, 24:self.handle.EVP_aes_192_ecb, 32:self.handle.EVP_aes_256_ecb}[len(key)]()
+        ctx = self.handle.EVP_CIPHER_CTX_new()
+        if not ctx:
+            raise AesZipException("EVP_CIPHER_CTX_new FAILED")
+        try:
+            if not self.handle.EVP_EncryptInit_ex(ctx, cipher, None, key, None):
+                raise AesZipException("EVP_EncryptInit_ex FAILED")
+            self.handle.EVP_CIPHER_CTX_set_padding(ctx, 0)
+            outl = c_int(0)
+
+            def ecb_encrypt(blocks):
+                out = create_string_buffer(len(blocks) + 16)
+                if not self.handle.EVP_EncryptUpdate(ctx, out, byref(outl), blocks, len(blocks)):
+                    raise AesZipException("EVP_EncryptUpdate FAILED")
+                return out.raw[:outl.value]
+
+            return ctr128_le_crypt_ecb(ecb_encrypt, s)
+        finally:
+            self.handle.EVP_CIPHER_CTX_free(ctx)
 
     def AE_gen_salt(p):
         "Genera 128 bit casuali di salt per AES-256"
@@ -178,8 +281,9 @@ class Crypto_OpenSSL:
 
     def AE_hmac_sha1_80(p, key, s):
         "Autentica con HMAC-SHA1-80"
-        digest = p.handle.HMAC(p.handle.EVP_sha1(), key, len(key), s, len(s), 0, 0)
-        return cast(digest, POINTER(c_char*10)).contents.raw
+        digest = create_string_buffer(20)
+        p.handle.HMAC(p.handle.EVP_sha1(), key, len(key), s, len(s), digest, None)
+        return digest.raw[:10]
 
 
 
@@ -286,6 +390,9 @@ class Crypto_NSS:
                     p.handle = CDLL(full_dll_path)
                 else:
                     p.handle = CDLL('nss3')
+            for func_name in ('PK11_GetBestSlot', 'PK11_CreatePBEV2AlgorithmID', 'PK11_PBEKeyGen', 'PK11_GetKeyData',
+                                'PK11_ImportSymKey', 'PK11_ParamFromIV', 'PK11_CreateContextBySymKey'):
+                getattr(p.handle, func_name).restype = c_pointer
             p.handle.NSS_NoDB_Init(".")
             # Servono almeno le DLL nss3, softokn3, freebl3, mozglue
             if not p.handle.NSS_IsInitialized():
@@ -427,6 +534,7 @@ class Crypto_GCrypt:
                 p.handle = CDLL('libgcrypt-20.so')
             else:
                 p.handle = CDLL('libgcrypt-20')
+            p.handle.gcry_random_bytes.restype = c_void_p
             p.loaded = 1
         except:
             pass
@@ -580,20 +688,131 @@ NOTE: AE-1 preserves CRC-32 on uncompressed data, AE-2 sets it to zero.
 
 
 
+def measure_crypto_kit(kit, size=16*1024, repeat=3):
+    """Check kit against known values, and time (best of repeat) a key
+    derivation plus AES CTR of size bytes. Returns seconds, or None if kit is broken"""
+    salt = b'\x01' + b'\x00'*15
+    pw = b'password'
+    if kit.AE_derive_keys(pw, salt)[-1] != b'\xE2\xE3':
+        return None
+    if kit.AE_ctr_crypt(salt, pw) != b'\x8A\x8Ar\xFB\xFAA\xE0\xCA':
+        return None
+    data = size*b'x'
+    result = None
+    for _dummy in range(repeat):
+        start = default_timer()
+        kit.AE_derive_keys(pw, salt)
+        kit.AE_ctr_crypt(salt, data)
+        duration = default_timer() - start
+        if result is None or duration < result:
+            result = duration
+    return result
+
+
+# kits in preference order; hashlib KDF (C speed) first, then C/ctypes AES libraries.
+# Static order is the default, nothing is measured at import. Opt-in to the measured (fastest) kit
+# with OS env MZIPAES_CRYPTO_KIT=fastest, see crypto_kit_from_env()
+CRYPTO_KITS = (Crypto_Stdlib, Crypto_PyCrypto, Crypto_OpenSSL, Crypto_Botan, Crypto_NSS, Crypto_GCrypt)
+
 crypto_kit = None
-#import pdb ; pdb.set_trace()
-for C in (Crypto_PyCrypto, Crypto_OpenSSL, Crypto_Botan, Crypto_NSS, Crypto_GCrypt):
+for C in CRYPTO_KITS:
     try:
         test_crypto_kit = C()
-        if test_crypto_kit.loaded:
-            crypto_kit = test_crypto_kit
-            break
     except:
         continue
+    if test_crypto_kit.loaded:
+        crypto_kit = test_crypto_kit
+        break
 if crypto_kit == None:
     #raise UnsupportedFile("NO CRYPTO KIT FOUND - ABORTED!")
     raise ImportError
 
+_crypto_kit_times = None  # cache for measure_crypto_kits()
+
+
+def measure_crypto_kits():
+    """Measure (see measure_crypto_kit()) every kit that loads, once; result is cached.
+    Returns list of (seconds, kit), fastest first, broken kits excluded"""
+    global _crypto_kit_times
+    if _crypto_kit_times is None:
+        results = []
+        for C in CRYPTO_KITS:
+            try:
+                test_crypto_kit = C()
+                if not test_crypto_kit.loaded:
+                    continue
+                test_time = measure_crypto_kit(test_crypto_kit)
+            except:
+                continue
+            if test_time is not None:
+                results.append((test_time, test_crypto_kit))
+        results.sort(key=lambda x: x[0])
+        _crypto_kit_times = results
+    return _crypto_kit_times
+
+
+def select_fastest_crypto_kit(cache_filename=None):
+    """Opt-in, switch crypto_kit to the fastest working kit (measured once, see measure_crypto_kits()).
+    If cache_filename is set, the choice is loaded from it (if still available), else measured and saved to it.
+    Returns the selected kit"""
+    global crypto_kit
+    if cache_filename and os.path.exists(cache_filename):
+        try:
+            with open(cache_filename) as f:
+                kit_class_name = json.load(f)['crypto_kit']
+            for C in CRYPTO_KITS:
+                if C.__name__ == kit_class_name:
+                    test_crypto_kit = C()
+                    if test_crypto_kit.loaded:
+                        crypto_kit = test_crypto_kit
+                        return crypto_kit
+        except Exception:
+            pass  # corrupt cache or kit no longer loads, measure again
+    results = measure_crypto_kits()
+    if results:
+        crypto_kit = results[0][1]
+        if cache_filename:
+            try:
+                with open(cache_filename, 'w') as f:
+                    json.dump({'crypto_kit': crypto_kit.__class__.__name__, 'seconds': dict((kit.__class__.__name__, test_time) for test_time, kit in results)}, f, indent=1, sort_keys=True)
+            except (IOError, OSError):
+                pass  # read-only home, measure again next time
+    return crypto_kit
+
+
+CRYPTO_KIT_ENV = 'MZIPAES_CRYPTO_KIT'
+CRYPTO_KIT_CACHE_ENV = 'MZIPAES_CRYPTO_KIT_CACHE'
+DEFAULT_CRYPTO_KIT_CACHE = os.path.join(os.path.expanduser('~'), '.mzipaes_crypto_kit.json')
+
+
+def crypto_kit_from_env():
+    """Apply OS env MZIPAES_CRYPTO_KIT, called at import. Values:
+
+      * unset/empty - static CRYPTO_KITS preference order (default)
+      * fastest - fastest kit, measured once and saved to MZIPAES_CRYPTO_KIT_CACHE (default ~/.mzipaes_crypto_kit.json)
+      * class name, e.g. Crypto_OpenSSL - that kit, if it loads
+    """
+    global crypto_kit
+    setting = os.environ.get(CRYPTO_KIT_ENV)
+    if not setting:
+        return crypto_kit
+    if setting == 'fastest':
+        return select_fastest_crypto_kit(os.environ.get(CRYPTO_KIT_CACHE_ENV) or DEFAULT_CRYPTO_KIT_CACHE)
+    for C in CRYPTO_KITS:
+        if C.__name__ == setting:
+            try:
+                test_crypto_kit = C()
+            except:
+                break
+            if test_crypto_kit.loaded:
+                crypto_kit = test_crypto_kit
+            break
+    return crypto_kit
+
+
+crypto_kit_from_env()
+
+
 # constants for Zip file compression methods
 ZIP_STORED = 0
 ZIP_DEFLATED = 8
@@ -691,31 +910,9 @@ class MiniZipAE1Reader():
         # Stream di input sul file ZIP
         p.fp = stream
         # Avvia il decompressore Deflate via zlib
-        p.decompressor = zlib.decompressobj(-15)
         p.parse()
-        aes_key, hmac_key, chkword = crypto_kit.AE_derive_keys(password, p.salt)
-        if p.chkword != chkword:
-            raise BadPassword("BAD PASSWORD")
-        if p.digest != crypto_kit.AE_hmac_sha1_80(hmac_key, p.blob):
-            raise AesZipException("BAD HMAC-SHA1-80")
-        cs = crypto_kit.AE_ctr_crypt(aes_key, p.blob)
-        if p.compression_method == ZIP_STORED:
-            p.s = cs
-        elif p.compression_method == ZIP_DEFLATED:
-            p.s = p.decompressor.decompress(cs)
-        else:
-            raise UnsupportedFile("possibly unhandled compression - TODO actually test and try it")
-        if p.ae_version == WZ_AES_V2:
-            crc32 = 0
-        elif p.ae_version == WZ_AES_V1:
-            crc32 = zlib.crc32(p.s) & 0xFFFFFFFF
-            #print('crc in zip meta 0x%x ' % p.crc32)  # DEBUG
-            #print('crc of p.s %r' % p.s)
-            if crc32 != p.crc32:
-                raise UnsupportedFile("BAD CRC-32 (actual) 0x%x != 0x%x (in zip meta)" % (crc32, p.crc32))
-        else:
-            # not sure how we got here, should have been caught earlier
-            raise UnsupportedFile("Unsupported AE-version 0x%x (%r)" % (p.ae_version, p.ae_version))
+        keys = crypto_kit.AE_derive_keys(password, p.salt)
+        p.s = decrypt_entry(keys, p.chkword, p.blob, p.digest, p.compression_method, p.ae_version, p.crc32)
             
     def get(p):
         return p.s
@@ -728,44 +925,327 @@ class MiniZipAE1Reader():
         
     def parse(p):
         p.rewind()
-        if p.fp.read(4) != b'PK\x03\x04':
-            raise UnsupportedFile("BAD LOCAL HEADER")
-        ver1, flag, method, dtime, ddate, crc32, csize, usize, namelen, xhlen = struct.unpack('<5H3I2H', p.fp.read(26))
-        p.encryption_method = method  # first file meta
-        #print('method %r' % method)
-        #print('%r' % ((ver1, flag, method, hex(dtime), hex(ddate), hex(crc32), csize, usize, namelen, xhlen),))
-        #~ print ver1, flag, method, hex(dtime), hex(ddate), hex(crc32), csize, usize, namelen, xhlen
-        if method != 99:
-            raise UnsupportedFile("NOT AES ENCRYPTED method=%r" % method)
-        if xhlen != 11:
-            raise UnsupportedFile("TOO MANY EXT HEADERS (ext header count of %d, expecting 11)" % (xhlen,))
-        p.entry = p.fp.read(namelen)
-        xh, cb, ver, vendor, keybits, method = struct.unpack('<4HBH', p.fp.read(xhlen))
-        p.compression_method = method
-        if (xh, ver, vendor) not in (
-                                        (EXTRA_WZ_AES, WZ_AES_V1, WZ_AES_VENDOR_ID), # AE-1
-                                        (EXTRA_WZ_AES, WZ_AES_V2, WZ_AES_VENDOR_ID), # AE-2
-                                    ):
-            raise UnsupportedFile("UNKNOWN AE PROTOCOL %r" % ((xh, ver, vendor),))
-        p.ae_version = ver
-
-        if keybits == 3:
-            p.salt = p.fp.read(16)
-            DELTA=28
-        elif keybits == 2:
-            p.salt = p.fp.read(12)
-            DELTA=24
-        elif keybits == 1:
-            p.salt = p.fp.read(8)
-            DELTA=20
-        else:
-            raise UnsupportedFile("UNKNOWN AES KEY STRENGTH")
-        p.chkword = p.fp.read(2)
-        p.blob = p.fp.read(csize-DELTA)
+        header = parse_local_header(p.fp)
+        p.encryption_method = header['encryption_method']  # first file meta
+        p.entry = header['entry']
+        p.compression_method = header['compression_method']
+        p.ae_version = header['ae_version']
+        p.salt = header['salt']
+        p.chkword = header['chkword']
+        p.blob = p.fp.read(header['csize'] - header['overhead'])
         p.digest = p.fp.read(10)
-        p.usize = usize
-        p.crc32 = crc32
-        
+        p.usize = header['usize']
+        p.crc32 = header['crc32']
+
+
+def decrypt_entry(keys, chkword, blob, digest, compression_method, ae_version, crc32):
+    """Verify password and HMAC, decrypt and de-compress a single entry.
+    keys is the (aes_key, hmac_key, chkword) tuple from AE_derive_keys()"""
+    aes_key, hmac_key, expected_chkword = keys
+    if chkword != expected_chkword:
+        raise BadPassword("BAD PASSWORD")
+    if digest != crypto_kit.AE_hmac_sha1_80(hmac_key, blob):
+        raise AesZipException("BAD HMAC-SHA1-80")
+    cs = crypto_kit.AE_ctr_crypt(aes_key, blob)
+    if compression_method == ZIP_STORED:
+        s = cs
+    elif compression_method == ZIP_DEFLATED:
+        s = zlib.decompressobj(-15).decompress(cs)
+    else:
+        raise UnsupportedFile("possibly unhandled compression - TODO actually test and try it")
+    if ae_version == WZ_AES_V2:
+        pass  # no CRC
+    elif ae_version == WZ_AES_V1:
+        actual_crc32 = zlib.crc32(s) & 0xFFFFFFFF
+        #print('crc in zip meta 0x%x ' % crc32)  # DEBUG
+        #print('crc of s %r' % s)
+        if actual_crc32 != crc32:
+            raise UnsupportedFile("BAD CRC-32 (actual) 0x%x != 0x%x (in zip meta)" % (actual_crc32, crc32))
+    else:
+        # not sure how we got here, should have been caught earlier
+        raise UnsupportedFile("Unsupported AE-version 0x%x (%r)" % (ae_version, ae_version))
+    return s
+
+
+def parse_local_header(stream):
+    """Parse the (first) local file header and AES extra field from current position of stream.
+    Does NOT derive keys or decrypt, on return stream is positioned at the start of the encrypted data.
+    Returns dict of header values.
+    """
+    if stream.read(4) != b'PK\x03\x04':
+        raise UnsupportedFile("BAD LOCAL HEADER")
+    ver1, flag, method, dtime, ddate, crc32, csize, usize, namelen, xhlen = struct.unpack('<5H3I2H', stream.read(26))
+    #print('method %r' % method)
+    #print('%r' % ((ver1, flag, method, hex(dtime), hex(ddate), hex(crc32), csize, usize, namelen, xhlen),))
+    #~ print ver1, flag, method, hex(dtime), hex(ddate), hex(crc32), csize, usize, namelen, xhlen
+    if method != 99:
+        raise UnsupportedFile("NOT AES ENCRYPTED method=%r" % method)
+    if xhlen != 11:
+        raise UnsupportedFile("TOO MANY EXT HEADERS (ext header count of %d, expecting 11)" % (xhlen,))
+    entry = stream.read(namelen)
+    xh, cb, ver, vendor, keybits, compression_method = struct.unpack('<4HBH', stream.read(xhlen))
+    if (xh, ver, vendor) not in (
+                                    (EXTRA_WZ_AES, WZ_AES_V1, WZ_AES_VENDOR_ID), # AE-1
+                                    (EXTRA_WZ_AES, WZ_AES_V2, WZ_AES_VENDOR_ID), # AE-2
+                                ):
+        raise UnsupportedFile("UNKNOWN AE PROTOCOL %r" % ((xh, ver, vendor),))
+
+    # salt (8, 12, or 16) + chkword (2) + HMAC (10)
+    if keybits == 3:
+        salt_len = 16
+    elif keybits == 2:
+        salt_len = 12
+    elif keybits == 1:
+        salt_len = 8
+    else:
+        raise UnsupportedFile("UNKNOWN AES KEY STRENGTH")
+    salt = stream.read(salt_len)
+    chkword = stream.read(2)
+    return {
+        'encryption_method': method,
+        'compression_method': compression_method,
+        'ae_version': ver,
+        'key_bits': 64 * (keybits + 1),
+        'entry': entry,
+        'salt': salt,
+        'chkword': chkword,
+        'crc32': crc32,
+        'csize': csize,
+        'usize': usize,
+        'overhead': salt_len + 12,
+    }
+
+
+def dos_datetime(timestamp):
+    "Return (dostime, dosdate) for seconds since epoch, local time as used by zip"
+    t = time.localtime(timestamp)
+    if t.tm_year < 1980:
+        return 0, (0 << 9) | (1 << 5) | 1  # 1980-01-01 00:00:00
+    dosdate = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    dostime = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    return dostime, dosdate
+
+
+def dos_datetime_to_timestamp(dostime, dosdate):
+    "Return seconds since epoch for zip (local time) dostime and dosdate"
+    return time.mktime((
+        (dosdate >> 9) + 1980, max((dosdate >> 5) & 0xF, 1), max(dosdate & 0x1F, 1),
+        dostime >> 11, (dostime >> 5) & 0x3F, (dostime & 0x1F) * 2,
+        0, 0, -1
+    ))
+
+
+class MiniZipAEArchive():
+    """Multi-entry AES ZIP archive, e.g. a notebook of many notes in one file.
+    Reads AE-1/AE-2, writes AE-1.
+
+    Entries are located via the central directory, so listing (and sizes)
+    does NOT need the password and get() only reads/decrypts one entry.
+    Each entry has its own salt (re-using a salt would re-use the CTR
+    keystream), derived keys are cached by salt so each entry only runs
+    the KDF once for the life of the instance.
+
+    put() and remove() update the archive in-place; new entries are
+    written where the central directory was and then flush() (re)writes
+    the central directory. Replaced/removed entries leave dead space,
+    use compact() to write a copy without it.
+    """
+    def __init__ (p, stream, password=None, compression=ZIP_DEFLATED):
+        p.fp = stream
+        if password is not None and sys.version_info >= (3,0) and type(password)!=type(b''):
+            password = bytes(password, 'utf8')
+        p.password = password
+        p.compression_method = compression
+        p.entries = {}  # name -> info dict
+        p.cdir_offset = 0
+        p.key_cache = {}  # salt -> AE_derive_keys() result
+        p.read_central_directory()
+
+    def close(p):
+        p.fp.close()
+
+    def namelist(p):
+        return sorted(p.entries, key=lambda name: p.entries[name]['offset'])
+
+    def getinfo(p, name):
+        try:
+            return p.entries[name]
+        except KeyError:
+            raise AesZipException("NO ENTRY NAMED %r" % (name,))
+
+    def derive_keys(p, salt):
+        keys = p.key_cache.get(salt)
+        if keys is None:
+            if p.password is None:
+                raise BadPassword("NO PASSWORD")
+            keys = p.key_cache[salt] = crypto_kit.AE_derive_keys(p.password, salt)
+        return keys
+
+    def check_password(p):
+        "Verify password against the first AES entry, without decrypting it"
+        for name in p.namelist():
+            info = p.entries[name]
+            if info['encryption_method'] != 99:
+                continue
+            p.fp.seek(info['offset'])
+            header = parse_local_header(p.fp)
+            if header['chkword'] != p.derive_keys(header['salt'])[2]:
+                raise BadPassword("BAD PASSWORD")
+            return
+
+    def get(p, name):
+        info = p.getinfo(name)
+        if info['encryption_method'] != 99:
+            raise UnsupportedFile("NOT AES ENCRYPTED method=%r" % info['encryption_method'])
+        p.fp.seek(info['offset'])
+        header = parse_local_header(p.fp)
+        blob = p.fp.read(info['csize'] - header['overhead'])  # central directory size, local may be zero if streamed
+        digest = p.fp.read(10)
+        keys = p.derive_keys(header['salt'])
+        return decrypt_entry(keys, header['chkword'], blob, digest, header['compression_method'], header['ae_version'], info['crc32'])
+
+    def put(p, name, s, timestamp=None):
+        "Add or replace entry name with bytes s, call flush() once done"
+        if p.password is None:
+            raise BadPassword("NO PASSWORD")
+        if timestamp is None:
+            timestamp = time.time()
+        salt = crypto_kit.AE_gen_salt()
+        aes_key, hmac_key, chkword = p.key_cache[salt] = crypto_kit.AE_derive_keys(p.password, salt)
+        crc32 = zlib.crc32(s) & 0xFFFFFFFF
+        if p.compression_method == ZIP_DEFLATED:
+            compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+            cs = compressor.compress(s) + compressor.flush()
+        else:
+            cs = s  # assume ZIP_STORED
+        blob = crypto_kit.AE_ctr_crypt(aes_key, cs)
+        dostime, dosdate = dos_datetime(timestamp)
+        info = {
+            'name': name,
+            'offset': p.cdir_offset,
+            'flag': 0x801,  # encrypted, utf-8 filename
+            'encryption_method': 99,
+            'compression_method': p.compression_method,
+            'ae_version': WZ_AES_V1,
+            'key_bits': 256,
+            'dostime': dostime,
+            'dosdate': dosdate,
+            'mtime': dos_datetime_to_timestamp(dostime, dosdate),
+            'crc32': crc32,
+            'csize': len(cs) + 28,  # salt (16) + chkword (2) + len(s) + HMAC (10)
+            'usize': len(s),
+        }
+        entry = name.encode('utf8')
+        p.fp.seek(p.cdir_offset)
+        p.fp.write(b'PK\x03\x04' + struct.pack('<5H3I2H', 0x33, info['flag'], 99, dostime, dosdate, crc32, info['csize'], info['usize'], len(entry), 11) + entry + p.AEH(info))
+        p.fp.write(salt)
+        p.fp.write(chkword)
+        p.fp.write(blob)
+        p.fp.write(crypto_kit.AE_hmac_sha1_80(hmac_key, blob))
+        p.cdir_offset = p.fp.tell()
+        p.entries[name] = info
+
+    def remove(p, name):
+        "Remove entry name, call flush() once done"
+        p.getinfo(name)
+        del p.entries[name]
+
+    def flush(p):
+        "(Re)write central directory"
+        p.fp.seek(p.cdir_offset)
+        p.write_central_directory(p.fp, p.cdir_offset)
+        p.fp.truncate()
+        p.fp.flush()
+
+    def compact(p, out_stream):
+        "Write archive to out_stream without dead space. Entries are copied still encrypted, no KDF/decrypt needed"
+        offsets = {}
+        for name in p.namelist():
+            info = p.entries[name]
+            p.fp.seek(info['offset'])
+            local_header = p.fp.read(30)
+            namelen, xhlen = struct.unpack('<2H', local_header[26:30])
+            offsets[name] = out_stream.tell()
+            out_stream.write(local_header + p.fp.read(namelen + xhlen + info['csize']))
+        p.write_central_directory(out_stream, out_stream.tell(), offsets)
+        out_stream.flush()
+
+    def AEH(p, info):
+        return struct.pack('<4HBH', EXTRA_WZ_AES, 7, info['ae_version'], WZ_AES_VENDOR_ID, info['key_bits'] // 64 - 1, info['compression_method'])
+
+    def write_central_directory(p, stream, cdir_offset, offsets=None):
+        cdir = []
+        names = p.namelist()
+        for name in names:
+            info = p.entries[name]
+            entry = name.encode('utf8')
+            offset = info['offset'] if offsets is None else offsets[name]
+            if info['encryption_method'] == 99:
+                extra = p.AEH(info)
+                method = 99
+            else:
+                extra = b''
+                method = info['compression_method']
+            cdir.append(b'PK\x01\x02' + struct.pack('<6H3I5H2I', 0x33, 0x33, info['flag'], method, info['dostime'], info['dosdate'], info['crc32'], info['csize'], info['usize'], len(entry), len(extra), 0, 0, 0, 0x20, offset) + entry + extra)
+        cdir = b''.join(cdir)
+        stream.write(cdir)
+        stream.write(b'PK\x05\x06' + struct.pack('<4H2IH', 0, 0, len(names), len(names), len(cdir), cdir_offset, 0))
+
+    def read_central_directory(p):
+        p.fp.seek(0, 2)
+        size = p.fp.tell()
+        if not size:
+            return  # new, empty archive
+        tail_size = min(size, 22 + 0xFFFF)  # End of central directory record, plus maximum comment size
+        p.fp.seek(size - tail_size)
+        tail = p.fp.read(tail_size)
+        pos = tail.rfind(b'PK\x05\x06')
+        if pos < 0:
+            raise UnsupportedFile("NO END OF CENTRAL DIRECTORY")
+        disk, cdir_disk, disk_entries, entries, cdir_size, cdir_offset, commentlen = struct.unpack('<4H2IH', tail[pos+4:pos+22])
+        p.fp.seek(cdir_offset)
+        cdir = p.fp.read(cdir_size)
+        p.cdir_offset = cdir_offset
+        pos = 0
+        for _dummy in range(entries):
+            if cdir[pos:pos+4] != b'PK\x01\x02':
+                raise UnsupportedFile("BAD CENTRAL DIRECTORY")
+            ver_made, ver_needed, flag, method, dostime, dosdate, crc32, csize, usize, namelen, xhlen, commentlen, disk_start, internal_attr, external_attr, offset = struct.unpack('<6H3I5H2I', cdir[pos+4:pos+46])
+            pos += 46
+            entry = cdir[pos:pos+namelen]
+            extra = cdir[pos+namelen:pos+namelen+xhlen]
+            pos += namelen + xhlen + commentlen
+            if flag & 0x800:
+                name = entry.decode('utf8')
+            else:
+                name = entry.decode('cp437')
+            info = {
+                'name': name,
+                'offset': offset,
+                'flag': flag,
+                'encryption_method': method,
+                'compression_method': method,
+                'ae_version': None,
+                'key_bits': None,
+                'dostime': dostime,
+                'dosdate': dosdate,
+                'mtime': dos_datetime_to_timestamp(dostime, dosdate),
+                'crc32': crc32,
+                'csize': csize,
+                'usize': usize,
+            }
+            # look for WinZip AES extra field
+            xpos = 0
+            while xpos + 4 <= len(extra):
+                xh, cb = struct.unpack('<2H', extra[xpos:xpos+4])
+                if xh == EXTRA_WZ_AES and cb >= 7:
+                    ver, vendor, keybits, info['compression_method'] = struct.unpack('<2HBH', extra[xpos+4:xpos+11])
+                    info['ae_version'] = ver
+                    info['key_bits'] = 64 * (keybits + 1)
+                xpos += 4 + cb
+            if name.endswith('/'):
+                continue  # directory entry
+            p.entries[name] = info
 
 
 if __name__ == '__main__':
@@ -786,7 +1266,10 @@ if __name__ == '__main__':
     salt = b'\x01' + b'\x00'*15
     pw = b'password'
 
-    for C in (Crypto_Botan, Crypto_PyCrypto, Crypto_NSS, Crypto_OpenSSL, Crypto_GCrypt):
+    print('Selected', crypto_kit.KitName)
+    for test_time, kit in measure_crypto_kits():
+        print('Measured %.4f seconds %s' % (test_time, kit.KitName))
+    for C in (Crypto_Stdlib, Crypto_Botan, Crypto_PyCrypto, Crypto_NSS, Crypto_OpenSSL, Crypto_GCrypt):
         try:
             o = C()
             if o.loaded:
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:ts=4:sw=4:softtabstop=4:smarttab:expandtab
+
+"""
+Implementation of a Patience Diff In Python3
+"""
+
+# Patience diff, as described by Bram Cohen (and as used by bzr and git diff --patience)
+#
+#  1. Match the common head and tail of the region.
+#  2. Find lines that occur exactly once in both A and B (unique lines).
+#  3. Take the longest increasing subsequence of those, ordered by position
+#     in A and in B, as anchors (found with patience sorting, hence the name).
+#  4. Repeat for each gap between anchors.
+#
+# A region with no unique lines left is handed to a fallback engine
+# (histogram by default, or Myers), so only the unmatched gaps pay the
+# cost of a full diff. For large, mostly similar notes nearly every line
+# is matched by anchors which is close to linear time.
+
+from bisect import bisect_left
+import sys
+
+from .diffutils import intern_lines
+from .histogramdiff import histogram_matching_blocks
+from .myersdiff import myers_matching_blocks
+
+
+fallback_engines = {
+    'histogram': histogram_matching_blocks,
+    'myers': myers_matching_blocks,
+}
+
+
+def _unique_anchors(a_ids, a_lo, a_hi, b_ids, b_lo, b_hi):
+    """Find the longest increasing sequence of lines unique in both regions
+        Returns:
+          list of (a index, b index) in increasing order, possibly empty
+    """
+    a_unique = {}  # line id -> index, or None if repeated
+    for i in range(a_lo, a_hi):
+        line_id = a_ids[i]
+        a_unique[line_id] = None if line_id in a_unique else i
+    b_unique = {}
+    for i in range(b_lo, b_hi):
+        line_id = b_ids[i]
+        if a_unique.get(line_id) is not None:
+            b_unique[line_id] = None if line_id in b_unique else i
+    candidates = [(a_unique[line_id], b_index) for line_id, b_index in b_unique.items() if b_index is not None]
+    if not candidates:
+        return []
+    candidates.sort()
+
+    # patience sort on b index, tops[p] is the smallest b index ending an increasing run of length p + 1
+    tops = []
+    top_candidate = []
+    back_pointers = []
+    for candidate_index, (a_index, b_index) in enumerate(candidates):
+        pile = bisect_left(tops, b_index)
+        if pile == len(tops):
+            tops.append(b_index)
+            top_candidate.append(candidate_index)
+        else:
+            tops[pile] = b_index
+            top_candidate[pile] = candidate_index
+        back_pointers.append(top_candidate[pile - 1] if pile else -1)
+    anchors = []
+    candidate_index = top_candidate[-1]
+    while candidate_index >= 0:
+        anchors.append(candidates[candidate_index])
+        candidate_index = back_pointers[candidate_index]
+    anchors.reverse()
+    return anchors
+
+
+def patience_matching_blocks(a_ids, b_ids, fallback='histogram'):
+    """ Uses the patience algorithm to find the lines in common
+        Args:
+          a_ids - sequence of line ids of 'from' file, see diffutils.intern_lines()
+          b_ids - sequence of line ids of 'to' file
+          fallback - name of engine for gaps without unique lines, "histogram" or "myers"
+        Returns:
+          list of (a index, b index, length) runs of matching lines in increasing order
+          (adjacent runs are merged)
+    """
+    fallback_matching_blocks = fallback_engines[fallback]
+    blocks = []
+    # explicit stack, entries are either a region (a_lo, a_hi, b_lo, b_hi) or a block (a index, b index, length)
+    stack = [(0, len(a_ids), 0, len(b_ids))]
+    while stack:
+        item = stack.pop()
+        if len(item) == 3:
+            blocks.append(item)
+            continue
+        a_lo, a_hi, b_lo, b_hi = item
+        # match common head and tail
+        head = 0
+        while a_lo + head < a_hi and b_lo + head < b_hi and a_ids[a_lo + head] == b_ids[b_lo + head]:
+            head += 1
+        if head:
+            blocks.append((a_lo, b_lo, head))
+            a_lo, b_lo = a_lo + head, b_lo + head
+        tail = 0
+        while a_lo < a_hi - tail and b_lo < b_hi - tail and a_ids[a_hi - 1 - tail] == b_ids[b_hi - 1 - tail]:
+            tail += 1
+        if tail:
+            a_hi, b_hi = a_hi - tail, b_hi - tail
+            stack.append((a_hi, b_hi, tail))
+        if a_lo == a_hi or b_lo == b_hi:
+            continue
+
+        anchors = _unique_anchors(a_ids, a_lo, a_hi, b_ids, b_lo, b_hi)
+        if not anchors:
+            gap_blocks = fallback_matching_blocks(a_ids[a_lo:a_hi], b_ids[b_lo:b_hi])
+            blocks.extend((a_lo + a_index, b_lo + b_index, length) for a_index, b_index, length in gap_blocks)
+            continue
+        items = []
+        for a_index, b_index in anchors:
+            items.append((a_lo, a_index, b_lo, b_index))
+            items.append((a_index, b_index, 1))
+            a_lo, b_lo = a_index + 1, b_index + 1
+        items.append((a_lo, a_hi, b_lo, b_hi))
+        items.reverse()
+        stack.extend(items)
+
+    merged = []
+    for block in blocks:
+        if not block[2]:
+            continue
+        if merged and merged[-1][0] + merged[-1][2] == block[0] and merged[-1][1] + merged[-1][2] == block[1]:
+            merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + block[2])
+        else:
+            merged.append(block)
+    return merged
+
+
+def patience_diff(a_lines, b_lines, fallback='histogram'):
+    """ Uses the patience algorithm to create a diff from a to b
+        Args:
+          a_lines - list of byte strings representing lines of 'from' file
+          b_lines - list of byte strings representing lines of 'to' file
+          fallback - name of engine for gaps without unique lines, "histogram" or "myers"
+        Returns:
+          list of edit lines to convert the 'from' file contents to the 'to'
+          All lines returned are preceded by a two character string
+          indicating the required change:
+          b'+ ' - insert, b'- ' - delete, b'  ' - keep
+    """
+    res = []
+    x, y = 0, 0
+    a_ids, b_ids = intern_lines(a_lines, b_lines)
+    for a_index, b_index, length in patience_matching_blocks(a_ids, b_ids, fallback) + [(len(a_lines), len(b_lines), 0)]:
+        res.extend(b'- ' + line for line in a_lines[x:a_index])
+        res.extend(b'+ ' + line for line in b_lines[y:b_index])
+        res.extend(b'  ' + line for line in a_lines[a_index:a_index + length])
+        x, y = a_index + length, b_index + length
+    return res
+
+
+def main():
+    """ Uses the patience algorithm to produce the diff from file a to file b
+        Args:
+          from_path to file a
+          to_path to file b
+        Returns 0:
+          prints the diff of from_file to to_file
+          All lines returned are preceded by a two character string
+          indicating the required change:
+          b'+ ' - insert, b'- ' - delete, b'  ' - keep
+    """
+    argv = sys.argv
+    if len(argv) < 3:
+        print("patiencediff.py from_path to_path")
+        return 1
+    fromfile = argv[1]
+    tofile = argv[2]
+    # Can be used on text with any encoding (even mixed) so treat
+    # all as bytestrings
+    with open(fromfile, 'rb') as ff:
+        a = ff.read()
+    with open(tofile, 'rb') as tf:
+        b = tf.read()
+    res = patience_diff(a.splitlines(True), b.splitlines(True))
+    print(b''.join(res).decode('utf-8'), end="")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: us-ascii -*-
+# vim:ts=4:sw=4:softtabstop=4:smarttab:expandtab
+"""Benchmark for the diff engines and 3-way merge
+
+Generates large (synthetic) merge fixtures, base plus two independently
+edited copies, then times each diff engine and Merge3Way diff_type.
+Diff times are compared against a baseline, stdlib difflib.SequenceMatcher
+on the same lines.
+
+Sample usage:
+
+    python -m puren_tonbo.tests.benchmark_diff
+    python -m puren_tonbo.tests.benchmark_diff 20000 myers histogram
+"""
+
+import difflib
+import random
+import sys
+import time
+
+import puren_tonbo.diff3merge
+from puren_tonbo.histogramdiff import HistogramDiffer
+from puren_tonbo.myersdiff import myers_diff
+from puren_tonbo.patiencediff import patience_diff
+
+
+def generate_merge_fixture(line_count, edit_count, seed=1234):
+    """Returns tuple of (base, this, other) bytestrings.
+    Lines are drawn from a limited vocabulary so there are many repeated lines, like real notes (blank lines, bullets, etc.)
+    """
+    rand = random.Random(seed)
+    vocabulary = [b'line of note text %d, with some padding to be a realistic length\n' % x for x in range(line_count // 4)] + [b'\n', b'* \n', b'---\n']
+    base_lines = [rand.choice(vocabulary) for _ in range(line_count)]
+
+    def edit(lines, tag):
+        lines = list(lines)
+        for x in range(edit_count):
+            i = rand.randrange(len(lines))
+            operation = rand.random()
+            if operation < 0.3:
+                lines.insert(i, b'%s insert %d\n' % (tag, x))
+            elif operation < 0.6:
+                del lines[i]
+            else:
+                lines[i] = b'%s change %d\n' % (tag, x)
+        return lines
+
+    return b''.join(base_lines), b''.join(edit(base_lines, b'this')), b''.join(edit(base_lines, b'other'))
+
+
+def difflib_diff(a, b):
+    """Baseline, returns number of changed (deleted plus inserted) lines"""
+    edits = 0
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag != 'equal':
+            edits += (i2 - i1) + (j2 - j1)
+    return edits
+
+
+def timeit(func, *args):
+    start_time = time.time()
+    result = func(*args)
+    return time.time() - start_time, result
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+
+    line_count = 10000
+    if len(argv) > 1:
+        line_count = int(argv[1])
+    diff_types = argv[2:] or ['myers', 'histogram', 'patience']  # ndiff is very slow for large files, only run when requested
+    base, this, other = generate_merge_fixture(line_count, line_count // 20)
+    base_lines, this_lines = base.splitlines(True), this.splitlines(True)
+    print('%d base lines, %d this lines, %d other lines' % (len(base_lines), len(this_lines), len(other.splitlines(True))))
+
+    engines = {
+        'myers': lambda a, b: myers_diff(a, b),
+        'histogram': lambda a, b: HistogramDiffer(a, b).histdiff(),
+        'patience': lambda a, b: patience_diff(a, b),
+    }
+    baseline_elapsed, baseline_edits = timeit(difflib_diff, base_lines, this_lines)
+    print('%-10s diff  %8.3f secs, %d edits (baseline)' % ('difflib', baseline_elapsed, baseline_edits))
+    for diff_type in diff_types:
+        if diff_type in engines:
+            elapsed, result = timeit(engines[diff_type], base_lines, this_lines)
+            print('%-10s diff  %8.3f secs, %d edits, %.2fx difflib speed' % (diff_type, elapsed, len([line for line in result if line[:2] != b'  ']), baseline_elapsed / max(elapsed, 1e-6)))
+        init_elapsed, merger = timeit(puren_tonbo.diff3merge.Merge3Way, this, other, base, diff_type, 'ort')  # diffs base against this and other
+        elapsed, result = timeit(merger.merge)
+        print('%-10s merge %8.3f secs (diffs %.3f), %d conflicts' % (diff_type, init_elapsed + elapsed, init_elapsed, len(merger.get_conflicts())))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,14 +11,21 @@ Sample usage:
 """
 
 import glob
+import json
 import os
 import pdb
+import re
 import sys
 import shutil
+import sqlite3
+import struct
 import tempfile
+import threading
+import time
 import traceback
 
 from io import BytesIO as FakeFile  # py3
+from io import StringIO
 
 try:
     if sys.version_info < (2, 3):
@@ -30,6 +37,18 @@ except ImportError:
     unittest2 = None
 
 import puren_tonbo
+import puren_tonbo.agent
+import puren_tonbo.agent_client
+import puren_tonbo.diff3merge
+import puren_tonbo.diffutils
+import puren_tonbo.histogramdiff
+import puren_tonbo.myersdiff
+import puren_tonbo.patiencediff
+import puren_tonbo.watcher
+from puren_tonbo.tools import ptcipher
+from puren_tonbo.tools import ptdiff3merge
+from puren_tonbo.tools import ptrecrypt
+from puren_tonbo.tools import ptverify
 
 
 is_py3 = sys.version_info >= (3,)
@@ -247,6 +266,76 @@ class TestBaseEncryptedFileVimDecrypt(TestBaseEncryptedFileUtil, TestBaseEncrypt
         self.skip('VimCrypt encryption not implemented yet')
 
 
+class TestMzipaesCryptoKits(TestUtil):
+    salt = b'\x01' + b'\x00' * 15
+    test_password_bytes = b'password'
+
+    def setUp(self):
+        if not puren_tonbo.mzipaes:
+            self.skip('mzipaes not available')
+
+    def test_stdlib_kit_known_values(self):
+        kit = puren_tonbo.mzipaes.Crypto_Stdlib()
+        if not kit.loaded:
+            self.skip('Crypto_Stdlib not available (needs pycryptodome or cryptography)')
+        self.assertEqual(b'\xE2\xE3', kit.AE_derive_keys(self.test_password_bytes, self.salt)[-1])
+        self.assertEqual(b'j|\xB9\xA9\xEE3#\x00|\x17', kit.AE_hmac_sha1_80(self.salt, self.test_password_bytes))
+        self.assertEqual(b'\x8A\x8Ar\xFB\xFAA\xE0\xCA', kit.AE_ctr_crypt(self.salt, self.test_password_bytes))
+
+    def test_ctr_crypt_batched_matches_selected_kit(self):
+        # spans multiple batches, ending with a partial block
+        plain_text = b'x' * (16 * puren_tonbo.mzipaes.CTR_BATCH_BLOCKS * 2 + 5)
+        kit = puren_tonbo.mzipaes.Crypto_Stdlib()
+        if not puren_tonbo.mzipaes.CRYPTOGRAPHYAVAILABLE:
+            self.skip('cryptography not available')
+        self.assertEqual(puren_tonbo.mzipaes.crypto_kit.AE_ctr_crypt(self.salt, plain_text), kit._cryptography_ctr_crypt(self.salt, plain_text))
+
+    def test_crypto_kit_static_preference_and_opt_in_measure(self):
+        mzipaes = puren_tonbo.mzipaes
+        first_loaded = [C for C in mzipaes.CRYPTO_KITS if C().loaded][0]
+        self.assertTrue(isinstance(mzipaes.crypto_kit, first_loaded))
+        saved_crypto_kit = mzipaes.crypto_kit
+        try:
+            results = mzipaes.measure_crypto_kits()
+            self.assertTrue(results)
+            self.assertTrue(results is mzipaes.measure_crypto_kits())  # cached
+            self.assertTrue(mzipaes.select_fastest_crypto_kit() is results[0][1])
+            self.assertTrue(mzipaes.crypto_kit is results[0][1])
+
+            # env opt-in, measured choice saved and then re-used
+            cache_dir = tempfile.mkdtemp(prefix='pt_mzipaes_')
+            saved_environ = dict(os.environ)
+            try:
+                cache_filename = os.path.join(cache_dir, 'kit.json')
+                os.environ[mzipaes.CRYPTO_KIT_ENV] = 'fastest'
+                os.environ[mzipaes.CRYPTO_KIT_CACHE_ENV] = cache_filename
+                mzipaes.crypto_kit = saved_crypto_kit
+                self.assertEqual(results[0][1].__class__, mzipaes.crypto_kit_from_env().__class__)
+                with open(cache_filename) as f:
+                    self.assertEqual(results[0][1].__class__.__name__, json.load(f)['crypto_kit'])
+                with open(cache_filename, 'w') as f:
+                    json.dump({'crypto_kit': first_loaded.__name__}, f)
+                self.assertTrue(isinstance(mzipaes.crypto_kit_from_env(), first_loaded))  # loaded, not measured
+                os.environ[mzipaes.CRYPTO_KIT_ENV] = results[-1][1].__class__.__name__
+                self.assertTrue(isinstance(mzipaes.crypto_kit_from_env(), results[-1][1].__class__))
+            finally:
+                os.environ.clear()
+                os.environ.update(saved_environ)
+                shutil.rmtree(cache_dir)
+        finally:
+            mzipaes.crypto_kit = saved_crypto_kit
+
+    def test_openssl_kit(self):
+        kit = puren_tonbo.mzipaes.Crypto_OpenSSL()
+        if not kit.loaded:
+            self.skip('OpenSSL libcrypto not available')
+        self.assertEqual(b'\xE2\xE3', kit.AE_derive_keys(self.test_password_bytes, self.salt)[-1])
+        self.assertEqual(b'j|\xB9\xA9\xEE3#\x00|\x17', kit.AE_hmac_sha1_80(self.salt, self.test_password_bytes))
+        self.assertEqual(b'\x8A\x8Ar\xFB\xFAA\xE0\xCA', kit.AE_ctr_crypt(self.salt, self.test_password_bytes))
+        plain_text = b'x' * (16 * puren_tonbo.mzipaes.CTR_BATCH_BLOCKS + 21)
+        self.assertEqual(puren_tonbo.mzipaes.crypto_kit.AE_ctr_crypt(self.salt, plain_text), kit.AE_ctr_crypt(self.salt, plain_text))
+
+
 # Tests decryption (read ONLY) of sample test data
 
 class TestFileSystemNotes(TestUtil):
@@ -587,6 +676,66 @@ ter no rule than cruel rule.\n'''
         data = note_root.note_contents(test_note_filename, password)
         self.assertEqual(self.plain_text_data_linux_newlines, data)
 
+    def test_aesop_win_oldstored_zip_zipcrypto_decrypt(self):
+        # PKZIP traditional (ZipCrypto) engine shared with VimCrypt~01
+        self.skip_if_missing_handler(puren_tonbo.VimDecrypt)
+        vimdecrypt = puren_tonbo.vimdecrypt
+        with open(os.path.join(self.data_folder, 'aesop_win_7z.oldstored.zip'), 'rb') as file_object:
+            local_header = file_object.read(30)
+            namelen, xhlen = struct.unpack('<2H', local_header[26:30])
+            csize = struct.unpack('<I', local_header[18:22])[0]
+            file_object.seek(namelen + xhlen, 1)
+            crypted_data = file_object.read(csize)
+        data = vimdecrypt.zipcrypto_decrypt(vimdecrypt.zipcrypto_keys(self.test_password_bytes), crypted_data)[12:]  # skip encryption header
+        self.assertEqual(self.plain_text_data_windows_newlines.encode('us-ascii'), bytes(data))
+
+    def test_vimcrypt_hashpw_cache(self):
+        self.skip_if_missing_handler(puren_tonbo.VimDecrypt)
+        vimdecrypt = puren_tonbo.vimdecrypt
+        vimdecrypt.wipe_key_cache()
+        # vim's own self test vector, see vimdecrypt.bf_test()
+        key = vimdecrypt.hashpw(b'password', b'salt')
+        self.assertEqual(b'\xad\x3d\xfa\x7f\xe8\xea\x40\xf6', bytes(vimdecrypt.makeblowfish(None, key).encrypt(b'plaintxt')))
+        self.assertEqual(key, vimdecrypt.cached_hashpw(b'password', b'salt'))
+        self.assertEqual(1, len(vimdecrypt.hashpw_cache))
+        first_cache_key = list(vimdecrypt.hashpw_cache)[0]
+        self.assertFalse(b'password' in first_cache_key)  # digest, not the password itself
+        for x in range(vimdecrypt.HASHPW_CACHE_SIZE):
+            vimdecrypt.cached_hashpw(b'password', b'salt%d' % x)
+        self.assertEqual(vimdecrypt.HASHPW_CACHE_SIZE, len(vimdecrypt.hashpw_cache))
+        self.assertFalse(first_cache_key in vimdecrypt.hashpw_cache)  # oldest evicted
+        vimdecrypt.wipe_key_cache()
+        self.assertEqual(0, len(vimdecrypt.hashpw_cache))
+
+    def test_note_size_txt(self):
+        note_root = puren_tonbo.FileSystemNotes(self.data_folder, self.note_encoding)
+        self.assertEqual(len(self.plain_text_data_linux_newlines), note_root.note_size('aesop.txt'))
+
+    def test_note_size_gz(self):
+        note_root = puren_tonbo.FileSystemNotes(self.data_folder, self.note_encoding)
+        self.assertEqual(len(self.plain_text_data_windows_newlines), note_root.note_size('aesop.txt.gz'))
+
+    def test_note_size_vimcrypt3(self):
+        self.skip_if_missing_handler(puren_tonbo.VimDecrypt)
+        note_root = puren_tonbo.FileSystemNotes(self.data_folder, self.note_encoding)
+        self.assertEqual(len(self.plain_text_data_windows_newlines), note_root.note_size('aesop_win.vimcrypt3'))
+
+    def test_note_size_aes256_zip(self):
+        self.skip_if_missing_handler(puren_tonbo.ZipAES)
+        note_root = puren_tonbo.FileSystemNotes(self.data_folder, self.note_encoding)
+        self.assertEqual(len(self.plain_text_data_windows_newlines), note_root.note_size('aesop_win_winrar.aes256.zip'))
+
+    def test_inspect_purepyzipaes(self):
+        if not puren_tonbo.mzipaes:
+            self.skip('mzipaes not available')
+        with open(os.path.join(self.data_folder, 'aesop_win_winrar.aes256.zip'), 'rb') as file_object:
+            metadata = puren_tonbo.PurePyZipAES.inspect(file_object)
+            self.assertEqual(0, file_object.tell())
+        self.assertEqual('AE-1', metadata['version'])
+        self.assertEqual(len(self.plain_text_data_windows_newlines), metadata['plaintext_size'])
+        self.assertEqual(256, metadata['kdf']['key_bits'])
+        self.assertEqual(16, len(metadata['salt']))
+
 # TODO test openssl_aes256cbc_pbkdf2_10k
 # TODO test aesop_linux.openssl_aes256cbc_pbkdf2_10k
 
@@ -1002,6 +1151,701 @@ class TestFileSystemNotesWriteFunctionSaveEncryptedCompressedZlib(TestFileSystem
     handler_class = puren_tonbo.CompressedZlib  # gz
 
 
+class TestZipArchiveNotes(TestUtil):
+    test_password_bytes = b'password'
+
+    def setUp(self):
+        if not puren_tonbo.mzipaes:
+            self.skip('mzipaes not available')
+        self.data_folder = tempfile.mkdtemp(prefix='TestZipArchiveNotes_tmp')
+        self.archive_filename = os.path.join(self.data_folder, 'notebook.aes256.zip')
+        note_root = puren_tonbo.ZipArchiveNotes(self.archive_filename)
+        note_root.note_contents_save('first note\nhello world\n', filename='one.md', get_pass=self.test_password_bytes, backup=False)
+        note_root.note_contents_save('second note\nnothing here\n', filename='sub/two.md', get_pass=self.test_password_bytes, backup=False)
+        note_root.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.data_folder)
+
+    def test_listing_without_password(self):
+        note_root = puren_tonbo.ZipArchiveNotes(self.archive_filename)
+        self.assertEqual((['sub'], ['one.md']), note_root.directory_contents())
+        self.assertEqual(len(b'second note\r\nnothing here\r\n'), note_root.note_size('sub/two.md'))
+        note_root.close()
+
+    def test_search(self):
+        note_root = puren_tonbo.ZipArchiveNotes(self.archive_filename)
+        results = list(note_root.search('hello', get_password_callback=self.test_password_bytes))
+        self.assertEqual([('one.md', [(2, 'hello world')])], results)
+        note_root.close()
+
+    def test_search_sort(self):
+        archive_filename = os.path.join(self.data_folder, 'sorted.aes256.zip')
+        with open(archive_filename, 'w+b') as archive_file:
+            archive = puren_tonbo.mzipaes.MiniZipAEArchive(archive_file, self.test_password_bytes)
+            archive.put('b.md', b'hit old\n', timestamp=time.mktime((2020, 1, 1, 12, 0, 0, 0, 0, -1)))
+            archive.put('a.md', b'hit older\n', timestamp=time.mktime((2019, 1, 1, 12, 0, 0, 0, 0, -1)))
+            archive.put('c.md', b'hit new\n', timestamp=time.mktime((2021, 1, 1, 12, 0, 0, 0, 0, -1)))
+            archive.flush()
+        note_root = puren_tonbo.notes_for_root(archive_filename, archive=True)
+        self.assertTrue(isinstance(note_root, puren_tonbo.ZipArchiveNotes))
+        results = note_root.search('hit', get_password_callback=self.test_password_bytes, files_with_matches=True)
+        self.assertEqual(['a.md', 'b.md', 'c.md'], [filename for filename, hits in results])
+        results = note_root.search('hit', get_password_callback=self.test_password_bytes, files_with_matches=True, sort=puren_tonbo.SORT_MTIME_DESC)
+        self.assertEqual(['c.md', 'b.md', 'a.md'], [filename for filename, hits in results])
+        results = note_root.search('hit', get_password_callback=self.test_password_bytes, files_with_matches=True, sort=puren_tonbo.SORT_MTIME_DESC, candidate_files=['a.md', 'c.md'])
+        self.assertEqual(['c.md', 'a.md'], [filename for filename, hits in results])
+        self.assertRaises(puren_tonbo.SearchException, note_root.search_recurse_notes_func, sort='size')
+        note_root.close()
+
+    def test_replace(self):
+        note_root = puren_tonbo.ZipArchiveNotes(self.archive_filename)
+        note_root.note_contents_save('first note\nupdated\n', filename='one.md', get_pass=self.test_password_bytes)
+        self.assertEqual('first note\nupdated\n', note_root.note_contents('one.md', self.test_password_bytes))
+        self.assertEqual('second note\nnothing here\n', note_root.note_contents('sub/two.md', self.test_password_bytes))
+        note_root.close()
+
+    def test_replace_compacts_archive(self):
+        note_root = puren_tonbo.ZipArchiveNotes(self.archive_filename)
+        note_root.note_contents_save('first note\nupdated\n', filename='one.md', get_pass=self.test_password_bytes, backup=False)
+        archive_size = os.path.getsize(self.archive_filename)
+        for _ in range(3):
+            note_root.note_contents_save('first note\nupdated\n', filename='one.md', get_pass=self.test_password_bytes, backup=False)
+        self.assertEqual(archive_size, os.path.getsize(self.archive_filename))  # no dead space
+        self.assertEqual(['notebook.aes256.zip'], os.listdir(self.data_folder))  # no temporary files left behind
+        note_root.note_delete('one.md', backup=False)
+        self.assertTrue(os.path.getsize(self.archive_filename) < archive_size)
+        self.assertEqual('second note\nnothing here\n', note_root.note_contents('sub/two.md', self.test_password_bytes))
+        self.assertRaises(puren_tonbo.PurenTonboIO, note_root.note_delete, 'one.md', backup=False)
+        self.assertEqual(['notebook.aes256.zip'], os.listdir(self.data_folder))
+        note_root.close()
+
+    def test_bad_password(self):
+        note_root = puren_tonbo.ZipArchiveNotes(self.archive_filename)
+        self.assertRaises(puren_tonbo.BadPassword, note_root.note_contents, 'one.md', b'bad')
+        note_root.close()
+
+    def test_readable_by_pyzipper(self):
+        self.skip_if_missing_handler(puren_tonbo.ZipAES)
+        with puren_tonbo.pyzipper.AESZipFile(self.archive_filename) as zf:
+            zf.setpassword(self.test_password_bytes)
+            self.assertEqual(b'first note\r\nhello world\r\n', zf.read('one.md'))
+
+
+class TestDiff(TestUtil):
+    a_lines = b'a\nb\nc\na\nb\nb\na\n'.splitlines(True)  # the example from Myers's paper
+    b_lines = b'c\nb\na\nb\na\nc\n'.splitlines(True)
+
+    def check_edit_script(self, a_lines, b_lines, diff_lines):
+        self.assertEqual(a_lines, [line[2:] for line in diff_lines if line[:2] != b'+ '])
+        self.assertEqual(b_lines, [line[2:] for line in diff_lines if line[:2] != b'- '])
+
+    def test_intern_lines(self):
+        o_ids, a_ids = puren_tonbo.diffutils.intern_lines(self.a_lines, self.b_lines)
+        self.assertEqual([0, 1, 2, 0, 1, 1, 0], list(o_ids))
+        self.assertEqual([2, 1, 0, 1, 0, 2], list(a_ids))
+
+    def test_myers_diff(self):
+        diff_lines = puren_tonbo.myersdiff.myers_diff(self.a_lines, self.b_lines)
+        self.check_edit_script(self.a_lines, self.b_lines, diff_lines)
+        self.assertEqual(5, len([line for line in diff_lines if line[:2] != b'  ']))  # SES length D from the paper
+
+    def test_myers_diff_empty(self):
+        self.assertEqual([], puren_tonbo.myersdiff.myers_diff([], []))
+        self.assertEqual([b'+ ' + line for line in self.b_lines], puren_tonbo.myersdiff.myers_diff([], self.b_lines))
+        self.assertEqual([b'- ' + line for line in self.a_lines], puren_tonbo.myersdiff.myers_diff(self.a_lines, []))
+
+    def test_histogram_diff(self):
+        hd = puren_tonbo.histogramdiff.HistogramDiffer(self.a_lines, self.b_lines)
+        self.check_edit_script(self.a_lines, self.b_lines, hd.histdiff())
+        hd = puren_tonbo.histogramdiff.HistogramDiffer(self.a_lines, self.b_lines)
+        self.assertEqual([b'a\n', b'b\n', b'c\n'], hd.common_base())
+
+    def test_histogram_diff_deep(self):
+        # every split leaves one region with all but one line, would exceed the recursion limit if recursive
+        a_lines = [b'%d\n' % x for x in range(5000)]
+        b_lines = list(reversed(a_lines))
+        self.check_edit_script(a_lines, b_lines, puren_tonbo.histogramdiff.HistogramDiffer(a_lines, b_lines).histdiff())
+
+    def test_patience_diff(self):
+        for fallback in ('histogram', 'myers'):
+            diff_lines = puren_tonbo.patiencediff.patience_diff(self.a_lines, self.b_lines, fallback)
+            self.check_edit_script(self.a_lines, self.b_lines, diff_lines)
+
+    def test_merge3way(self):
+        base = b'title\n\none\ntwo\nthree\n\nend\n'
+        this = b'title\n\none\n2\nthree\n\nend\n'
+        other = b'new title\n\none\ntwo\nthree\n\nend\nappended\n'
+        for diff_type in ('myers', 'ndiff', 'histogram', 'patience'):
+            mrg3 = puren_tonbo.diff3merge.Merge3Way(this, other, base, diff_type, 'ort')
+            self.assertEqual(b'new title\n\none\n2\nthree\n\nend\nappended\n', mrg3.merge(), diff_type)
+            self.assertEqual([], mrg3.get_conflicts())
+
+    def test_myers_diff_large(self):
+        a_lines = [b'line %d\n' % x for x in range(3000)]
+        b_lines = list(a_lines)
+        for x in range(5, 3000, 7):
+            b_lines[x] = b'changed\n'
+        diff_lines = puren_tonbo.myersdiff.myers_diff(a_lines, b_lines)
+        self.check_edit_script(a_lines, b_lines, diff_lines)
+
+
+
+class TestDiff3MergeBatch(TestUtil):
+    def setUp(self):
+        self.data_folder = tempfile.mkdtemp(prefix='pt_merge_')
+        os.mkdir(os.path.join(self.data_folder, 'sub'))
+        for filename, data in (
+                    ('sub/clean.txt.bak', b'title\n\none\ntwo\n'),
+                    ('sub/clean.txt', b'title\n\none\n2\n'),
+                    ('sub/clean (conflict).txt', b'new title\n\none\ntwo\n'),
+                    ('both.txt.bak', b'a\n'),
+                    ('both.txt', b'b\n'),
+                    ('both (conflict).txt', b'c\n'),
+                    ('incomplete (conflict).txt', b'no base or mine\n'),
+                ):
+            with open(os.path.join(self.data_folder, filename), 'wb') as f:
+                f.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_folder)
+
+    def test_find_conflict_triples(self):
+        triples = ptdiff3merge.find_conflict_triples(self.data_folder)
+        self.assertEqual([os.path.join(self.data_folder, 'both.txt.bak'), os.path.join(self.data_folder, 'both.txt'), os.path.join(self.data_folder, 'both (conflict).txt')], list(triples[0]))
+        self.assertEqual(2, len(triples))
+
+    def check_batch_merge(self, jobs):
+        triples = ptdiff3merge.find_conflict_triples(self.data_folder)
+        counts = ptdiff3merge.batch_merge(triples, None, diff_type='patience', jobs=jobs)
+        self.assertEqual({'clean': 1, 'conflicted': 1, 'errors': 0}, counts)
+        with open(os.path.join(self.data_folder, 'sub', 'clean.txt'), 'rb') as f:
+            self.assertEqual(b'new title\n\none\n2\n', f.read().replace(b'\r\n', b'\n'))
+        with open(os.path.join(self.data_folder, 'both.txt'), 'rb') as f:
+            self.assertEqual(b'b\n', f.read())  # conflicts not written
+        with open(os.path.join(self.data_folder, 'sub', 'clean.txt' + ptdiff3merge.MERGE_BACKUP_EXTENSION), 'rb') as f:
+            self.assertEqual(b'title\n\none\n2\n', f.read())  # original mine kept
+        with open(os.path.join(self.data_folder, 'sub', 'clean.txt.bak'), 'rb') as f:
+            self.assertEqual(b'title\n\none\ntwo\n', f.read())  # base untouched
+        self.assertFalse(os.path.exists(os.path.join(self.data_folder, 'both.txt' + ptdiff3merge.MERGE_BACKUP_EXTENSION)))
+
+    def test_batch_merge(self):
+        self.check_batch_merge(jobs=1)
+
+    def test_batch_merge_no_backup(self):
+        triples = ptdiff3merge.find_conflict_triples(self.data_folder)
+        counts = ptdiff3merge.batch_merge(triples, None, diff_type='patience', jobs=1, backup=False)
+        self.assertEqual({'clean': 1, 'conflicted': 1, 'errors': 0}, counts)
+        self.assertEqual(['clean (conflict).txt', 'clean.txt', 'clean.txt.bak'], sorted(os.listdir(os.path.join(self.data_folder, 'sub'))))
+
+    def test_batch_merge_pool(self):
+        self.check_batch_merge(jobs=2)
+
+    def test_batch_merge_chunks_and_save_failure(self):
+        triples = ptdiff3merge.find_conflict_triples(self.data_folder)
+        original_save = puren_tonbo.note_contents_save_native_filename
+
+        def failing_save(plain_str, filename=None, **kwargs):
+            if filename.endswith('both.txt'):
+                raise puren_tonbo.PurenTonboIO('disk full')
+            return original_save(plain_str, filename=filename, **kwargs)
+
+        puren_tonbo.note_contents_save_native_filename = failing_save
+        try:
+            counts = ptdiff3merge.batch_merge(triples, None, diff_type='patience', jobs=1, write_conflicts=True, chunk_size=1)
+        finally:
+            puren_tonbo.note_contents_save_native_filename = original_save
+        self.assertEqual({'clean': 1, 'conflicted': 0, 'errors': 1}, counts)  # batch continued after failed save
+        with open(os.path.join(self.data_folder, 'sub', 'clean.txt'), 'rb') as f:
+            self.assertEqual(b'new title\n\none\n2\n', f.read().replace(b'\r\n', b'\n'))
+
+
+class TestRecryptJournal(TestUtil):
+    def setUp(self):
+        self.data_folder = tempfile.mkdtemp(prefix='pt_recrypt_')
+        self.source_folder = os.path.join(self.data_folder, 'src')
+        os.mkdir(self.source_folder)
+        for x in range(5):
+            with open(os.path.join(self.source_folder, 'note%d.txt' % x), 'wb') as f:
+                f.write(b'note %d\n' % x)
+        self.journal_filename = os.path.join(self.data_folder, 'journal')
+
+    def tearDown(self):
+        shutil.rmtree(self.data_folder)
+
+    def recrypt(self, jobs):
+        ptrecrypt.main(['ptrecrypt', '-j', str(jobs), '--journal', self.journal_filename, '--no-progress', '--cipher', 'rot13', '-p', 'password', os.path.join(self.source_folder, '*.txt')])
+
+    def test_recrypt_parallel_resume(self):
+        self.recrypt(jobs=2)
+        with open(self.journal_filename) as f:
+            self.assertEqual(5, len(f.readlines()))
+        for x in range(5):
+            self.assertEqual('note %d\n' % x, puren_tonbo.note_contents_load_filename(os.path.join(self.source_folder, 'note%d.rot13' % x), dos_newlines=False, get_pass=b'password'))
+        # rerun is a no-op, would otherwise stop on existing files
+        self.recrypt(jobs=2)
+        with open(self.journal_filename) as f:
+            self.assertEqual(5, len(f.readlines()))
+
+    def test_recrypt_resume_unjournaled(self):
+        self.recrypt(jobs=2)
+        # written but not journaled, e.g. interrupted before the parent recorded them
+        with open(self.journal_filename) as f:
+            lines = f.readlines()
+        with open(self.journal_filename, 'w') as f:
+            f.writelines(lines[:3])
+        self.recrypt(jobs=2)  # would otherwise stop on existing files
+        with open(self.journal_filename) as f:
+            self.assertEqual(5, len(f.readlines()))
+        # existing new file with different contents is not done
+        os.remove(self.journal_filename)
+        with open(os.path.join(self.source_folder, 'note0.txt'), 'wb') as f:
+            f.write(b'changed\n')
+        self.assertRaises(NotImplementedError, self.recrypt, jobs=1)
+
+
+class TestNoteCatalog(TestUtil):
+    def setUp(self):
+        self.data_folder = tempfile.mkdtemp(prefix='pt_catalog_')
+        os.mkdir(os.path.join(self.data_folder, 'sub'))
+        os.mkdir(os.path.join(self.data_folder, '.git'))
+        for filename in ('one.txt', os.path.join('sub', 'two.md'), os.path.join('sub', 'image.png'), os.path.join('.git', 'config')):
+            self.write_file(filename, b'first line of %s\nsecond\n' % filename.encode('utf-8'))
+        self.notes = puren_tonbo.FileSystemNotes(self.data_folder, 'utf-8')
+        self.catalog_notes = puren_tonbo.FileSystemNotes(self.data_folder, 'utf-8', catalog_location=puren_tonbo.IN_MEMORY)
+
+    def tearDown(self):
+        self.catalog_notes.catalog.close()
+        shutil.rmtree(self.data_folder)
+
+    def write_file(self, filename, data):
+        with open(os.path.join(self.data_folder, filename), 'wb') as f:
+            f.write(data)
+
+    def check_same_as_file_system(self):
+        self.assertEqual(list(self.notes.recurse_notes()), list(self.catalog_notes.recurse_notes()))
+        self.assertEqual(list(self.notes.recurse_notes(filename_filter=puren_tonbo.supported_filename_filter)), list(self.catalog_notes.recurse_notes(filename_filter=puren_tonbo.supported_filename_filter)))
+        self.assertEqual(self.notes.directory_contents(), self.catalog_notes.directory_contents())
+        self.assertEqual(self.notes.directory_contents('sub'), self.catalog_notes.directory_contents('sub'))
+        self.assertEqual(sorted(self.notes.recent_notes(ignore_folders=['.git'])), sorted(self.catalog_notes.recent_notes()))
+        self.assertEqual(list(self.notes.unsupported_notes(ignore_folders=['.git'])), list(self.catalog_notes.unsupported_notes()))
+
+    def test_catalog_listings(self):
+        self.check_same_as_file_system()
+        self.assertEqual([os.path.join(self.data_folder, 'sub', 'image.png')], list(self.catalog_notes.unsupported_notes()))
+
+    def test_catalog_refresh(self):
+        self.check_same_as_file_system()
+        os.mkdir(os.path.join(self.data_folder, 'new'))
+        self.write_file(os.path.join('new', 'three.txt'), b'three\n')
+        os.remove(os.path.join(self.data_folder, 'sub', 'two.md'))
+        self.check_same_as_file_system()
+        shutil.rmtree(os.path.join(self.data_folder, 'sub'))
+        self.check_same_as_file_system()
+        self.assertEqual((['new'], ['one.txt']), self.catalog_notes.directory_contents())
+
+    def test_catalog_record_contents(self):
+        self.catalog_notes.recurse_notes()  # populate catalog
+        self.assertEqual(None, self.catalog_notes.catalog.note_info('one.txt')['title'])
+        self.catalog_notes.note_contents('one.txt')
+        info = self.catalog_notes.catalog.note_info('one.txt')
+        self.assertEqual(('RawFile', 'utf-8', 'first line of one.txt'), (info['handler'], info['encoding'], info['title']))
+        self.assertEqual(len('first line of one.txt\nsecond\n'), info['size'])
+
+    def test_catalog_record_contents_encrypted_not_on_disk(self):
+        catalog_filename = os.path.join(self.data_folder, 'catalog.sqlite')
+        notes = puren_tonbo.FileSystemNotes(self.data_folder, 'utf-8', catalog_location=catalog_filename)
+        try:
+            notes.note_contents_save('secret first line\n', filename='secret.rot13', backup=False)
+            notes.recurse_notes()  # populate catalog
+            notes.note_contents('secret.rot13')
+            notes.note_contents('one.txt')
+            self.assertEqual((None, None), (notes.catalog.note_info('secret.rot13')['title'], notes.catalog.note_info('secret.rot13')['plaintext_sha256']))
+            self.assertEqual('first line of one.txt', notes.catalog.note_info('one.txt')['title'])
+        finally:
+            notes.catalog.close()
+        self.catalog_notes.recurse_notes()
+        self.catalog_notes.note_contents('secret.rot13')
+        self.assertEqual('secret first line', self.catalog_notes.catalog.note_info('secret.rot13')['title'])  # in memory catalog
+
+    def test_catalog_record_contents_batched_during_search(self):
+        catalog_filename = os.path.join(self.data_folder, 'catalog.sqlite')
+        notes = puren_tonbo.FileSystemNotes(self.data_folder, 'utf-8', catalog_location=catalog_filename)
+        try:
+            notes.recurse_notes()  # populate catalog
+            results = notes.search('first', sort=puren_tonbo.SORT_PATH)
+            filenames = [next(results)[0]]
+            self.assertEqual(1, notes.catalog.pending_records)  # not committed per note
+            filenames += [filename for filename, hits in results]
+            self.assertEqual(['one.txt', os.path.join('sub', 'two.md')], filenames)
+            self.assertEqual(0, notes.catalog.pending_records)  # committed once search finished
+            db = sqlite3.connect(catalog_filename)
+            self.assertEqual([('first line of one.txt',), ('first line of %s' % os.path.join('sub', 'two.md'),)], db.execute("""SELECT title FROM catalog_note WHERE title IS NOT NULL ORDER BY filename""").fetchall())
+            db.close()
+            notes.note_contents('one.txt')  # outside of a search, already known
+            self.assertEqual(0, notes.catalog.pending_records)
+        finally:
+            notes.catalog.close()
+
+
+class TestWatcher(TestUtil):
+    def setUp(self):
+        self.data_folder = tempfile.mkdtemp(prefix='pt_watch_')
+        os.mkdir(os.path.join(self.data_folder, '.git'))
+        self.write_file('one.txt', b'apple\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.data_folder)
+
+    def write_file(self, filename, data):
+        with open(os.path.join(self.data_folder, filename), 'wb') as f:
+            f.write(data)
+
+    def check_watcher(self, note_watcher):
+        try:
+            self.assertEqual(set(), note_watcher.changes(timeout=0))
+            self.write_file('two.txt', b'banana\n')
+            self.write_file(os.path.join('.git', 'ignored'), b'\n')
+            self.assertEqual(set([os.path.join(self.data_folder, 'two.txt')]), note_watcher.changes(timeout=5))
+            os.mkdir(os.path.join(self.data_folder, 'sub'))
+            self.write_file(os.path.join('sub', 'three.txt'), b'cherry\n')
+            self.assertTrue(os.path.join(self.data_folder, 'sub', 'three.txt') in note_watcher.changes(timeout=5))
+        finally:
+            note_watcher.close()
+
+    def test_polling_watcher(self):
+        self.check_watcher(puren_tonbo.watcher.PollingWatcher(self.data_folder, poll_interval=0.1))
+
+    def test_inotify_watcher(self):
+        if not puren_tonbo.watcher.inotify_available():
+            self.skip('inotify not available')
+        self.check_watcher(puren_tonbo.watcher.InotifyWatcher(self.data_folder))
+
+    def test_fts_update(self):
+        fts_options = {'engine': 'sqlite3', 'sqlite3': {'args': [os.path.join(self.data_folder, 'fts.sqlite')]}}
+        notes = puren_tonbo.FileSystemNotes(self.data_folder, 'utf-8', fts_options=fts_options)
+        notes.fts_index()
+        self.assertEqual(['one.txt'], [os.path.basename(result[0]) for result in notes.fts_search('apple')])
+        self.write_file('one.txt', b'banana\n')
+        self.write_file('two.txt', b'apple\n')
+        notes.fts_update([os.path.join(self.data_folder, 'one.txt'), os.path.join(self.data_folder, 'two.txt')])
+        self.assertEqual(['two.txt'], [os.path.basename(result[0]) for result in notes.fts_search('apple')])
+        os.remove(os.path.join(self.data_folder, 'two.txt'))
+        notes.fts_update([os.path.join(self.data_folder, 'two.txt')])
+        self.assertEqual([], notes.fts_search('apple'))
+        notes.fts_instance.index_close()
+
+    def test_fts_update_whoosh(self):
+        if not hasattr(puren_tonbo.whoosh, 'index'):
+            self.skip('whoosh not available')
+        fts_options = {'engine': 'whoosh', 'whoosh': {'args': [os.path.join(self.data_folder, 'whoosh_index')]}}
+        notes = puren_tonbo.FileSystemNotes(self.data_folder, 'utf-8', fts_options=fts_options)
+        notes.fts_index()
+        fts_search = lambda term: [os.path.basename(result[0]) for result in notes.fts_search(term)]
+        self.assertEqual(['one.txt'], fts_search('apple'))
+        self.write_file('one.txt', b'banana\n')
+        self.write_file('two.txt', b'apple\n')
+        original_fts_index = notes.fts_index
+        notes.fts_index = None  # incremental update, no full re-index fallback
+        try:
+            notes.fts_update([os.path.join(self.data_folder, 'one.txt'), os.path.join(self.data_folder, 'two.txt')])
+        finally:
+            notes.fts_index = original_fts_index
+        self.assertEqual(['two.txt'], fts_search('apple'))
+        self.assertEqual(['one.txt'], fts_search('banana'))
+        # new instance (e.g. another process such as ptig) sees the updated index
+        other_notes = puren_tonbo.FileSystemNotes(self.data_folder, 'utf-8', fts_options=fts_options)
+        self.assertEqual(['two.txt'], [os.path.basename(result[0]) for result in other_notes.fts_search('apple')])
+
+    def test_fts_update_skips_unreadable(self):
+        fts_options = {'engine': 'sqlite3', 'sqlite3': {'args': [os.path.join(self.data_folder, 'fts.sqlite')]}}
+        notes = puren_tonbo.FileSystemNotes(self.data_folder, 'utf-8', fts_options=fts_options)
+        shutil.copy(os.path.join(TestFileSystemNotes.data_folder, 'aesop.chi'), os.path.join(self.data_folder, 'aesop.chi'))
+        self.write_file('two.txt', b'apple\n')
+        changed = [os.path.join(self.data_folder, 'aesop.chi'), os.path.join(self.data_folder, 'two.txt')]
+        notes.fts_update(changed, get_password_callback=b'wrong password')  # BadPassword logged, not raised
+        self.assertEqual(['two.txt'], [os.path.basename(result[0]) for result in notes.fts_search('apple')])
+        notes.fts_instance.index_close()
+
+
+class TestAgent(TestUtil):
+    def setUp(self):
+        self.data_folder = tempfile.mkdtemp(prefix='pt_agent_')
+        self.aesop_chi = os.path.join(self.data_folder, 'aesop.chi')
+        shutil.copy(os.path.join(TestFileSystemNotes.data_folder, 'aesop.chi'), self.aesop_chi)
+        with open(os.path.join(TestFileSystemNotes.data_folder, 'aesop.txt'), 'rb') as f:
+            self.aesop_plain = f.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.data_folder)
+
+    def test_agent_password_and_cache(self):
+        pt_agent = puren_tonbo.agent.Agent(password_timeout=60)
+        response = pt_agent.handle({'op': 'decrypt', 'filename': self.aesop_chi})
+        self.assertEqual('PasswordRequired', response['error_type'])
+        response = pt_agent.handle({'op': 'decrypt', 'filename': self.aesop_chi, 'password': 'password', 'force_newline': 'unix'})
+        self.assertEqual(self.aesop_plain, puren_tonbo.agent_client.b64decode(response['data_b64']))
+        self.assertTrue(self.aesop_chi in pt_agent.plaintext_cache)
+        # password remembered
+        response = pt_agent.handle({'op': 'decrypt', 'filename': self.aesop_chi, 'force_newline': 'unix'})
+        self.assertEqual(self.aesop_plain, puren_tonbo.agent_client.b64decode(response['data_b64']))
+        # timed out, cached plain text not available either
+        pt_agent.password_set_time -= 61
+        response = pt_agent.handle({'op': 'decrypt', 'filename': self.aesop_chi})
+        self.assertEqual('PasswordRequired', response['error_type'])
+        self.assertEqual({}, dict(pt_agent.plaintext_cache))
+
+    def test_agent_password_not_replaced(self):
+        pt_agent = puren_tonbo.agent.Agent(password='password', password_timeout=60)
+        response = pt_agent.handle({'op': 'decrypt', 'filename': self.aesop_chi, 'force_newline': 'unix'})
+        self.assertEqual(self.aesop_plain, puren_tonbo.agent_client.b64decode(response['data_b64']))
+        # different request password is used for that request only, not the cached plain text
+        response = pt_agent.handle({'op': 'decrypt', 'filename': self.aesop_chi, 'password': 'wrong'})
+        self.assertEqual('BadPassword', response['error_type'])
+        self.assertEqual(b'password', pt_agent.password)
+        self.assertTrue(self.aesop_chi in pt_agent.plaintext_cache)
+        # wrong request password is not remembered either
+        pt_agent.forget()
+        response = pt_agent.handle({'op': 'decrypt', 'filename': self.aesop_chi, 'password': 'wrong'})
+        self.assertEqual('BadPassword', response['error_type'])
+        self.assertEqual(None, pt_agent.password)
+
+    def test_agent_password_expires_without_requests(self):
+        pt_agent = puren_tonbo.agent.Agent(password='password', password_timeout=60)
+        pt_agent.password_set_time -= 61
+        pt_agent.expire_password()
+        self.assertEqual(None, pt_agent.password)
+
+    def test_agent_socket_encrypt_decrypt(self):
+        if not hasattr(puren_tonbo.agent.socketserver, 'UnixStreamServer'):
+            self.skip('Unix domain sockets not available')
+        socket_path = os.path.join(self.data_folder, 'agent.sock')
+        server = puren_tonbo.agent.AgentServer(socket_path, puren_tonbo.agent.Agent(password=b'password'))
+        server_thread = threading.Thread(target=server.serve_forever)
+        server_thread.start()
+        try:
+            new_chi = os.path.join(self.data_folder, 'new.chi')
+            puren_tonbo.agent_client.request('encrypt', socket_path=socket_path, data_b64=puren_tonbo.agent_client.b64encode(b'hello\n'), out_filename=new_chi)
+            self.assertEqual('hello\n', puren_tonbo.note_contents_load_filename(new_chi, get_pass=b'password', dos_newlines=False))
+            response = puren_tonbo.agent_client.request('decrypt', socket_path=socket_path, filename=new_chi, force_newline='dos')
+            self.assertEqual(b'hello\r\n', puren_tonbo.agent_client.b64decode(response['data_b64']))
+            self.assertRaises(puren_tonbo.agent_client.AgentError, puren_tonbo.agent_client.request, 'decrypt', socket_path=socket_path, filename=self.aesop_chi, password='wrong')
+            response = puren_tonbo.agent_client.request('list_formats', socket_path=socket_path)
+            self.assertTrue(['.txt', 'RawFile', puren_tonbo.RawFile.description] in response['formats'])
+            puren_tonbo.agent_client.request('shutdown', socket_path=socket_path)
+        finally:
+            server_thread.join(5)
+            server.server_close()
+        self.assertFalse(server_thread.is_alive())
+        self.assertFalse(os.path.exists(socket_path))
+
+
+class TestVerify(TestUtil):
+    def setUp(self):
+        self.data_folder = tempfile.mkdtemp(prefix='pt_verify_')
+        for filename in ('aesop.chi', 'aesop.txt', 'latin.txt'):
+            shutil.copy(os.path.join(TestFileSystemNotes.data_folder, filename), self.data_folder)
+        self.cache_filename = os.path.join(self.data_folder, 'cache.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.data_folder)
+
+    def verify(self, password):
+        report = ptverify.verify(self.data_folder, password, note_encoding='utf-8', jobs=2, cache_filename=self.cache_filename)
+        return dict((entry['filename'], (entry['status'], entry.get('cached', False))) for entry in report)
+
+    def test_verify_status_and_cache(self):
+        self.assertEqual({
+            'aesop.chi': ('bad_password', False),
+            'aesop.txt': ('ok', False),
+            'latin.txt': ('encoding_error', False),
+        }, self.verify(b'wrong password'))
+        self.assertEqual({
+            'aesop.chi': ('ok', False),  # failures are not cached
+            'aesop.txt': ('ok', False),  # different password, whole cache ignored
+            'latin.txt': ('encoding_error', False),
+        }, self.verify(b'password'))
+        with open(os.path.join(self.data_folder, 'aesop.txt'), 'ab') as f:
+            f.write(b'changed\n')
+        self.assertEqual({
+            'aesop.chi': ('ok', True),
+            'aesop.txt': ('ok', False),
+            'latin.txt': ('encoding_error', False),
+        }, self.verify(b'password'))
+
+    def test_verify_cache_wrong_password(self):
+        self.assertEqual(('ok', False), self.verify(b'password')['aesop.chi'])
+        self.assertEqual(('ok', True), self.verify(b'password')['aesop.chi'])
+        self.assertEqual({
+            'aesop.chi': ('bad_password', False),  # cache was for a different password
+            'aesop.txt': ('ok', False),
+            'latin.txt': ('encoding_error', False),
+        }, self.verify(b'WRONG'))
+
+    def test_verify_file_removed(self):
+        entry = ptverify.verify_file(self.data_folder, 'utf-8', 'missing.chi', b'password')
+        self.assertEqual(('error', None), (entry['status'], entry['size']))
+
+
+class TestSearchMultipleRoots(TestUtil):
+    def setUp(self):
+        self.data_folder = tempfile.mkdtemp(prefix='pt_multi_root_')
+        self.note_roots = []
+        for x in range(3):
+            note_root = os.path.join(self.data_folder, 'root%d' % x)
+            os.mkdir(note_root)
+            for y in range(4):
+                with open(os.path.join(note_root, 'note%d.txt' % y), 'wb') as f:
+                    f.write(b'root %d note %d\nfind me\n' % (x, y))
+            self.note_roots.append(note_root)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_folder)
+
+    def test_search_notes_order(self):
+        notes_list = [puren_tonbo.FileSystemNotes(note_root, 'utf-8') for note_root in self.note_roots]
+        results = [(notes.note_root, filename, hit_detail) for notes, filename, hit_detail in puren_tonbo.search_notes(notes_list, 'find me', max_workers=3)]
+        expected = []
+        for notes in notes_list:
+            for filename, hit_detail in notes.search('find me'):
+                expected.append((notes.note_root, filename, hit_detail))
+        self.assertEqual(12, len(results))
+        self.assertEqual(expected, results)
+
+    def test_search_sort_mtime_desc(self):
+        note_root = self.note_roots[0]
+        for y, mtime in enumerate((1000, 4000, 2000, 3000)):
+            os.utime(os.path.join(note_root, 'note%d.txt' % y), (mtime, mtime))
+        expected = ['note1.txt', 'note3.txt', 'note2.txt', 'note0.txt']
+        for catalog_location in (None, puren_tonbo.IN_MEMORY):
+            notes = puren_tonbo.FileSystemNotes(note_root, 'utf-8', catalog_location=catalog_location)
+            self.assertEqual(expected, [filename for filename, hit_detail in notes.search('find me', sort=puren_tonbo.SORT_MTIME_DESC)])
+            self.assertEqual(sorted(expected), [filename for filename, hit_detail in notes.search('find me', sort=puren_tonbo.SORT_PATH)])
+
+    def test_search_limits(self):
+        notes_list = [puren_tonbo.FileSystemNotes(note_root, 'utf-8') for note_root in self.note_roots]
+        limits = puren_tonbo.SearchLimits(max_matches=5)
+        results = list(puren_tonbo.search_notes(notes_list, 'note', max_workers=3, limits=limits))
+        self.assertEqual(5, sum(len(hit_detail) for notes, filename, hit_detail in results))
+        self.assertEqual('max_matches', limits.truncated)
+
+        class SlowNotes(puren_tonbo.FileSystemNotes):
+            def note_contents(self, *args, **kwargs):
+                time.sleep(0.05)
+                return puren_tonbo.FileSystemNotes.note_contents(self, *args, **kwargs)
+
+        # first root is slowest, limits still keep the first hits in notes_list order
+        notes_list[0] = SlowNotes(self.note_roots[0], 'utf-8')
+        for limits, expected in (
+            (puren_tonbo.SearchLimits(max_matches=5), [(0, 'note0.txt'), (0, 'note1.txt'), (0, 'note2.txt'), (0, 'note3.txt'), (1, 'note0.txt')]),
+            (puren_tonbo.SearchLimits(max_files_with_matches=3), [(0, 'note0.txt'), (0, 'note1.txt'), (0, 'note2.txt')]),
+        ):
+            results = list(puren_tonbo.search_notes(notes_list, 'note', max_workers=3, limits=limits))
+            self.assertEqual(expected, [(notes_list.index(notes), filename) for notes, filename, hit_detail in results])
+            self.assertTrue(limits.truncated)
+        limits = puren_tonbo.SearchLimits(max_matches=12)
+        self.assertEqual(12, len(list(puren_tonbo.search_notes(notes_list, 'note', max_workers=3, limits=limits))))
+        self.assertEqual(None, limits.truncated)
+
+        notes = notes_list[0]
+        limits = puren_tonbo.SearchLimits(max_files_with_matches=2)
+        self.assertEqual(['note0.txt', 'note1.txt'], [filename for filename, hit_detail in notes.search('note', limits=limits)])
+        self.assertEqual('max_files_with_matches', limits.truncated)
+
+        limits = puren_tonbo.SearchLimits(deadline_seconds=0)
+        self.assertEqual([], list(notes.search('note', limits=limits)))
+        self.assertEqual('deadline_seconds', limits.truncated)
+
+        limits = puren_tonbo.SearchLimits(max_files_with_matches=4)
+        self.assertEqual(4, len(list(notes.search('note', limits=limits))))
+        self.assertEqual(None, limits.truncated)  # limit reached, but nothing left to search
+
+    def test_search_candidate_files(self):
+        note_root = self.note_roots[0]
+        notes = puren_tonbo.FileSystemNotes(note_root, 'utf-8')
+        candidate_files = [
+            'note2.txt',
+            os.path.join(note_root, 'note1.txt'),  # absolute
+            os.path.join(self.note_roots[1], 'note3.txt'),  # outside of note_root, ignored
+            'missing.txt',
+        ]
+        self.assertEqual(['note2.txt', 'note1.txt'], [filename for filename, hit_detail in notes.search('find me', candidate_files=candidate_files)])
+        self.assertEqual([], list(notes.search('find me', candidate_files=[])))
+
+    def test_search_multiple_patterns(self):
+        note_root = self.note_roots[0]
+        with open(os.path.join(note_root, 'invoice.txt'), 'wb') as f:
+            f.write(b'invoice\npaid 2024\n')
+        with open(os.path.join(note_root, 'draft.txt'), 'wb') as f:
+            f.write(b'draft invoice\n2024\n')
+        notes = puren_tonbo.FileSystemNotes(note_root, 'utf-8')
+        def search(*args, **kwargs):
+            return dict(notes.search(*args, **kwargs))
+        self.assertEqual({'invoice.txt': [(1, 'invoice'), (2, 'paid 2024')], 'draft.txt': [(1, 'draft invoice'), (2, '2024')]}, search(None, all_of=['invoice', '2024']))
+        self.assertEqual({'invoice.txt': [(1, 'invoice'), (2, 'paid 2024')]}, search(None, all_of=['invoice', '2024'], none_of=['DRAFT', 'nothing'], ignore_case=True))
+        self.assertEqual(['draft.txt', 'invoice.txt', 'note0.txt', 'note1.txt', 'note2.txt', 'note3.txt'], sorted(search(['paid', 'root 0', '2024'])))
+        self.assertEqual({'invoice.txt': [(2, 'paid 2024')]}, search(['paid'], all_of=['2024']))
+        self.assertRaises(puren_tonbo.SearchException, search, None)
+
+    def test_map_notes(self):
+        notes_list = [puren_tonbo.FileSystemNotes(note_root, 'utf-8') for note_root in self.note_roots]
+        self.assertEqual(self.note_roots, puren_tonbo.map_notes(lambda notes: notes.note_root, notes_list))
+
+
+class TestGrepStringLiteral(TestUtil):
+    def test_same_as_regex(self):
+        text = u'The Frogs Desiring a King\r\n\r\nKING LOG, king stork\nStra\xdfe STRASSE\n\u212aelvin\nlast king'
+        for search_term in (u'king', u'KING', u'king log', u'zzz', u'\xdf', u'strasse', u'k', u'\r'):
+            for ignore_case in (True, False):
+                regex_object = re.compile(re.escape(search_term), re.IGNORECASE if ignore_case else 0)
+                for highlight_text_start, highlight_text_stop in ((None, None), ('<', '>')):
+                    for files_with_matches in (False, True):
+                        self.assertEqual(
+                            puren_tonbo.grep_string(text, regex_object, highlight_text_start, highlight_text_stop, files_with_matches=files_with_matches),
+                            puren_tonbo.grep_string_literal(text, search_term, regex_object, highlight_text_start, highlight_text_stop, files_with_matches=files_with_matches, ignore_case=ignore_case),
+                            (search_term, ignore_case, highlight_text_start, files_with_matches)
+                        )
+
+    def test_dotless_i_same_as_regex(self):
+        text = u'ac\u0130S\nKS\u0131K\nplain text'
+        for search_term in (u'\u0131', u'i', u'I', u'\u0130', u'ks\u0131k', u'kSik', u'acis'):
+            regex_object = re.compile(re.escape(search_term), re.IGNORECASE)
+            for files_with_matches in (False, True):
+                self.assertEqual(
+                    puren_tonbo.grep_string(text, regex_object, files_with_matches=files_with_matches),
+                    puren_tonbo.grep_string_literal(text, search_term, regex_object, files_with_matches=files_with_matches, ignore_case=True),
+                    (search_term, files_with_matches)
+                )
+
+
+class TestCipherBatch(TestUtil):
+    def setUp(self):
+        self.data_folder = tempfile.mkdtemp(prefix='pt_cipher_batch_')
+        self.filenames = []
+        for x in range(3):
+            filename = os.path.join(self.data_folder, 'note%d.txt' % x)
+            with open(filename, 'wb') as f:
+                f.write(b'note %d\n' % x)
+            self.filenames.append(filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_folder)
+
+    def test_batch_encrypt_decrypt(self):
+        report = StringIO()
+        failures = ptcipher.batch(self.filenames, False, 'rot13', b'password', jobs=2, report_file=report)
+        self.assertEqual(0, failures)
+        self.assertEqual(3, len(report.getvalue().splitlines()))
+        crypted_filenames = [os.path.join(self.data_folder, 'note%d.rot13' % x) for x in range(3)]
+        for x, filename in enumerate(crypted_filenames):
+            self.assertEqual('note %d\n' % x, puren_tonbo.note_contents_load_filename(filename, dos_newlines=False, get_pass=b'password'))
+            os.remove(self.filenames[x])
+        failures = ptcipher.batch(crypted_filenames + [os.path.join(self.data_folder, 'missing.rot13')], True, None, b'password')
+        self.assertEqual(1, failures)
+        for x, filename in enumerate(self.filenames):
+            with open(filename, 'rb') as f:
+                self.assertEqual(b'note %d\n' % x, f.read())
+
 
 """ TODO implement TestFileSystemNotesWriteClassSaveRawPlainText and TestFileSystemNotesWriteFunctionSaveRawPlainText for:
 grep '(EncryptedFile):' puren_tonbo/__init__.py
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: us-ascii -*-
+# vim:ts=4:sw=4:softtabstop=4:smarttab:expandtab
+"""Command line tool to start pt-agent, an ssh-agent like daemon (Unix domain socket)
+that holds the password and plain text cache for thin clients, see puren_tonbo.agent_client
+
+    python -m puren_tonbo.tools.ptagent -h
+    eval `ptagent`  # start in background, sets PT_AGENT_SOCK
+    ptagent --foreground --timeout 3600 --socket /tmp/my_agent.sock
+
+    python puren_tonbo/agent_client.py --ping
+    python puren_tonbo/agent_client.py -p password -d puren_tonbo/tests/data/aesop.chi
+    python puren_tonbo/agent_client.py -d puren_tonbo/tests/data/aesop.chi  # password now held by agent
+
+vim/SciTE integrations can use the agent client instead of ptcipher:
+
+    export PTCIPHER_EXE="python /path/to/puren_tonbo/agent_client.py"  # fastest, needs shell (vim, SciTE Lua)
+    export PTCIPHER_EXE=ptagent_client  # installed script, for integrations that do not use a shell (SciTE Python)
+
+The password is forgotten after --timeout seconds, even if no requests are made.
+A password sent with a request is remembered only if the agent holds none
+(use --forget to change it).
+
+Stop with:
+
+    python puren_tonbo/agent_client.py --shutdown
+"""
+
+from optparse import OptionParser
+import os
+import sys
+
+import puren_tonbo
+from puren_tonbo import agent
+from puren_tonbo.agent_client import AGENT_SOCKET_ENV
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+
+    usage = "usage: %prog [options]"
+    parser = OptionParser(usage=usage, version="%%prog %s" % puren_tonbo.__version__)
+    parser.add_option("--socket", help="Unix domain socket pathname, default $XDG_RUNTIME_DIR/pt-agent.sock")
+    parser.add_option("-t", "--timeout", help="Seconds to hold password for, 0 for no timeout, default %d" % agent.DEFAULT_PASSWORD_TIMEOUT, type="int", default=agent.DEFAULT_PASSWORD_TIMEOUT)
+    parser.add_option("-c", "--codec", help="Override config file encoding (can be a list TODO format comma?), for search")
+    parser.add_option("--config-file", "--config_file", help="Override config file")
+    parser.add_option("-p", "--password", help="initial password, if omitted but OS env PT_PASSWORD is set use that, if missing first client request needs to supply it")
+    parser.add_option("-P", "--password_file", help="file name where password is to be read from, trailing blanks are ignored")
+    parser.add_option("--foreground", help="Do not fork into the background", action="store_true")
+    parser.add_option("-v", "--verbose", action="store_true")
+
+    (options, args) = parser.parse_args(argv[1:])
+
+    if not hasattr(os, 'fork') or not hasattr(agent.socketserver, 'UnixStreamServer'):
+        print('pt-agent requires Unix domain sockets')
+        return 1
+
+    config = puren_tonbo.get_config(options.config_file)
+    if options.codec:
+        note_encoding = options.codec
+    else:
+        note_encoding = config['codec']
+
+    if options.password_file:
+        f = open(options.password_file, 'rb')
+        password_file = f.read()
+        f.close()
+        password_file = password_file.strip()
+    else:
+        password_file = None
+    password = options.password or password_file or os.environ.get('PT_PASSWORD') or puren_tonbo.keyring_get_password()
+
+    socket_path = os.path.abspath(options.socket or agent.default_socket_path())
+    pt_agent = agent.Agent(password=password, password_timeout=options.timeout or None, note_encoding=note_encoding)
+    server = agent.AgentServer(socket_path, pt_agent)
+
+    # sh syntax, like ssh-agent, for use with eval
+    print('%s=%s; export %s;' % (AGENT_SOCKET_ENV, socket_path, AGENT_SOCKET_ENV))
+    sys.stdout.flush()
+    if not options.foreground:
+        if os.fork():
+            return 0
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+    elif options.verbose:
+        print('pt-agent listening, Control-C to stop')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pt_agent.forget()
+        server.server_close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
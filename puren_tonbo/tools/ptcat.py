@@ -5,6 +5,8 @@
 
     python -m puren_tonbo.tools.ptcat -h
     python -m puren_tonbo.tools.ptcat -p test test.chi
+    python -m puren_tonbo.tools.ptcat -p test -j 4 one.chi two.chi three.txt
+    find . -name '*.chi' -print0 | python -m puren_tonbo.tools.ptcat -0 -p test
 
 TODO consider arbitary (absolute, possibly even relative "../../") paths as command line, avoiding directory sandbox sanity check (FileSystemNotes.abspath2relative())?
 i.e. just like ptcipher, e.g.:
@@ -14,6 +16,7 @@ i.e. just like ptcipher, e.g.:
 
 """
 
+import multiprocessing
 import os
 from optparse import OptionParser
 import sys
@@ -24,6 +27,22 @@ import puren_tonbo
 is_py3 = sys.version_info >= (3,)
 
 
+def cat_note(job):
+    """Process pool worker, job is a tuple of (note_root, note_encoding, filename, password, archive)
+    Returns tuple of (filename, data, error), error is None on success
+    """
+    note_root, note_encoding, filename, password, archive = job
+    try:
+        notes = puren_tonbo.notes_for_root(note_root, note_encoding, archive=archive)
+        try:
+            return filename, notes.note_contents(filename, password), None
+        finally:
+            if archive:
+                notes.close()
+    except (puren_tonbo.PurenTonboException, IOError, OSError) as info:
+        return filename, None, info
+
+
 def main(argv=None):
     if argv is None:
         argv = sys.argv
@@ -31,15 +50,18 @@ def main(argv=None):
     if is_py3:
         stream_encoding = 'utf-8'  # FIXME hard coded
 
-    usage = "usage: %prog [options] in_filename"
+    usage = "usage: %prog [options] in_filename [in_filename...]"
     parser = OptionParser(usage=usage, version="%%prog %s" % puren_tonbo.__version__)
     parser.add_option("--list-formats", help="Which encryption/file formats are available", action="store_true")
     parser.add_option("--list-all-formats", help="List all (non-Raw) encryption/file formats are suportted (potentially not available", action="store_true")
     parser.add_option("--note-root", help="Directory of notes override")
+    parser.add_option("--archive", help="note-root is a notebook archive (single AES ZIP file of notes), in_filename are entry names", action="store_true")
     parser.add_option("-c", "--codec", help="Override config file encoding (can be a list TODO format comma?)")
     parser.add_option("-p", "--password", help="password, if omitted but OS env PT_PASSWORD is set use that, if missing prompt")
     parser.add_option("-P", "--password_file", help="file name where password is to be read from, trailing blanks are ignored")
     parser.add_option("--config-file", "--config_file", help="Override config file")
+    parser.add_option("-0", "--null", help="Read NUL separated filenames from stdin (e.g. find -print0)", action="store_true")
+    parser.add_option("-j", "--jobs", help="Number of processes to decrypt with when given multiple files, default 1", type="int")
     parser.add_option("-v", "--verbose", action="store_true")
 
     (options, args) = parser.parse_args(argv[1:])
@@ -54,10 +76,13 @@ def main(argv=None):
     def usage():
         parser.print_usage()
 
-    if not args:
+    filenames = list(args)
+    if options.null:
+        in_file = sys.stdin.buffer if is_py3 else sys.stdin
+        filenames += [os.fsdecode(filename) if is_py3 else filename for filename in in_file.read().split(b'\0') if filename]
+    if not filenames:
         parser.print_usage()
         return 1
-    in_filename = args[0]
 
     if options.password_file:
         f = open(options.password_file, 'rb')
@@ -85,11 +110,49 @@ def main(argv=None):
     else:
         note_root = config.get('note_root', '.')
 
-    notes = puren_tonbo.FileSystemNotes(note_root, note_encoding)
-    data = notes.note_contents(in_filename, password)
-    #print('%r' % data)
-    print('%s' % data)
+    if len(filenames) == 1:
+        notes = puren_tonbo.notes_for_root(note_root, note_encoding, archive=options.archive)
+        data = notes.note_contents(filenames[0], password)
+        #print('%r' % data)
+        print('%s' % data)
+        return 0
 
+    if callable(password):
+        # prompt once up front, workers can not prompt (nor can callables be pickled)
+        if options.archive or any(puren_tonbo.is_encrypted(filename) for filename in filenames):
+            password = password(filename=filenames[0], for_decrypt=True)
+            if password and not isinstance(password, bytes):
+                password = password.encode('us-ascii')
+        else:
+            password = None
+
+    work = [(note_root, note_encoding, filename, password, options.archive) for filename in filenames]
+    pool = None
+    if options.jobs and options.jobs > 1:
+        pool = multiprocessing.Pool(options.jobs)
+        results = pool.imap(cat_note, work)  # ordered, same as command line
+    else:
+        results = (cat_note(job) for job in work)
+    failures = 0
+    try:
+        for filename, data, error in results:
+            if error is None:
+                print('%s' % data)
+            else:
+                failures += 1
+                sys.stderr.write('%s: %r\n' % (filename, error))
+        if pool:
+            pool.close()
+    except:
+        if pool:
+            pool.terminate()
+        raise
+    finally:
+        if pool:
+            pool.join()
+
+    if failures:
+        return 1
     return 0
 
 
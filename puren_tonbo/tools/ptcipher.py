@@ -8,6 +8,8 @@
 """
 
 import datetime
+import json
+import multiprocessing
 import os
 from optparse import OptionParser
 import sys
@@ -50,6 +52,116 @@ def file_replace(src, dst):
             os.remove(tmp_backup)
 
 
+def force_newlines(plain_bytes, force_newline):
+    """force_newline is None (leave as-is), 'dos' or 'unix'"""
+    if force_newline:
+        plain_bytes = forcebad_dos2unix(plain_bytes)
+        if force_newline == 'dos':
+            plain_bytes = simple_unix2dos(plain_bytes)
+    return plain_bytes
+
+
+def read_null_separated(in_file):
+    """Returns list of filenames from NUL separated (bytes) input, e.g. find -print0"""
+    data = in_file.read()
+    return [os.fsdecode(filename) if hasattr(os, 'fsdecode') else filename for filename in data.split(b'\0') if filename]
+
+
+def batch_out_filename(in_filename, decrypt, handler_class):
+    """Output filename for batch mode; decrypt replaces the encrypted extension with .txt,
+    encrypt replaces a plain text extension (if any) with the handler_class extension"""
+    if decrypt:
+        in_handler_class, out_handler_class = handler_class, puren_tonbo.RawFile
+    else:
+        in_handler_class, out_handler_class = puren_tonbo.RawFile, handler_class
+    base_filename = in_filename
+    for extn in in_handler_class.extensions:  # see BaseFile.split_extension()
+        if in_filename.endswith(extn):
+            base_filename = in_filename[:-len(extn)]
+            break
+    return base_filename + out_handler_class.extensions[0]
+
+
+def batch_process_file(job):
+    """Process pool worker, job is a tuple of (in_filename, decrypt, cipher, password, force_newline)
+    Returns status report dict
+    """
+    in_filename, decrypt, cipher, password, force_newline = job
+    result = {'filename': in_filename, 'out_filename': None, 'status': 'ok', 'error': None}
+    try:
+        if cipher:
+            handler_class = puren_tonbo.filename2handler('_.' + cipher)  # TODO options.cipher to filename extension is less than ideal
+        else:
+            handler_class = puren_tonbo.filename2handler(in_filename)
+        out_filename = batch_out_filename(in_filename, decrypt, handler_class)
+        result['out_filename'] = out_filename
+        if out_filename == in_filename:
+            raise puren_tonbo.PurenTonboBadCall('output filename same as input %r' % in_filename)
+        handler = handler_class(key=password)
+        with open(in_filename, 'rb') as in_file:
+            if decrypt:
+                data = force_newlines(handler.read_from(in_file), force_newline)
+            else:
+                plain_text = force_newlines(in_file.read(), force_newline)
+        out_file = tempfile.NamedTemporaryFile(
+            mode='wb',
+            dir=os.path.dirname(out_filename),
+            prefix=os.path.basename(out_filename) + datetime.datetime.now().strftime('%Y%m%d_%H%M%S'),
+            delete=False
+        )
+        tmp_out_filename = out_file.name
+        try:
+            if decrypt:
+                out_file.write(data)
+            else:
+                handler.write_to(out_file, plain_text)
+            out_file.close()
+        except:
+            out_file.close()
+            os.remove(tmp_out_filename)
+            raise
+        if os.path.exists(out_filename):
+            file_replace(out_filename, out_filename + '.bak')  # backup existing
+        file_replace(tmp_out_filename, out_filename)
+    except puren_tonbo.BadPassword as info:
+        result['status'], result['error'] = 'bad_password', repr(info)
+    except Exception as info:
+        result['status'], result['error'] = 'error', repr(info)
+    return result
+
+
+def batch(filenames, decrypt, cipher, password, force_newline=None, jobs=None, report_file=None):
+    """Encrypt/decrypt many files in one process (or a pool of jobs processes), each file
+    written next to the input (see batch_out_filename()). Writes JSON Lines status report, one per file.
+    Returns number of failures
+    """
+    work = [(filename, decrypt, cipher, password, force_newline) for filename in filenames]
+    pool = None
+    if jobs and jobs > 1 and len(work) > 1:
+        pool = multiprocessing.Pool(jobs)
+        results = pool.imap(batch_process_file, work)
+    else:
+        results = (batch_process_file(job) for job in work)
+    failures = 0
+    try:
+        for result in results:
+            if result['status'] != 'ok':
+                failures += 1
+            if report_file:
+                report_file.write(json.dumps(result, sort_keys=True) + '\n')
+                report_file.flush()
+        if pool:
+            pool.close()
+    except:
+        if pool:
+            pool.terminate()
+        raise
+    finally:
+        if pool:
+            pool.join()
+    return failures
+
+
 ptcipher_examples = """
 Examples:
 
@@ -73,6 +185,12 @@ Quick demos:
     ptcipher --encrypt -p password README.md -o README.md.u001.jenc  # DOES NOT YET WORK - https://github.com/clach04/puren_tonbo/issues/171
     ptcipher --encrypt -p password README.md -o README.md.jenc
 
+Batch, many files in one process. Decrypt writes .txt files, encrypt replaces .txt/.md with the cipher extension.
+Existing outputs are backed up to .bak. JSON Lines status report on stdout:
+
+    ptcipher --batch --cipher jenc --encrypt -p password notes/*.txt
+    find notes -name '*.chi' -print0 | ptcipher -0 -j 4 --decrypt -p password
+
 """
 
 def main(argv=None):
@@ -102,6 +220,9 @@ def main(argv=None):
     parser.add_option("-t", "--time", action="store_true")
     parser.add_option("-v", "--verbose", action="store_true")
     parser.add_option("-s", "--silent", help="if specified do not warn about stdin using", action="store_false", default=True)
+    parser.add_option("--batch", help="Process all in_filename arguments, writing outputs next to inputs", action="store_true")
+    parser.add_option("-0", "--null", help="Batch mode, read NUL separated filenames from stdin (e.g. find -print0)", action="store_true")
+    parser.add_option("-j", "--jobs", help="Batch mode number of processes to use, default 1", type="int")
     (options, args) = parser.parse_args(argv[1:])
     #print('%r' % ((options, args),))
     verbose = options.verbose
@@ -146,6 +267,33 @@ def main(argv=None):
     decrypt = options.decrypt
     out_filename = options.out_filename
 
+    if options.batch or options.null:
+        filenames = list(args)
+        if options.null:
+            filenames += read_null_separated(sys.stdin.buffer if is_py3 else sys.stdin)
+        if not decrypt and not options.cipher:
+            usage()
+            print('Batch encrypt requires --cipher')
+            return 1
+        if options.no_prompt:
+            password = options.password or password_file or os.environ.get('PT_PASSWORD') or puren_tonbo.keyring_get_password() or ''
+        else:
+            password = options.password or password_file or os.environ.get('PT_PASSWORD') or puren_tonbo.keyring_get_password()
+            if password is None:
+                # one prompt for all files
+                password = puren_tonbo.ui.getpassfunc("Puren Tonbo ptcipher Password:", preference_list=options.password_prompt.split(','), for_decrypt=decrypt)
+        if password and not isinstance(password, bytes):
+            password = password.encode('us-ascii')
+        if options.time:
+            start_time = time.time()
+        failures = batch(filenames, decrypt, options.cipher, password, force_newline=force_newline, jobs=options.jobs, report_file=sys.stdout)
+        sys.stderr.write('%d files, %d failed\n' % (len(filenames), failures))
+        if options.time:
+            print('Total time: %.2f seconds' % (time.time() - start_time))
+        if failures:
+            return 1
+        return 0
+
     if in_filename == '-':
         if is_py3:
             in_file = sys.stdin.buffer
@@ -206,13 +354,7 @@ def main(argv=None):
                 handler_class = puren_tonbo.filename2handler(in_filename)
             handler = handler_class(key=password)
             plain_str = handler.read_from(in_file)
-            if force_newline:
-                #sys.stderr.write('plain_str %r\n' % (plain_str,))
-                plain_str = forcebad_dos2unix(plain_str)
-                #sys.stderr.write('plain_str %r\n' % (plain_str,))
-                if force_newline == 'dos':
-                    plain_str = simple_unix2dos(plain_str)
-                #sys.stderr.write('plain_str %r\n' % (plain_str,))
+            plain_str = force_newlines(plain_str, force_newline)
             out_file.write(plain_str)
             failed = False
         else:
@@ -222,10 +364,7 @@ def main(argv=None):
                 handler_class = puren_tonbo.filename2handler(out_filename)  # FIXME handle -
             handler = handler_class(key=password)
             plain_text = in_file.read()
-            if force_newline:
-                plain_text = forcebad_dos2unix(plain_text)
-                if force_newline == 'dos':
-                    plain_text = simple_unix2dos(plain_text)
+            plain_text = force_newlines(plain_text, force_newline)
             handler.write_to(out_file, plain_text)
             failed = False
     except puren_tonbo.BadPassword as info:
@@ -12,10 +12,33 @@ i.e. just like ptcipher, e.g.:
     python -m puren_tonbo.tools.ptdiff3merge -p test base mine theirs
     python -m puren_tonbo.tools.ptdiff3merge -p test base mine theirs
 
+Batch mode, merge every conflict triple found in a directory tree (or listed in a manifest):
+
+    python -m puren_tonbo.tools.ptdiff3merge -p test --batch notes_dir
+    python -m puren_tonbo.tools.ptdiff3merge -p test --batch manifest.txt -j 4
+
+For a directory, triples are found by conflict copy name, for example:
+
+    base    note.txt.bak
+    mine    note.txt
+    theirs  note (conflict).txt
+
+A manifest is a text file, one triple per line; base, mine, theirs
+filenames separated by tabs (relative to the manifest). Blank lines
+and lines starting with # are ignored.
+
+Clean merges are written over mine, using the handler for mine (i.e.
+same encryption format). Conflicted merges are left alone unless
+--write-conflicts is set. Before mine is written the original is copied
+to mine + MERGE_BACKUP_EXTENSION, e.g. note.txt.merge.bak (not .bak,
+that is the base), --no-backup skips this.
+
 """
 
+import multiprocessing
 import os
 from optparse import OptionParser
+import shutil
 import sys
 
 import puren_tonbo
@@ -24,6 +47,150 @@ import puren_tonbo.diff3merge
 
 is_py3 = sys.version_info >= (3,)
 
+BACKUP_EXTENSION = '.bak'
+MERGE_BACKUP_EXTENSION = '.merge' + BACKUP_EXTENSION  # pre-merge copy of mine, BACKUP_EXTENSION is the base
+BATCH_TRIPLES_PER_JOB = 4  # batch_merge() triples in memory per pool process
+
+
+def find_conflict_triples(dirname, conflict_marker=' (conflict)'):
+    """Walk dirname looking for sync conflict copies, returns list of (base, mine, theirs) filenames
+    theirs is the filename containing conflict_marker, mine is the same filename without the marker,
+    base is mine with BACKUP_EXTENSION appended. Only complete triples are returned.
+    """
+    result = []
+    for dirpath, dirnames, filenames in os.walk(dirname):
+        dirnames.sort()
+        filenames.sort()
+        existing_filenames = set(filenames)
+        for filename in filenames:
+            if conflict_marker not in filename or filename.endswith(BACKUP_EXTENSION):
+                continue
+            mine = filename.replace(conflict_marker, '', 1)
+            base = mine + BACKUP_EXTENSION
+            if mine in existing_filenames and base in existing_filenames:
+                result.append((os.path.join(dirpath, base), os.path.join(dirpath, mine), os.path.join(dirpath, filename)))
+    return result
+
+
+def read_manifest(filename):
+    """Read (base, mine, theirs) filename triples from tab separated manifest file
+    """
+    result = []
+    manifest_dirname = os.path.dirname(os.path.abspath(filename))
+    with open(filename) as manifest_file:
+        for line_number, line in enumerate(manifest_file, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            triple = line.split('\t')
+            if len(triple) != 3:
+                raise puren_tonbo.PurenTonboException('%s line %d: expected base, mine, theirs separated by tabs' % (filename, line_number))
+            result.append(tuple(os.path.join(manifest_dirname, x) for x in triple))
+    return result
+
+
+def load_filename(filename, password, dos_newlines=True):
+    """Load (decrypt) bytes of filename, file extension derives handler, BACKUP_EXTENSION is ignored
+    """
+    handler_filename = filename
+    if handler_filename.endswith(BACKUP_EXTENSION):
+        handler_filename = handler_filename[:-len(BACKUP_EXTENSION)]
+    handler_class = puren_tonbo.filename2handler(handler_filename)
+    return puren_tonbo.note_contents_load_filename(filename, get_pass=password, dos_newlines=dos_newlines, return_bytes=True, handler_class=handler_class)
+
+
+def merge_contents(mine_file_contents, theirs_file_contents, base_file_contents, diff_type, strategy):
+    """Process pool worker, returns tuple of (merged bytes, conflicts)"""
+    moptions = puren_tonbo.diff3merge.MergeOptions()
+    moptions.file_merger = puren_tonbo.diff3merge.diff3_file_merge
+    moptions.strategy = strategy
+    moptions.diff_type = diff_type
+    return puren_tonbo.diff3merge.diff3_file_merge(mine_file_contents, theirs_file_contents, base_file_contents, moptions)
+
+
+def batch_merge(triples, password, diff_type='myers', strategy='ort', jobs=None, write_conflicts=False, dos_newlines=True, simulate=False, verbose=False, chunk_size=None, backup=True):
+    """Three-way merge each (base, mine, theirs) in triples
+    Files are decrypted (once each) in this process, so password can be a caching password callback.
+    Merges run in a process pool of `jobs` processes (None means one per CPU, 1 means no pool).
+    Triples are processed chunk_size at a time (default BATCH_TRIPLES_PER_JOB per process), so only
+    one chunk of plain text is held in memory.
+    Clean merges (and conflicted merges if write_conflicts) are written over mine,
+    if backup the original mine is first copied to mine + MERGE_BACKUP_EXTENSION.
+    A failure (load, merge or save) is reported and counted as an error, the rest of the batch continues.
+    Returns dict of counts; clean, conflicted, errors
+    """
+    counts = {'clean': 0, 'conflicted': 0, 'errors': 0}
+    pool = None
+    if jobs != 1 and len(triples) > 1:
+        pool = multiprocessing.Pool(jobs)
+    chunk_size = chunk_size or BATCH_TRIPLES_PER_JOB * (jobs or multiprocessing.cpu_count())
+    try:
+        for chunk_start in range(0, len(triples), chunk_size):
+            pending = []
+            for base, mine, theirs in triples[chunk_start:chunk_start + chunk_size]:
+                try:
+                    contents = tuple(load_filename(filename, password, dos_newlines=dos_newlines) for filename in (mine, theirs, base))
+                except puren_tonbo.PurenTonboException as info:
+                    print('ERROR loading %r: %s' % ((base, mine, theirs), info))
+                    counts['errors'] += 1
+                    continue
+                args = contents + (diff_type, strategy)
+                if pool:
+                    pending.append((mine, pool.apply_async(merge_contents, args)))
+                else:
+                    pending.append((mine, merge_contents(*args)))
+
+            for mine, result in pending:
+                try:
+                    if pool:
+                        result = result.get()
+                    merged_result, conflicts = result
+                except Exception as info:
+                    print('ERROR merging %r: %s' % (mine, info))
+                    counts['errors'] += 1
+                    continue
+                if conflicts:
+                    print('CONFLICT %s %r' % (mine, conflicts))
+                    if not write_conflicts or simulate:
+                        counts['conflicted'] += 1
+                        continue
+                elif simulate:
+                    counts['clean'] += 1
+                    if verbose:
+                        print('merged %s' % mine)
+                    continue
+                try:
+                    save_merged(mine, merged_result, password, dos_newlines=dos_newlines, backup=backup)
+                except (puren_tonbo.PurenTonboException, IOError, OSError) as info:
+                    print('ERROR saving %r: %s' % (mine, info))
+                    counts['errors'] += 1
+                    continue
+                if conflicts:
+                    counts['conflicted'] += 1
+                else:
+                    counts['clean'] += 1
+                    if verbose:
+                        print('merged %s' % mine)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    return counts
+
+
+def save_merged(mine, merged_result, password, dos_newlines=True, backup=True):
+    """Write (encrypt) merged_result over mine, using the handler for mine
+    If backup, mine is first copied to mine + MERGE_BACKUP_EXTENSION. The regular note
+    save backup (BACKUP_EXTENSION) is not used, it would overwrite the base of the merge"""
+    handler_class = puren_tonbo.filename2handler(mine)
+    note_password = password
+    if callable(note_password) and handler_class.needs_key:
+        note_password = note_password(filename=mine)  # cached from the decrypt
+    handler = handler_class(key=note_password)
+    if backup:
+        shutil.copy2(mine, mine + MERGE_BACKUP_EXTENSION)
+    puren_tonbo.note_contents_save_native_filename(merged_result, filename=mine, original_filename=None, folder=None, handler=handler, dos_newlines=dos_newlines, backup=False, use_tempfile=True, note_encoding=None, filename_generator=None)
+
 
 def main(argv=None):
     if argv is None:
@@ -45,7 +212,13 @@ def main(argv=None):
     parser.add_option("-o", "--output", dest="out_filename", default='-',
                         help="write output to FILE", metavar="FILE")
     parser.add_option("-d", "--diff-type", "--diff_type", dest="diff_type", default='myers',
-                        help="Options; myers,diff, histogram")
+                        help="Options; myers, ndiff, histogram, patience")
+    parser.add_option("--batch", help="directory to search for conflict triples, or manifest file of base/mine/theirs triples")
+    parser.add_option("--conflict-marker", "--conflict_marker", help="For --batch directories, the marker in conflict copy filenames, default '%default'", default=' (conflict)')
+    parser.add_option("-j", "--jobs", help="For --batch, number of merge processes (default one per CPU)", type="int")
+    parser.add_option("--write-conflicts", "--write_conflicts", help="For --batch, also write merges with conflict markers", action="store_true")
+    parser.add_option("--simulate", help="For --batch, do not write files", action="store_true")
+    parser.add_option("--no-backup", "--no_backup", help="For --batch, do not keep a copy of mine (as %s) before writing the merge" % ('mine' + MERGE_BACKUP_EXTENSION), action="store_false", dest="backup", default=True)
 
 
     (options, args) = parser.parse_args(argv[1:])
@@ -60,12 +233,13 @@ def main(argv=None):
     def usage():
         parser.print_usage()
 
-    if not args:
+    if not args and not options.batch:
         parser.print_usage()
         return 1
-    filename_base = args[0]
-    filename_mine = args[1]
-    filename_theirs = args[2]
+    if not options.batch:
+        filename_base = args[0]
+        filename_mine = args[1]
+        filename_theirs = args[2]
 
     if options.password_file:
         f = open(options.password_file, 'rb')
@@ -95,6 +269,17 @@ def main(argv=None):
         note_root = config.get('note_root', '.')
 
     dos_newlines = True
+    if options.batch:
+        if os.path.isdir(options.batch):
+            triples = find_conflict_triples(options.batch, conflict_marker=options.conflict_marker)
+        else:
+            triples = read_manifest(options.batch)
+        counts = batch_merge(triples, password, diff_type=options.diff_type, jobs=options.jobs, write_conflicts=options.write_conflicts, dos_newlines=dos_newlines, simulate=options.simulate, verbose=verbose, backup=options.backup)
+        print('%d triples: %d clean, %d conflicted, %d errors' % (len(triples), counts['clean'], counts['conflicted'], counts['errors']))
+        if counts['conflicted'] or counts['errors']:
+            return 1
+        return 0
+
     base_file_contents = puren_tonbo.note_contents_load_filename(filename_base, get_pass=password, dos_newlines=dos_newlines, return_bytes=True)
     mine_file_contents = puren_tonbo.note_contents_load_filename(filename_mine, get_pass=password, dos_newlines=dos_newlines, return_bytes=True)
     theirs_file_contents = puren_tonbo.note_contents_load_filename(filename_theirs, get_pass=password, dos_newlines=dos_newlines, return_bytes=True)
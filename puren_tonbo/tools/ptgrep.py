@@ -150,63 +150,78 @@ def grep(search_term, paths_to_search, options, use_color, password_func, note_e
         if count_files_matched:
             result = []
             counter = 1  # manually count, rather than use enumerate()
+        limits = None
+        max_matches = getattr(options, 'max_matches', None)
+        max_files = getattr(options, 'max_files', None)
+        timeout = getattr(options, 'timeout', None)
+        if max_matches or max_files or timeout:
+            # overall limits, shared by all paths
+            limits = puren_tonbo.SearchLimits(max_matches=max_matches, max_files_with_matches=max_files, deadline_seconds=timeout)
+
+        # all paths searched concurrently, results in paths_to_search order
+        notes_paths = {}
+        notes_list = []
         for path_to_search in paths_to_search:
             #print('%r' % ((search_term, path_to_search, search_is_regex, ignore_case, search_encrypted, password_func),))  # TODO make pretty and/or log instead
-            notes = puren_tonbo.FileSystemNotes(path_to_search, note_encoding)
-
-            for hit in notes.search(search_term, search_term_is_a_regex=search_is_regex, ignore_case=ignore_case, search_encrypted=search_encrypted, find_only_filename=find_only_filename, files_with_matches=options.files_with_matches, get_password_callback=password_func, highlight_text_start=highlight_text_start, highlight_text_stop=highlight_text_stop):
-                filename, hit_detail = hit
-                #filename = remove_leading_path(path_to_search, filename)  # abspath2relative()
-                if filename:
-                    if options.display_full_path:
-                        filename = os.path.join(path_to_search, filename)
-                    if count_files_matched:
-                        result.append(filename)
-                    if ripgrep or only_filename_results:
-                        filename = '%s' % filename  # ripgrep/ack/ag uses filename only
-                    else:
-                        # grep - TODO should this be conditional on line numbers and/or wild card?
-                        filename = '%s:' % filename
-                    if count_files_matched:
-                        filename = '[%d] %s' % (counter, filename)
-                        counter += 1
+            notes = puren_tonbo.notes_for_root(path_to_search, note_encoding, archive=getattr(options, 'archive', False))
+            notes_paths[notes] = path_to_search
+            notes_list.append(notes)
+
+        for notes, filename, hit_detail in puren_tonbo.search_notes(notes_list, search_term, max_workers=getattr(options, 'jobs', None), search_term_is_a_regex=search_is_regex, ignore_case=ignore_case, search_encrypted=search_encrypted, find_only_filename=find_only_filename, files_with_matches=options.files_with_matches, get_password_callback=password_func, highlight_text_start=highlight_text_start, highlight_text_stop=highlight_text_stop, sort=getattr(options, 'sort', None), limits=limits, candidate_files=getattr(options, 'candidate_files', None), all_of=getattr(options, 'all_of', None), none_of=getattr(options, 'none_of', None)):
+            path_to_search = notes_paths[notes]
+            #filename = remove_leading_path(path_to_search, filename)  # abspath2relative()
+            if filename:
+                if options.display_full_path:
+                    filename = os.path.join(path_to_search, filename)
+                if count_files_matched:
+                    result.append(filename)
+                if ripgrep or only_filename_results:
+                    filename = '%s' % filename  # ripgrep/ack/ag uses filename only
                 else:
-                    # Single file grep, rather than recursive search
-                    # do not want filename
-                    filename = ''
-                if use_color:
-                    if not zebra_color_filenames:
-                        filename = color_filename + filename + color_reset
+                    # grep - TODO should this be conditional on line numbers and/or wild card?
+                    filename = '%s:' % filename
+                if count_files_matched:
+                    filename = '[%d] %s' % (counter, filename)
+                    counter += 1
+            else:
+                # Single file grep, rather than recursive search
+                # do not want filename
+                filename = ''
+            if use_color:
+                if not zebra_color_filenames:
+                    filename = color_filename + filename + color_reset
+                else:
+                    # zebra_color_filenames  NOTE requires counter
+                    if counter % 2:
+                        filename = color_filename_zebra + filename + color_reset
                     else:
-                        # zebra_color_filenames  NOTE requires counter
-                        if counter % 2:
-                            filename = color_filename_zebra + filename + color_reset
-                        else:
-                            filename = color_filename + filename + color_reset
-                if only_filename_results:
-                    print('%s' % (filename, ))
-                    continue
+                        filename = color_filename + filename + color_reset
+            if only_filename_results:
+                print('%s' % (filename, ))
+                continue
+            if ripgrep:
+                print('%s' % (filename, ))
+            for result_hit_line, result_hit_text in hit_detail:
+                if use_color:
+                    """
+                    if not search_is_regex:
+                        result_hit_text = result_hit_text.replace(search_term, color_searchhit + search_term + color_reset)  # no longer needed search func does highlight
+                    """
+                    # else TODO regex ripgrep search color highlighting
+                    result_hit_line = color_linenum + str(result_hit_line) + color_reset
+                else:
+                    result_hit_line = str(result_hit_line)
                 if ripgrep:
-                    print('%s' % (filename, ))
-                for result_hit_line, result_hit_text in hit_detail:
-                    if use_color:
-                        """
-                        if not search_is_regex:
-                            result_hit_text = result_hit_text.replace(search_term, color_searchhit + search_term + color_reset)  # no longer needed search func does highlight
-                        """
-                        # else TODO regex ripgrep search color highlighting
-                        result_hit_line = color_linenum + str(result_hit_line) + color_reset
-                    else:
-                        result_hit_line = str(result_hit_line)
-                    if ripgrep:
-                        # ripgrep like - automatically includes numbers
-                        print('%s:%s' % (result_hit_line, result_hit_text))
-                    elif line_numbers:
-                        # grep-like with numbers
-                        print('%s%s:%s' % (filename, result_hit_line, result_hit_text))
-                    else:
-                        # grep-like without numbers
-                        print('%s%s' % (filename, result_hit_text))
+                    # ripgrep like - automatically includes numbers
+                    print('%s:%s' % (result_hit_line, result_hit_text))
+                elif line_numbers:
+                    # grep-like with numbers
+                    print('%s%s:%s' % (filename, result_hit_line, result_hit_text))
+                else:
+                    # grep-like without numbers
+                    print('%s%s' % (filename, result_hit_text))
+        if limits and limits.truncated:
+            print('results truncated, %s limit reached' % limits.truncated)
     except (SearchCancelled, KeyboardInterrupt) as info:
         print('search cancelled', info)
     finally:
@@ -266,6 +281,22 @@ find filenames ONLY encrypted with regex
 
     %prog -y -k -r ^aesop
 
+search most recently modified notes first
+
+    %prog --sort=mtime-desc -i king
+
+notes containing both "invoice" and "2024" (on any lines) but not "draft"
+
+    %prog --all-of invoice --all-of 2024 --none-of draft
+
+notes containing any of the customer names in a file, one per line
+
+    %prog -i -f customers.txt
+
+stop early, first 10 hits of the most recent notes, at most 2 seconds
+
+    %prog --sort=mtime-desc -m 10 --timeout 2 -i king
+
 '''
 
 
@@ -285,6 +316,7 @@ def main(argv=None):
     parser.add_option("--list-formats", help="Which encryption/file formats are available", action="store_true")
     parser.add_option("--list-all-formats", help="List all (non-Raw) encryption/file formats are suportted (potentially not available", action="store_true")
     parser.add_option("--note-root", help="Directory of notes, or dir_name_or_filename1.... will pick up from config file and default to '.'")
+    parser.add_option("--archive", help="dir_name_or_filename are notebook archives (single AES ZIP file of notes), search the entries", action="store_true")
     parser.add_option("--highlight-text-start", "--highlight_text_start", help="Prefix marker for hits")
     parser.add_option("--highlight-text-stop", "--highlight_text_stop", help="Postfix marker for hits")
     parser.add_option("-i", "--ignore_case", help="Case insensitive search", action="store_true")
@@ -294,10 +326,19 @@ def main(argv=None):
     parser.add_option("-r", "--regex_search", help="Treat search term as a regex (default is to treat as literal word/phrase)", action="store_true")
     parser.add_option("-n", "--line_numbers", "--line-number", help="Print line number with output lines (grep format only)", action="store_true")
     parser.add_option("-s", "--search_term", help="Term to search for, if omitted, [search_term] is used instead")
+    parser.add_option("--regexp", "--any-of", "--any_of", help="Pattern to search for, can be repeated, files matching any of the patterns are shown. All arguments are then dir_name_or_filename", action="append", dest="patterns", metavar="PATTERN")
+    parser.add_option("-f", "--file", help="Read patterns from file, one per line, same as --regexp", dest="pattern_file", metavar="PATTERN_FILE")
+    parser.add_option("--all-of", "--all_of", help="Pattern files must contain (on any line), can be repeated", action="append", metavar="PATTERN")
+    parser.add_option("--none-of", "--none_of", help="Pattern files must NOT contain, can be repeated", action="append", metavar="PATTERN")
     parser.add_option("-c", "--codec", help="Override config file encoding (can be a list TODO format comma?)")
     parser.add_option("-p", "--password", help="password, if omitted and OS env PT_PASSWORD is set use that, next checks keyring, if missing prompt")
     parser.add_option("-P", "--password_file", help="file name where password is to be read from, trailing blanks are ignored")
     parser.add_option("-t", "--time", action="store_true")
+    parser.add_option("-m", "--max-count", "--max_count", help="Stop after this many matching lines (in total, not per file)", type="int", dest="max_matches")
+    parser.add_option("--max-files", "--max_files", help="Stop after this many files with matches", type="int")
+    parser.add_option("--timeout", help="Stop searching after this many seconds, results so far are shown", type="float")
+    parser.add_option("--sort", help="Order files are searched in; %s. Default %s, %s returns recent hits first" % (', '.join(puren_tonbo.SEARCH_SORT_ORDERS), puren_tonbo.SORT_PATH, puren_tonbo.SORT_MTIME_DESC), type="choice", choices=puren_tonbo.SEARCH_SORT_ORDERS)
+    parser.add_option("-j", "--jobs", help="Maximum number of paths (dir_name_or_filename) to search concurrently, default %d" % puren_tonbo.SEARCH_MAX_WORKERS, type="int")
     parser.add_option("-e", "--search_encrypted", help='Search encrypted files (default false)', action="store_true")
     parser.add_option("-k", "--search_encrypted_only", help='Search encrypted files (default false)', action="store_const", const='only', dest='search_encrypted')
     parser.add_option("-v", "--verbose", help='Print query search time', action="store_true")
@@ -321,12 +362,15 @@ def main(argv=None):
         puren_tonbo.print_version_info(list_all=options.list_all_formats)
         return 0
 
-    if not args:
+    patterns = options.patterns or []
+    if options.pattern_file:
+        f = codecs.open(options.pattern_file, 'r', encoding='utf-8')
+        patterns += [line.rstrip('\r\n') for line in f if line.strip()]
+        f.close()
+    if not args and not (options.search_term or patterns or options.all_of):
         parser.print_usage()
         return 1
 
-    in_filename = args[0]
-
     if options.password_file:
         f = open(options.password_file, 'rb')
         password_file = f.read()
@@ -343,6 +387,10 @@ def main(argv=None):
     ###################
     if options.search_term:
         search_term = options.search_term
+        if patterns:
+            search_term = [search_term] + patterns
+    elif patterns or options.all_of:
+        search_term = patterns  # all args are paths
     else:
         try:
             search_term = args.pop(0)
@@ -9,6 +9,7 @@ Example encryption file formats; Tombo CHI Blowfish files, VimCrypt, AES-256.zip
 TODO delete support (with confirmation)
 """
 
+import codecs
 import copy
 import datetime
 import json
@@ -111,6 +112,11 @@ class FakeOptions:  # to match ptgrep (OptParse) options
     time = True
     use_color = True  # TODO NO_COLOR https://no-color.org/ (also initial config creation)
     use_pager = False  # ptig specific
+    jobs = None  # maximum note roots searched concurrently, None means puren_tonbo.SEARCH_MAX_WORKERS
+    sort = None  # search file order, one of puren_tonbo.SEARCH_SORT_ORDERS. Control: set sort=mtime-desc
+    max_matches = None  # search limits, None for no limit. Control: set max_matches=100
+    max_files = None
+    timeout = None  # seconds
 
     def __init__(self, options=None):
         if options:
@@ -184,6 +190,50 @@ grep_parser.add_option(
     const='only',
     dest='search_encrypted',
 )
+grep_parser.add_option(
+    '--sort',
+    help='Order files are searched in; %s' % ', '.join(puren_tonbo.SEARCH_SORT_ORDERS),
+    type='choice',
+    choices=puren_tonbo.SEARCH_SORT_ORDERS,
+)
+grep_parser.add_option(
+    '-m',
+    '--max-count',
+    '--max_count',
+    help='Stop after this many matching lines (in total, not per file)',
+    type='int',
+    dest='max_matches',
+)
+grep_parser.add_option('--max-files', '--max_files', help='Stop after this many files with matches', type='int')
+grep_parser.add_option('--timeout', help='Stop searching after this many seconds', type='float')
+grep_parser.add_option(
+    '--regexp',
+    '--any-of',
+    '--any_of',
+    help='Pattern to search for, can be repeated, files matching any of the patterns are shown',
+    action='append',
+    dest='patterns',
+    metavar='PATTERN',
+)
+grep_parser.add_option(
+    '-f', '--file', help='Read patterns from file, one per line', dest='pattern_file', metavar='PATTERN_FILE'
+)
+grep_parser.add_option(
+    '--all-of',
+    '--all_of',
+    help='Pattern files must contain (on any line), can be repeated',
+    action='append',
+    metavar='PATTERN',
+)
+grep_parser.add_option(
+    '--none-of', '--none_of', help='Pattern files must NOT contain, can be repeated', action='append', metavar='PATTERN'
+)
+grep_parser.add_option(
+    '-w', '--within', help='Only search files in previous results, also see refine', action='store_true'
+)
+grep_parser.add_option(
+    '-b', '--bookmark', help='Only search files in bookmark BOOKMARK_NAME', metavar='BOOKMARK_NAME'
+)
 grep_help = grep_parser.format_help()
 
 fts_index_parser = PtigParser(
@@ -248,6 +298,7 @@ class CommandPrompt(Cmd):
                 os.path.abspath(note_path)
             )  # TODO future warning native file path code
         self.pt_config = pt_config
+        self.listing_notes_instances = None
         self.grep_options = grep_options or FakeOptions()
         self.file_hits = []  # results
         # import pdb ; pdb.set_trace()
@@ -272,6 +323,31 @@ class CommandPrompt(Cmd):
         "NOOP - do not repeat last command like cmd.Cmd"
         pass
 
+    def listing_notes_all(self):
+        """List of FileSystemNotes, one per note root, used for listings (recent, find_foreign, cache), with a NoteCatalog if one is configured
+        Created once, so an in-memory catalog is reused between commands.
+        """
+        if self.listing_notes_instances is None:
+            catalog_location = self.pt_config.get('catalog')
+            if catalog_location and catalog_location != puren_tonbo.IN_MEMORY:
+                catalog_location = os.path.expanduser(catalog_location)
+            self.listing_notes_instances = []
+            for note_root in self.paths_to_search:
+                root_catalog_location = catalog_location
+                if len(self.paths_to_search) > 1:
+                    root_catalog_location = puren_tonbo.catalog_location_for_root(catalog_location, note_root)
+                self.listing_notes_instances.append(puren_tonbo.FileSystemNotes(
+                    note_root,
+                    self.pt_config['codec'],
+                    catalog_location=root_catalog_location,
+                    ignore_folders=self.pt_config['ignore_folders'],
+                ))
+        return self.listing_notes_instances
+
+    def listing_notes(self):
+        """FileSystemNotes for the first note root, see listing_notes_all()"""
+        return self.listing_notes_all()[0]
+
     def do_crash_debug(self, line=None):
         """Force a crash for debugging"""
         0 / 0
@@ -556,11 +632,7 @@ class CommandPrompt(Cmd):
 
         # sub_dir = os.path.dirname(line)  # similar open to opendir - but for directory listings, i.e. can NOT ls/dir a single file (future TODO?)
         sub_dir = line
-        note_encoding = self.pt_config['codec']
-        note_root = self.paths_to_search[
-            0
-        ]  # FIXME handle multiple note dirs, read and new do. TODO just pick the first one, ignore everthing else
-        notes = puren_tonbo.FileSystemNotes(note_root, note_encoding)
+        notes = self.listing_notes()  # FIXME handle multiple note dirs, read and new do. TODO just pick the first one, ignore everthing else
         # TODO handle; puren_tonbo.PurenTonboIO: outside of note tree root? no need, handled by validate_result_id()
         # FIXME/TODO results list with numbers?
         dir_list, file_list = notes.directory_contents(sub_dir=sub_dir)
@@ -651,35 +723,33 @@ class CommandPrompt(Cmd):
         if line:
             if line == 'off':
                 return self.do_nocache()
-        note_root = self.paths_to_search[
-            0
-        ]  # TODO loop through them all. For now just pick the first one, ignore everthing else
-        note_encoding = self.pt_config['codec']
-        notes = puren_tonbo.FileSystemNotes(note_root, note_encoding)
+        notes_list = self.listing_notes_all()
         print('cache on')
-        self.cache = list(notes.recurse_notes())
+        self.cache = []
+        for filenames in puren_tonbo.map_notes(lambda notes: list(notes.recurse_notes()), notes_list):
+            self.cache += filenames
 
     def do_find_foreign(self, line=None):
         """list files not supported by PurenTonbo"""
         use_color = self.grep_options.use_color
-        note_encoding = self.pt_config['codec']
-        note_root = self.paths_to_search[
-            0
-        ]  # TODO loop through them all. For now just pick the first one, ignore everthing else
         # for now, ignore line
         ignore_folders = self.pt_config['ignore_folders']
         ignore_files = self.pt_config['ignore_file_extensions']
-        notes = puren_tonbo.FileSystemNotes(note_root, note_encoding)
-        hits = []
-        for counter, filename in enumerate(
-            puren_tonbo.find_unsupported_files(
-                note_root,
-                order=puren_tonbo.ORDER_DESCENDING,
-                ignore_files=ignore_files,
-                ignore_folders=ignore_folders,
+        notes_list = self.listing_notes_all()
+        unsupported_files = []
+        for filenames in puren_tonbo.map_notes(
+            lambda notes: list(
+                notes.unsupported_notes(
+                    order=puren_tonbo.ORDER_DESCENDING,
+                    ignore_files=ignore_files,
+                    ignore_folders=ignore_folders,
+                )
             ),
-            start=1,
+            notes_list,
         ):
+            unsupported_files += filenames
+        hits = []
+        for counter, filename in enumerate(unsupported_files, start=1):
             hits.append(filename)
             result_hit_line = '[%d] %s' % (counter, filename)
             if use_color:
@@ -711,28 +781,33 @@ class CommandPrompt(Cmd):
             except ValueError:
                 print('invalid parameter/number')
                 return
-        note_encoding = self.pt_config['codec']
         ignore_folders = self.pt_config['ignore_folders']
-        note_root = self.paths_to_search[
-            0
-        ]  # TODO loop through them all. For now just pick the first one, ignore everthing else
         # for now, ignore line
         # sub_dir = line
         sub_dir = None
-        notes = puren_tonbo.FileSystemNotes(note_root, note_encoding)
+        notes_list = self.listing_notes_all()
+        recent_files = []
+        for filenames in puren_tonbo.map_notes(
+            lambda notes: list(
+                notes.recent_notes(
+                    number_of_files=number_of_files,
+                    order=puren_tonbo.ORDER_DESCENDING,
+                    ignore_folders=ignore_folders,
+                )
+            ),
+            notes_list,
+        ):
+            recent_files += filenames
+        if len(notes_list) > 1:
+            # merge newest from each note root
+            recent_files.sort(key=os.path.getmtime, reverse=True)
+            recent_files = recent_files[:number_of_files]
         hits = []
         use_zebra_color_filenames = self.grep_options.zebra_color_filenames
         color_filename_zebra = ptgrep.color_filename_zebra
         color_reset = ptgrep.color_reset
         color_filename = ptgrep.color_filename
-        for counter, filename in enumerate(
-            notes.recent_notes(
-                number_of_files=number_of_files,
-                order=puren_tonbo.ORDER_DESCENDING,
-                ignore_folders=ignore_folders,
-            ),
-            start=1,
-        ):
+        for counter, filename in enumerate(recent_files, start=1):
             hits.append(filename)
             result_hit_line = '[%d] %s' % (counter, filename)
             result_hit_line = zebra_stripe(
@@ -886,6 +961,14 @@ class CommandPrompt(Cmd):
             # dumb boolean detection/force
             if attribute_value.lower() in ('true', 'false'):
                 attribute_value = attribute_value.lower() == 'true'
+            else:
+                # numbers, e.g. set max_matches=100 / set timeout=1.5
+                for number_type in (int, float):
+                    try:
+                        attribute_value = number_type(attribute_value)
+                        break
+                    except ValueError:
+                        pass
             setattr(self.grep_options, attribute_name, attribute_value)
             return
 
@@ -1435,7 +1518,7 @@ class CommandPrompt(Cmd):
         except ValueError:
             Cmd.default(self, line)  # Super...
 
-    def do_grep(self, line=None, paths_to_search=None):
+    def do_grep(self, line=None, paths_to_search=None, candidate_files=None):
         # Doc comment updated in code; CommandPrompt.do_grep.__doc__ - TODO list aliases?
         if not line:
             print('Need a search term')  # TODO show help?
@@ -1452,13 +1535,21 @@ class CommandPrompt(Cmd):
             )  # FIXME ptig can exit with bad (ptig) ptgrep params
             if grep_parser._ptig_error:
                 return
-            if not grep_parser_args:
+            patterns = grep_parser_options.patterns or []
+            if grep_parser_options.pattern_file:
+                with codecs.open(grep_parser_options.pattern_file, 'r', encoding='utf-8') as f:
+                    patterns += [pattern.rstrip('\r\n') for pattern in f if pattern.strip()]
+            if not grep_parser_args and not (patterns or grep_parser_options.all_of):
                 print('Need a search term')  # TODO show help?
                 return
-            if len(grep_parser_args) != 1:
+            if len(grep_parser_args) > 1:
                 print('Too many search terms (use quotes)')  # TODO show help?
                 return
-            search_term = grep_parser_args[0]
+            search_term = grep_parser_args[:1] + patterns  # multiple patterns, any of
+            if len(search_term) == 1:
+                search_term = search_term[0]
+            options.all_of = grep_parser_options.all_of
+            options.none_of = grep_parser_options.none_of
             # TODO consider a loop of get /set attr
             options.ignore_case = options.ignore_case or grep_parser_options.ignore_case
             if grep_parser_options.case_sensitive:
@@ -1475,9 +1566,27 @@ class CommandPrompt(Cmd):
             options.search_encrypted = (
                 options.search_encrypted or grep_parser_options.search_encrypted
             )
-        if not search_term:
+            options.sort = grep_parser_options.sort or options.sort
+            options.max_matches = grep_parser_options.max_matches or options.max_matches
+            options.max_files = grep_parser_options.max_files or options.max_files
+            options.timeout = grep_parser_options.timeout or options.timeout
+            if grep_parser_options.within:
+                candidate_files = self.file_hits
+            if grep_parser_options.bookmark:
+                if grep_parser_options.bookmark not in self.bookmarks:
+                    print('unknown bookmark %s' % grep_parser_options.bookmark)
+                    return
+                candidate_files = self.bookmarks[grep_parser_options.bookmark]
+        if not search_term and not getattr(options, 'all_of', None):
             print('Need a search term')  # TODO show help?
             return
+        if candidate_files is not None:
+            if not candidate_files:
+                print('no results to search within')
+                return
+            # only read/decrypt candidates, rather than walking (or using the cache of) every note root
+            options.candidate_files = candidate_files
+            paths_to_search = paths_to_search or self.paths_to_search
         paths_to_search = paths_to_search or self.cache or self.paths_to_search
 
         note_encoding = self.pt_config['codec']
@@ -1491,6 +1600,18 @@ class CommandPrompt(Cmd):
             search_term, paths_to_search, options, use_color, password_func, note_encoding
         )
 
+    def do_refine(self, line=None):
+        """grep within previous results (file names), cost is proportional to the number of previous results
+        rather than all notes. Same as `grep -w`, also see `grep -b BOOKMARK_NAME`
+
+        Examples:
+
+            grep invoice
+            refine 2024
+            refine -i paid
+        """
+        return self.do_grep(line=line, candidate_files=self.file_hits)
+
     do_ptgrep = do_grep  # shortcut to save typing
     do_g = do_grep  # shortcut to save typing
     do_ack = do_grep  # ack alias for convenience
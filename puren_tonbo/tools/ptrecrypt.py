@@ -36,6 +36,10 @@ r"""Command line tool to re-encrypt Puren Tonbo files from any format into any f
 
     python -m puren_tonbo.tools.ptrecrypt --simulate  -p password  --force_recrypt_same_format_password  --existing_files replace --skip_unencrypted  puren_tonbo/tests/data/
 
+Parallel and resumable, 4 processes and a journal of completed files (rerun the same command to resume after an interruption):
+
+    python -m puren_tonbo.tools.ptrecrypt -j 4 --journal /tmp/all_jenc.journal --cipher .jenc -p password --destination_directory /tmp/all_jenc puren_tonbo/tests/data/
+
 Tests:
 
     ptrecrypt -p password --cipher .zip                      --existing-files=delete puren_tonbo/tests/demo_notes/secrets/accounts
@@ -57,7 +61,11 @@ Restore text files:
 
 import datetime
 import glob
+import hashlib
+import itertools
+import json
 import logging
+import multiprocessing
 import os
 from optparse import OptionParser
 import sys
@@ -111,14 +119,174 @@ def safe_mkdir(newdir):
             raise
 
 def write_encrypted_file(out_handler, filename, plaintext_bytes):
+    """Write to a tempfile in the same directory, then replace filename, existing file (if any) is untouched on failure"""
     safe_mkdir(os.path.dirname(filename))
-    out_file = open(filename, 'wb')
-    out_handler.write_to(out_file, plaintext_bytes)
-    out_file.close()
+    out_file = tempfile.NamedTemporaryFile(mode='wb', dir=os.path.dirname(filename), prefix=os.path.basename(filename), suffix='.tmp', delete=False)
+    try:
+        out_handler.write_to(out_file, plaintext_bytes)
+        out_file.close()
+        puren_tonbo.file_replace(out_file.name, filename)
+    except:
+        out_file.close()
+        os.remove(out_file.name)
+        raise
+
+
+def file_sha256(filename):
+    """hex digest of contents of filename"""
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Journal(object):
+    """Record of completed files, so an interrupted run can be resumed
+    JSON lines, one per completed file; source filename, new filename, sha256 of new file and completion time.
+    A file is considered done if it is in the journal and either was skipped (no new file, e.g. same format
+    and password) or the new file still exists with the recorded sha256.
+    Files written but not yet journaled (e.g. interrupted run) are found with completed_new_filename().
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.entries = {}
+        if os.path.exists(filename):
+            with open(filename) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        log.warning('Ignoring corrupt journal line (likely interrupted write) %r', line)
+                        continue
+                    self.entries[entry['filename']] = entry
+        self.journal_file = open(filename, 'a')
+
+    def is_done(self, filename):
+        entry = self.entries.get(os.path.abspath(filename))
+        if entry is None:
+            return False
+        new_filename = entry['new_filename']
+        if new_filename is None:
+            return True  # skipped, e.g. same format and password
+        return os.path.exists(new_filename) and file_sha256(new_filename) == entry['sha256']
+
+    def record(self, entry):
+        self.entries[entry['filename']] = entry
+        self.journal_file.write(json.dumps(entry) + '\n')
+        self.journal_file.flush()
+        os.fsync(self.journal_file.fileno())
+
+    def close(self):
+        self.journal_file.close()
+
+
+def format_duration(seconds):
+    return str(datetime.timedelta(seconds=int(seconds)))
+
+
+class Progress(object):
+    """Files completed, throughput and ETA, written to stderr"""
+    def __init__(self, total, stream=None):
+        self.total = total
+        self.completed = 0
+        self.start_time = time.time()
+        self.stream = stream or sys.stderr
+
+    def update(self, count=1):
+        self.completed += count
+        elapsed = time.time() - self.start_time
+        rate = self.completed / elapsed if elapsed else 0.0
+        if rate:
+            eta = format_duration((self.total - self.completed) / rate)
+        else:
+            eta = '?'
+        self.stream.write('\r%d/%d files, %.1f files/sec, elapsed %s, ETA %s ' % (self.completed, self.total, rate, format_duration(elapsed), eta))
+        self.stream.flush()
+
+    def finish(self):
+        self.stream.write('\n')
+        self.stream.flush()
+
+
+def process_file_job(job):
+    """Process pool worker, job is a tuple of (filename, process_file args tuple, process_file kwargs dict)
+    Returns journal entry dict, or dict with filename and error (exception) on failure
+    """
+    filename, args, kwargs = job
+    try:
+        new_filename = process_file(filename, *args, **kwargs)
+    except Exception as info:
+        # returned rather than raised, so results completed before it are still seen (and journaled) in order
+        return {'filename': os.path.abspath(filename), 'error': info}
+    sha256 = None
+    if new_filename and not kwargs.get('simulate') and os.path.exists(new_filename):
+        sha256 = file_sha256(new_filename)
+    return {'filename': os.path.abspath(filename), 'new_filename': new_filename, 'sha256': sha256, 'time': datetime.datetime.now().isoformat()}
+
+
+def completed_new_filename(job):
+    """For a job (see process_file_job()) not in the journal, returns the absolute new filename if it was
+    already written (it exists and decrypts to the same plain text as the source), else None.
+    Catches files written by an interrupted run before they were journaled.
+    """
+    filename, (password, new_password, handler_class_newfile), kwargs = job
+    try:
+        in_handler_class = puren_tonbo.filename2handler(filename)
+        out_handler_class = handler_class_newfile or in_handler_class
+        new_filename = os.path.abspath(new_filename_for(filename, in_handler_class, out_handler_class, new_extension=kwargs.get('new_extension'), destination_directory=kwargs.get('destination_directory')))
+        if new_filename == os.path.abspath(filename) or not os.path.exists(new_filename):
+            return None  # in-place rewrite can not be told apart from the source
+        with open(filename, 'rb') as in_file:
+            plaintext_bytes = in_handler_class(key=password).read_from(in_file)
+        force_newline = kwargs.get('force_newline')
+        if force_newline:
+            plaintext_bytes = forcebad_dos2unix(plaintext_bytes)
+            if force_newline == 'dos':
+                plaintext_bytes = simple_unix2dos(plaintext_bytes)
+        with open(new_filename, 'rb') as in_file:
+            if out_handler_class(key=new_password).read_from(in_file) != plaintext_bytes:
+                return None
+    except (puren_tonbo.PurenTonboException, IOError, OSError):
+        return None
+    return new_filename
+
+
+def new_filename_for(filename, in_handler_class, out_handler_class, new_extension=None, destination_directory=None):
+    """Returns the filename process_file() will write filename to"""
+    new_extension = new_extension or "default"
+    base_filename, original_extension = filename, ''
+    for extn in in_handler_class.extensions:  # see BaseFile.split_extension()
+        if filename.endswith(extn):
+            base_filename, original_extension = filename[:-len(extn)], extn
+            break
+
+    if new_extension == "default":
+        new_file_extension = out_handler_class.extensions[0]  # see BaseFile.default_extension()
+    elif new_extension == "cipher":
+        # likely the same as default
+        new_file_extension = out_handler_class.extensions[0]
+    elif new_extension == "retain":
+        new_file_extension = original_extension
+    else:
+        if not new_extension.startswith('.'):
+            raise NotImplementedError('new_extension %r' % (new_extension,))
+        new_file_extension = new_extension
+
+    new_filename = base_filename + new_file_extension  # FIXME option needed
+
+    if destination_directory:
+        new_filename = os.path.join(destination_directory, new_filename)
+        # TODO mkdir
+    return new_filename
 
 
 def process_file(filename, password, new_password, handler_class_newfile, force_recrypt_same_format_password=False, destination_directory=None, new_extension=None, existing_files_resolution=None, simulate=None, force_newline=None):
     """destination_directory can only work if filename is NOT an absolute path... which may be passed in via command line (for either filename or directory name).
+    Returns absolute new filename written (or would be written, if simulate), None if skipped
     """
     new_extension = new_extension or "default"
     existing_files_resolution = existing_files_resolution or 'stop'
@@ -159,7 +327,6 @@ def process_file(filename, password, new_password, handler_class_newfile, force_
         raise
     finally:
         in_file.close()
-    base_filename, original_extension = in_handler.split_extension(filename)
     #"""
     #print('\t\t %r' % plaintext_bytes)
     #log.debug('%s plaintext_bytes: %s', filename, plaintext_bytes)  # TODO verbose
@@ -169,25 +336,8 @@ def process_file(filename, password, new_password, handler_class_newfile, force_
         return
     log.info('%s -> %s', in_handler_class, out_handler_class)
     out_handler = out_handler_class(new_password)
-    #print('\t\t %r' % ((base_filename, original_extension, original_extension in out_handler.extensions, out_handler.default_extension()),))
-
-    if new_extension == "default":
-        new_file_extension = out_handler.default_extension()
-    elif new_extension == "cipher":
-        # likely the same as default
-        new_file_extension = out_handler.default_extension()
-    elif new_extension == "retain":
-        new_file_extension = original_extension
-    else:
-        if not new_extension.startswith('.'):
-            raise NotImplementedError('new_extension %r' % (new_extension,))
-        new_file_extension = new_extension
-
-    new_filename = base_filename + new_file_extension  # FIXME option needed
 
-    if destination_directory:
-        new_filename = os.path.join(destination_directory, new_filename)
-        # TODO mkdir
+    new_filename = new_filename_for(filename, in_handler_class, out_handler_class, new_extension=new_extension, destination_directory=destination_directory)
     log.info('%s -> %s', filename, new_filename)
     new_filename_abs = os.path.abspath(new_filename)
 
@@ -219,10 +369,11 @@ def process_file(filename, password, new_password, handler_class_newfile, force_
     if existing_files_resolution == 'delete':
         log.warning('about to delete old file %s', filename)
         if simulate:
-            return
+            return new_filename_abs
         #raise NotImplementedError('Actual delete')
         # TODO option to decrypt as a final saity check before deleting?
         os.remove(filename_abs)  # use abs name, for hopefully better error reporting
+    return new_filename_abs
 
 
 
@@ -256,6 +407,10 @@ def main(argv=None):
     parser.add_option("--skip-unencrypted", "--skip_unencrypted", help="For directories, skip files that are not already encrypted", action="store_true")  # TODO consider applying to files specified on command line
     parser.add_option("--existing-files", "--existing_files", help="How to handle existing files; resolving files that already exist; default error/stop, skip, overwrite/replace/delete (in safe mode - needed for same file type, new password), delete (after successful write)")
     parser.add_option("--simulate", help="Do not write/delete/change files", action="store_true")
+    parser.add_option("-j", "--jobs", help="Number of processes to use, default 1", type="int")
+    parser.add_option("--journal", help="Journal filename, completed files are recorded so a rerun resumes where it stopped")
+    parser.add_option("--progress", help="Show progress/ETA, default on if stderr is a terminal", action="store_true")
+    parser.add_option("--no-progress", "--no_progress", help="Do not show progress/ETA", action="store_false", dest="progress")
 
     # TODO option on saving to delete original file -- see existing-files / --existing_files
     (options, args) = parser.parse_args(argv[1:])
@@ -329,6 +484,10 @@ def main(argv=None):
     if options.time:
         start_time = time.time()
 
+    # build the complete list of work up front, for progress/ETA and so it can be split across processes
+    process_file_args = (password, new_password, handler_class_newfile)
+    process_file_kwargs = dict(force_recrypt_same_format_password=options.force_recrypt_same_format_password, destination_directory=destination_directory, new_extension=options.new_extension, existing_files_resolution=options.existing_files, simulate=simulate)
+    jobs = []
     filename_pattern_list = args
     directory_list = []
     log.debug('args: %r' % ((argv, args, directory_list),))
@@ -340,7 +499,8 @@ def main(argv=None):
             directory_list.append(filename_pattern)
             continue
         for filename in glob.glob(filename_pattern):
-            process_file(filename, password, new_password, handler_class_newfile, force_recrypt_same_format_password=options.force_recrypt_same_format_password, destination_directory=destination_directory, new_extension=options.new_extension, existing_files_resolution=options.existing_files, simulate=simulate, force_newline=force_newline)
+            kwargs = dict(process_file_kwargs, force_newline=force_newline)
+            jobs.append((filename, process_file_args, kwargs))
 
     if directory_list:
         # or use puren_tonbo.walker(), potentially more efficient with filename lookup?
@@ -354,7 +514,76 @@ def main(argv=None):
                     if verbose:
                         log.warning('Skipping not encrypted %s', (filename,))
                     continue
-                process_file(filename, password, new_password, handler_class_newfile, force_recrypt_same_format_password=options.force_recrypt_same_format_password, destination_directory=destination_directory, new_extension=options.new_extension, existing_files_resolution=options.existing_files, simulate=simulate)
+                jobs.append((filename, process_file_args, process_file_kwargs))
+
+    journal = None
+    if options.journal and not simulate:
+        journal = Journal(options.journal)
+        job_count = len(jobs)
+        remaining_jobs = []
+        for job in jobs:
+            if journal.is_done(job[0]):
+                continue
+            new_filename = completed_new_filename(job)
+            if new_filename:
+                # written, but not journaled before the previous run stopped
+                journal.record({'filename': os.path.abspath(job[0]), 'new_filename': new_filename, 'sha256': file_sha256(new_filename), 'time': datetime.datetime.now().isoformat()})
+                continue
+            remaining_jobs.append(job)
+        jobs = remaining_jobs
+        if job_count != len(jobs):
+            print('Resuming, %d of %d files already completed according to journal %s' % (job_count - len(jobs), job_count, options.journal))
+
+    progress = None
+    if options.progress is None:
+        options.progress = sys.stderr.isatty()
+    if options.progress and jobs:
+        progress = Progress(len(jobs))
+
+    pool = None
+    if options.jobs and options.jobs > 1 and len(jobs) > 1:
+        # files that map to the same new filename are not safe to run concurrently (existing file checks),
+        # only the first goes to the pool, the rest run serially afterwards - same as a serial run
+        parallel_jobs = []
+        serial_jobs = []
+        seen_new_filenames = set()
+        for job in jobs:
+            filename = job[0]
+            try:
+                new_filename = os.path.abspath(new_filename_for(filename, puren_tonbo.filename2handler(filename), handler_class_newfile or puren_tonbo.filename2handler(filename), new_extension=options.new_extension, destination_directory=destination_directory))
+            except puren_tonbo.UnsupportedFile:
+                new_filename = None
+            if new_filename in seen_new_filenames:
+                serial_jobs.append(job)
+            else:
+                seen_new_filenames.add(new_filename)
+                parallel_jobs.append(job)
+        pool = multiprocessing.Pool(options.jobs)
+        results = itertools.chain(pool.imap_unordered(process_file_job, parallel_jobs), (process_file_job(job) for job in serial_jobs))
+    else:
+        results = (process_file_job(job) for job in jobs)
+    try:
+        for entry in results:
+            if 'error' in entry:
+                log.error('Stopping, error processing %s', entry['filename'])
+                raise entry['error']
+            if journal:
+                journal.record(entry)
+            if progress:
+                progress.update()
+        if pool:
+            pool.close()
+    except:
+        if pool:
+            pool.terminate()
+        raise
+    finally:
+        if pool:
+            pool.join()
+        if progress:
+            progress.finish()
+        if journal:
+            journal.close()
 
     if options.time:
         end_time = time.time()
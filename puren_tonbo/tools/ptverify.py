@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# -*- coding: us-ascii -*-
+# vim:ts=4:sw=4:softtabstop=4:smarttab:expandtab
+"""Command line tool to verify every (supported) note in a directory of notes can be read, decrypted and decoded.
+Useful after a password change or sync problems.
+
+    python -m puren_tonbo.tools.ptverify -h
+    python -m puren_tonbo.tools.ptverify -p password --note-root puren_tonbo/tests/data
+
+Parallel (4 processes), with a cache of previously verified files so reruns only check new/changed files,
+and a JSON Lines report (one JSON object per file):
+
+    python -m puren_tonbo.tools.ptverify -p password -j 4 --cache verify_cache.json -o report.jsonl --note-root ~/notes
+
+Per file status is one of:
+
+  * ok - decrypted (including any format integrity checks, e.g. HMAC, CRC) and decoded
+  * bad_password - incorrect password (or, for some formats, a damaged file)
+  * encoding_error - decrypted but could not be decoded with any of the note encodings, see --codec
+  * error - any other failure, e.g. corrupt/truncated file, see error in report
+
+Exit code is 0 if all files are ok, 1 otherwise.
+"""
+
+import binascii
+import hashlib
+import json
+import logging
+import multiprocessing
+from optparse import OptionParser
+import os
+import sys
+
+import puren_tonbo
+import puren_tonbo.ui
+
+
+log = logging.getLogger(__name__)
+logging.basicConfig()
+
+
+STATUS_OK = 'ok'
+STATUS_BAD_PASSWORD = 'bad_password'
+STATUS_ENCODING_ERROR = 'encoding_error'
+STATUS_ERROR = 'error'
+
+CACHE_FINGERPRINT_ITERATIONS = 100000  # pbkdf2 rounds for password fingerprint in cache file
+
+
+def verify_file(note_root, note_encoding, filename, password):
+    """Decrypt and decode a single note, filename is relative to note_root
+    Returns report entry dict (never raises for file problems)
+    """
+    notes = puren_tonbo.FileSystemNotes(note_root, note_encoding)
+    entry = {
+        'filename': filename,
+        'size': None,
+        'mtime': None,
+        'status': STATUS_OK,
+        'error': None,
+    }
+    try:
+        stat_info = os.stat(notes.native_full_path(filename))  # may have been removed since the directory walk
+        entry['size'], entry['mtime'] = stat_info.st_size, stat_info.st_mtime
+        entry['handler'] = puren_tonbo.filename2handler(filename).__name__
+        plain_bytes = notes.note_contents(filename, get_pass=password, dos_newlines=False, return_bytes=True)
+    except puren_tonbo.BadPassword as info:
+        entry['status'], entry['error'] = STATUS_BAD_PASSWORD, repr(info)
+        return entry
+    except Exception as info:
+        entry['status'], entry['error'] = STATUS_ERROR, repr(info)
+        return entry
+    try:
+        notes.to_string(plain_bytes)
+    except (puren_tonbo.UnsupportedFile, UnicodeDecodeError, LookupError) as info:
+        entry['status'], entry['error'] = STATUS_ENCODING_ERROR, repr(info)
+    return entry
+
+
+def verify_file_job(job):
+    """Process pool worker, job is a tuple of verify_file() args"""
+    return verify_file(*job)
+
+
+def password_fingerprint(password, salt):
+    """Salted (slow) hash of password, hex string. Stored in the cache so results
+    verified with one password are not reported as ok for another"""
+    password = password or b''
+    if not isinstance(password, bytes):
+        password = password.encode('us-ascii')
+    return binascii.hexlify(hashlib.pbkdf2_hmac('sha256', password, salt, CACHE_FINGERPRINT_ITERATIONS)).decode('us-ascii')
+
+
+def load_cache(cache_filename, password):
+    """Returns dict of filename -> {'mtime': ..., 'size': ...} of previously verified (ok) files.
+    Empty if the cache was written for a different password (or is missing, corrupt or old format)"""
+    if not cache_filename or not os.path.exists(cache_filename):
+        return {}
+    with open(cache_filename) as f:
+        try:
+            cache = json.load(f)
+        except ValueError:
+            log.warning('Ignoring corrupt cache file %s', cache_filename)
+            return {}
+    try:
+        salt = binascii.unhexlify(cache['password_salt'])
+        if password_fingerprint(password, salt) != cache['password_fingerprint']:
+            log.info('Ignoring cache file %s, different password', cache_filename)
+            return {}
+        return cache['files']
+    except (KeyError, TypeError, ValueError):
+        log.warning('Ignoring unrecognized cache file %s', cache_filename)
+        return {}
+
+
+def save_cache(cache_filename, files, password):
+    salt = os.urandom(16)
+    cache = {
+        'password_salt': binascii.hexlify(salt).decode('us-ascii'),
+        'password_fingerprint': password_fingerprint(password, salt),
+        'files': files,
+    }
+    temp_filename = cache_filename + '.tmp'
+    with open(temp_filename, 'w') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    puren_tonbo.file_replace(temp_filename, cache_filename)
+
+
+def verify(note_root, password, note_encoding='utf-8', jobs=None, cache_filename=None):
+    """Verify all supported notes under note_root
+    password is bytes (callbacks can not be passed to worker processes)
+    Returns list of report entry dicts, in filename order.
+    Files unchanged (path, mtime and size) since they were last verified ok, with the same password,
+    are not re-read, entry has 'cached' set.
+    """
+    notes = puren_tonbo.FileSystemNotes(note_root, note_encoding)
+    cache = load_cache(cache_filename, password)
+    report = []
+    todo = []
+    for fullpath_filename in puren_tonbo.recurse_notes(notes.note_root, puren_tonbo.supported_filename_filter):
+        filename = notes.abspath2relative(fullpath_filename)
+        cached = cache.get(filename)
+        if cached is not None:
+            try:
+                stat_info = os.stat(fullpath_filename)
+            except OSError:
+                stat_info = None  # removed since the walk, verify_file() reports it
+            if stat_info and cached['mtime'] == stat_info.st_mtime and cached['size'] == stat_info.st_size:
+                report.append(dict(cached, filename=filename, status=STATUS_OK, error=None, cached=True))
+                continue
+        todo.append((notes.note_root, note_encoding, filename, password))
+
+    if jobs and jobs > 1 and len(todo) > 1:
+        pool = multiprocessing.Pool(jobs)
+        try:
+            report.extend(pool.map(verify_file_job, todo))
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    else:
+        report.extend(verify_file_job(job) for job in todo)
+    report.sort(key=lambda entry: entry['filename'])
+
+    if cache_filename:
+        # only successes are cached, failures are always rechecked (e.g. after a password fix)
+        cache = {}
+        for entry in report:
+            if entry['status'] == STATUS_OK:
+                cache[entry['filename']] = {'mtime': entry['mtime'], 'size': entry['size'], 'handler': entry.get('handler')}
+        save_cache(cache_filename, cache, password)
+    return report
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+
+    usage = "usage: %prog [options]"
+    parser = OptionParser(usage=usage, version="%%prog %s" % puren_tonbo.__version__)
+    parser.add_option("--list-formats", help="Which encryption/file formats are available", action="store_true")
+    parser.add_option("--note-root", help="Directory of notes override")
+    parser.add_option("-c", "--codec", help="Override config file encoding (can be a list TODO format comma?)")
+    parser.add_option("-p", "--password", help="password, if omitted but OS env PT_PASSWORD is set use that, if missing prompt")
+    parser.add_option("-P", "--password_file", help="file name where password is to be read from, trailing blanks are ignored")
+    parser.add_option("--config-file", "--config_file", help="Override config file")
+    parser.add_option("-j", "--jobs", help="Number of processes to use, default one per CPU", type="int")
+    parser.add_option("--cache", help="Cache file (JSON) of verified files, unchanged files (path, mtime, size) are not checked again with the same password")
+    parser.add_option("-o", "--output", help="Write JSON Lines report to this file, default stdout")
+    parser.add_option("-v", "--verbose", action="store_true")
+
+    (options, args) = parser.parse_args(argv[1:])
+    verbose = options.verbose
+    if verbose:
+        print('Python %s on %s' % (sys.version.replace('\n', ' - '), sys.platform))
+    if options.list_formats:
+        puren_tonbo.print_version_info()
+        return 0
+
+    if options.password_file:
+        f = open(options.password_file, 'rb')
+        password_file = f.read()
+        f.close()
+        password_file = password_file.strip()
+    else:
+        password_file = None
+
+    password = options.password or password_file or os.environ.get('PT_PASSWORD') or puren_tonbo.keyring_get_password()
+    if password is None:
+        # prompt once, up front. Worker processes need the password itself not a prompt callback
+        password = puren_tonbo.ui.getpassfunc("Puren Tonbo ptverify Password:")
+    if password and not isinstance(password, bytes):
+        password = password.encode('us-ascii')
+
+    config = puren_tonbo.get_config(options.config_file)
+
+    if options.codec:
+        note_encoding = options.codec
+    else:
+        note_encoding = config['codec']
+
+    if options.note_root:
+        note_root = options.note_root
+    else:
+        note_root = config.get('note_root', '.')
+
+    jobs = options.jobs or multiprocessing.cpu_count()
+    report = verify(note_root, password, note_encoding=note_encoding, jobs=jobs, cache_filename=options.cache)
+
+    if options.output:
+        out = open(options.output, 'w')
+    else:
+        out = sys.stdout
+    try:
+        for entry in report:
+            out.write(json.dumps(entry, sort_keys=True) + '\n')
+    finally:
+        if options.output:
+            out.close()
+
+    counts = {}
+    for entry in report:
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+    cached_count = len([entry for entry in report if entry.get('cached')])
+    sys.stderr.write('%d files, %s (%d from cache)\n' % (len(report), ', '.join('%s %d' % (status, counts[status]) for status in sorted(counts)) or 'nothing to verify', cached_count))
+
+    if counts.get(STATUS_OK, 0) != len(report):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
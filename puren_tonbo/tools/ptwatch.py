@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: us-ascii -*-
+# vim:ts=4:sw=4:softtabstop=4:smarttab:expandtab
+"""Command line tool (long running) that watches a directory of notes and keeps
+the note metadata catalog and full text search (FTS) index up to date, so ptig
+listings and fts_search never need a manual fts_index/rebuild.
+
+    python -m puren_tonbo.tools.ptwatch -h
+    python -m puren_tonbo.tools.ptwatch --note-root ~/notes
+    python -m puren_tonbo.tools.ptwatch --note-root ~/notes --search_encrypted -p password
+
+Uses inotify on Linux, polling elsewhere (or with --polling).
+Only persistent indexes are useful, i.e. config file 'catalog' and the fts engine
+index_location (first args entry) need to be pathnames rather than ":memory:".
+Use Control-C to stop.
+"""
+
+import logging
+from optparse import OptionParser
+import os
+import sys
+import time
+
+import puren_tonbo
+from puren_tonbo import watcher
+
+
+log = logging.getLogger(__name__)
+logging.basicConfig()
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+
+    usage = "usage: %prog [options]"
+    parser = OptionParser(usage=usage, version="%%prog %s" % puren_tonbo.__version__)
+    parser.add_option("--note-root", help="Directory of notes override")
+    parser.add_option("-c", "--codec", help="Override config file encoding (can be a list TODO format comma?)")
+    parser.add_option("--config-file", "--config_file", help="Override config file")
+    parser.add_option("-e", "--search_encrypted", help="Index encrypted files too (password needed)", action="store_true")
+    parser.add_option("-p", "--password", help="password, if omitted but OS env PT_PASSWORD is set use that, if missing prompt")
+    parser.add_option("-P", "--password_file", help="file name where password is to be read from, trailing blanks are ignored")
+    parser.add_option("--no-fts", help="Do not maintain full text search index", action="store_false", dest="fts", default=True)
+    parser.add_option("--no-catalog", help="Do not maintain note metadata catalog", action="store_false", dest="catalog", default=True)
+    parser.add_option("--polling", help="Poll for changes rather than use inotify", action="store_true")
+    parser.add_option("--poll-interval", help="Seconds between polls, default 2", type="float", default=2.0)
+    parser.add_option("-v", "--verbose", action="store_true")
+
+    (options, args) = parser.parse_args(argv[1:])
+    verbose = options.verbose
+
+    config = puren_tonbo.get_config(options.config_file)
+
+    if options.codec:
+        note_encoding = options.codec
+    else:
+        note_encoding = config['codec']
+
+    if options.note_root:
+        note_root = options.note_root
+    else:
+        note_root = config.get('note_root', '.')
+    if isinstance(note_root, (list, tuple)):
+        note_root = note_root[0]  # TODO handle multiple directories (like ptig/ptgrep)
+    ignore_folders = config['ignore_folders']
+
+    catalog_location = None
+    if options.catalog:
+        catalog_location = config.get('catalog')
+        if not catalog_location or catalog_location == puren_tonbo.IN_MEMORY:
+            log.warning('no (persistent) catalog configured, catalog not maintained')
+            catalog_location = None
+        else:
+            catalog_location = os.path.expanduser(catalog_location)
+
+    fts_options = None
+    if options.fts:
+        fts_options = config['fts']
+        engine = fts_options['engine']
+        engine_args = fts_options.get(engine, {}).get('args', [])
+        if not engine_args or engine_args[0] == puren_tonbo.IN_MEMORY:
+            log.warning('fts index for engine %s is in memory, fts index not maintained', engine)
+            fts_options = None
+
+    if not catalog_location and not fts_options:
+        print('Nothing to do, need a persistent catalog and/or fts index')
+        return 1
+
+    password = None
+    if options.search_encrypted:
+        if options.password_file:
+            f = open(options.password_file, 'rb')
+            password_file = f.read()
+            f.close()
+            password_file = password_file.strip()
+        else:
+            password_file = None
+        password = options.password or password_file or os.environ.get('PT_PASSWORD') or puren_tonbo.keyring_get_password()
+        if password is None:
+            # prompt once, up front. Nobody is around to answer prompts later
+            password = puren_tonbo.ui.getpassfunc("Puren Tonbo ptwatch Password:", for_decrypt=True)
+        if password and not isinstance(password, bytes):
+            password = password.encode('us-ascii')
+
+    notes = puren_tonbo.FileSystemNotes(note_root, note_encoding, fts_options=fts_options, catalog_location=catalog_location, ignore_folders=ignore_folders)
+    note_watcher = watcher.get_watcher(notes.note_root, ignore_folders=ignore_folders, use_polling=options.polling, poll_interval=options.poll_interval)
+    print('Watching %s (%s)' % (notes.note_root, note_watcher.__class__.__name__))
+
+    def full_refresh():
+        if notes.catalog:
+            notes.catalog.refresh(full=True)
+        if fts_options:
+            try:
+                notes.fts_index(get_password_callback=password, verbose=verbose)
+            except (puren_tonbo.PurenTonboException, IOError, OSError) as error_info:
+                # e.g. bad password or a half written note, keep watching - fixed on next change
+                log.error('FTS index failed - reason %r', error_info)
+
+    # initial catch-up, changes made while not running
+    start_time = time.time()
+    full_refresh()
+    print('Initial index: %.2f seconds' % (time.time() - start_time))
+
+    try:
+        while True:
+            changed = note_watcher.changes()
+            if verbose:
+                for filename in sorted(changed):
+                    print('changed: %s' % filename)
+            start_time = time.time()
+            if notes.note_root in changed:
+                # unknown changes (e.g. events lost), full refresh
+                full_refresh()
+            else:
+                if notes.catalog:
+                    notes.catalog.invalidate(changed)
+                    notes.catalog.refresh()
+                if fts_options:
+                    notes.fts_update(changed, get_password_callback=password, verbose=verbose)
+            if verbose:
+                print('Updated %d changes in %.2f seconds' % (len(changed), time.time() - start_time))
+    except KeyboardInterrupt:
+        print('Stopping')
+    finally:
+        note_watcher.close()
+        if notes.catalog:
+            notes.catalog.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
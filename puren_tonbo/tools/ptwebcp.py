@@ -109,7 +109,10 @@ class Root(object):
         note_root = note_root[0]  # TODO actually handle multiple directories (like ptig/ptgrep)
         self.config['note_root'] = note_root
 
-        self.notes = puren_tonbo.FileSystemNotes(note_root, note_encoding)
+        catalog_location = config.get('catalog')
+        if catalog_location and catalog_location != puren_tonbo.IN_MEMORY:
+            catalog_location = os.path.expanduser(catalog_location)
+        self.notes = puren_tonbo.FileSystemNotes(note_root, note_encoding, catalog_location=catalog_location, ignore_folders=config.get('ignore_folders'))
 
     # TODO index/default for browsing with a REST style URL
     # /note/filename.txt - GET
@@ -138,7 +141,7 @@ class Root(object):
         return data
     view.exposed = True
 
-    # TODO file metadata; size, date
+    # TODO file metadata; date
     # TODO navigation links (parent directory, root directory)
     # TODO recent (recursive)
     def list(self, s=None, recursive=True):
@@ -199,11 +202,15 @@ class Root(object):
 
             <a href="view?edit=true&note=%s">Edit</a>
             """
-            tmp_html = """%s
+            try:
+                note_size = '%d bytes' % self.notes.note_size(filename)  # header only, no decryption
+            except puren_tonbo.PurenTonboException:
+                note_size = 'unknown size'
+            tmp_html = """%s (%s)
             <a href="view?note=%s">Raw Text</a>
             <a href="view?note=%s&markdown=true">Markdown</a>
             </br>
-            """ % (escapecgi(disp_filename), filename, filename,)
+            """ % (escapecgi(disp_filename), note_size, filename, filename,)
             #""" % (escapecgi(disp_filename), filename, filename, filename, filename, )
             result.append(tmp_html)
         cherrypy.response.headers['Content-Type'] = 'text/html'
@@ -35,12 +35,15 @@ This tool can decrypt files saved by vim, without using vim.
 
 """
 from __future__ import division, print_function
+import array
 import sys
 import struct
 import zlib
 import codecs
+from collections import OrderedDict
 import time
 import getpass
+import threading
 from binascii import b2a_hex, a2b_hex
 try:
     import hashlib
@@ -149,16 +152,41 @@ def SaveAsZip(zipname, filename, filedata):
         fh.write(eoz)
 
 
+# array typecode for 32 bit unsigned int, used to byteswap a whole buffer at once
+DWORD_TYPECODE = None
+for DWORD_TYPECODE in ('I', 'L'):
+    if array.array(DWORD_TYPECODE).itemsize == 4:
+        break
+    DWORD_TYPECODE = None
+
+
 def wordswap(data):
     """ Swap byte order in each DWORD """
-    fmt = '%dL' % ((len(data)+3)/4)
     pad = len(data) % 4
     if pad:
         pad = 4-pad
-        data += b"\x00" * pad
+        data = bytes(data) + b"\x00" * pad
+    if DWORD_TYPECODE:
+        words = array.array(DWORD_TYPECODE, bytes(data))
+        words.byteswap()
+        if sys.version_info >= (3,):
+            return words.tobytes()
+        return words.tostring()
+    fmt = '%dL' % ((len(data)+3)//4)
     return struct.pack('<'+fmt, *struct.unpack('>'+fmt, data))
 
 
+if hasattr(int, 'from_bytes'):
+    def xor_bytes(data, keystream):
+        """ XOR data with (at least as long) keystream, as one big integer operation """
+        keystream = keystream[:len(data)]
+        return bytearray((int.from_bytes(data, 'big') ^ int.from_bytes(keystream, 'big')).to_bytes(len(data), 'big'))
+else:
+    def xor_bytes(data, keystream):
+        """ XOR data with (at least as long) keystream """
+        return bytearray(a ^ b for a, b in zip(bytearray(data), bytearray(keystream)))
+
+
 def sha256(data, salt):
     """ Return sha256 digest of data + salt """
     h = sha256checksum()
@@ -169,10 +197,43 @@ def sha256(data, salt):
 
 def hashpw(password, salt):
     """ Convert password to cipher key """
-    key = sha256(password, salt)
+    # rounds hash the lowercase hex of the previous digest, hexdigest() produces that directly
+    key_hex = sha256checksum(password + salt).hexdigest()
     for _ in range(1000):
-        key = sha256(b2a_hex(key), salt)
-    return key
+        key_hex = sha256checksum(key_hex.encode('ascii') + salt).hexdigest()
+    return a2b_hex(key_hex)
+
+
+HASHPW_CACHE_SIZE = 32  # maximum number of (password, salt) stretched keys kept by cached_hashpw()
+hashpw_cache = OrderedDict()  # digest of (password, salt) -> stretched key
+hashpw_cache_lock = threading.Lock()  # used from concurrent searches and pt-agent request threads
+
+
+def cached_hashpw(password, salt):
+    """hashpw() memoised per (password, salt), least recently used entries are wiped once HASHPW_CACHE_SIZE is exceeded
+    Cache is keyed on a digest, the (immutable, can not be wiped) password itself is not kept.
+    """
+    cache_key = sha256checksum(bytes(password) + b'\0' + bytes(salt)).digest()
+    with hashpw_cache_lock:
+        key = hashpw_cache.pop(cache_key, None)
+        if key is not None:
+            hashpw_cache[cache_key] = key  # (re)insert as most recently used
+            return bytes(key)
+    key = bytearray(hashpw(password, salt))  # slow, outside of lock
+    with hashpw_cache_lock:
+        while len(hashpw_cache) >= HASHPW_CACHE_SIZE:
+            _, old_key = hashpw_cache.popitem(last=False)
+            old_key[:] = b'\0' * len(old_key)
+        hashpw_cache[cache_key] = key
+    return bytes(key)
+
+
+def wipe_key_cache():
+    """Zero and forget all stretched keys held by cached_hashpw()"""
+    with hashpw_cache_lock:
+        while hashpw_cache:
+            _, key = hashpw_cache.popitem()
+            key[:] = b'\0' * len(key)
 
 
 class BrokenCFB(object):
@@ -196,13 +257,12 @@ class BrokenCFB(object):
         self.iv = iv
 
     def decrypt(self, data):
-        plain = bytearray()
-        xor = self.cipher.encrypt(self.iv)
-        for o in range(len(data)):
-            if o>=64 and (o%8)==0:
-                xor = self.cipher.encrypt(data[o-64:o-64+8])
-            plain.append( xor[o%8] ^ data[o] )
-        return plain
+        # all feedback is ciphertext, so the whole keystream is built with one ECB call
+        block_count = (len(data) + 7) // 8
+        keystream = bytes(self.cipher.encrypt(self.iv)) * min(block_count, 8)
+        if block_count > 8:
+            keystream += bytes(self.cipher.encrypt(data[:8 * (block_count - 8)]))
+        return xor_bytes(data, keystream)
 
 
 class GoodCFB(object):
@@ -218,20 +278,19 @@ class GoodCFB(object):
         self.iv = iv
 
     def decrypt(self, data):
-        plain = bytearray()
-        xor = None
-        for o in range(len(data)):
-            if (o%8) == 0:
-                xor = self.cipher.encrypt(self.iv)
-                self.iv = data[o:o+8]
-            plain.append( xor[o%8] ^ data[o] )
-        return plain
+        # decryption feedback is the previous ciphertext block, so the whole keystream is built with one ECB call
+        block_count = (len(data) + 7) // 8
+        if not block_count:
+            return bytearray()
+        keystream = self.cipher.encrypt(bytes(self.iv) + bytes(data[:8 * (block_count - 1)]))
+        self.iv = data[8 * (block_count - 1):8 * block_count]
+        return xor_bytes(data, keystream)
 
 
 def makeblowfish(args, key):
     """ Create blowfish cipher """
     ecb = Blowfish.new(key, mode=Blowfish.MODE_ECB)
-    # convert to little endian
+    # convert to little endian, whole buffer (any number of blocks) at a time
     original_encrypt = ecb.encrypt
     ecb.encrypt = lambda data: bytearray(wordswap(original_encrypt(wordswap(data))))
 
@@ -262,7 +321,7 @@ def bf_decrypt(ver, data, pw, args):
         print("seed = ", b2a_hex(iv))
         print("data = ", b2a_hex(data[:16]))
 
-    key = hashpw(pw.encode("utf-8"), salt)  # TODO allow bytes to be passed, if unicode then allow encoding to be passed in (via args?). I.e. support non-utf8 encoded passwords
+    key = cached_hashpw(pw.encode("utf-8"), salt)  # TODO allow bytes to be passed, if unicode then allow encoding to be passed in (via args?). I.e. support non-utf8 encoded passwords
     if args.verbose:
         print("hashed key =", b2a_hex(key))
 
@@ -291,6 +350,56 @@ def bf_test(args):
         print("unknown crypt -> ", b2a_hex(crypted))
 
 
+def make_crc_tab(poly):
+    """ Build (reflected) CRC-32 lookup table """
+    def calcentry(v, poly):
+        for _ in range(8):
+            v = (v>>1) ^ (poly if v&1 else 0)
+        return v
+    return [ calcentry(byte, poly) for byte in range(256) ]
+
+
+CRC_TABLE = make_crc_tab(0xedb88320)
+
+# PKZIP traditional encryption keystream byte, indexed by the low 16 bits of key 2
+ZIPCRYPTO_STREAM_TABLE = bytearray(((((k | 2) * ((k | 2) ^ 1)) >> 8) & 0xFF) for k in range(0x10000))
+
+
+def zipcrypto_keys(password):
+    """ PKZIP traditional encryption initial key state, for password bytes (or string of single byte characters) """
+    crctab = CRC_TABLE
+    key0, key1, key2 = 0x12345678, 0x23456789, 0x34567890
+    if isinstance(password, bytes):
+        password = bytearray(password)
+    else:
+        password = [ord(c) for c in password]  # TODO not sure this will work with non-single byte encoded passwords, e.g. utf-8
+    for c in password:
+        key0 = crctab[(key0 ^ c) & 0xff] ^ (key0 >> 8)
+        key1 = ((key1 + (key0 & 0xff)) * 134775813 + 1) & 0xFFFFFFFF
+        key2 = crctab[(key2 ^ (key1 >> 24)) & 0xff] ^ (key2 >> 8)
+    return key0, key1, key2
+
+
+def zipcrypto_decrypt(keys, data):
+    """ PKZIP traditional decryption of data, starting with key state keys.
+    Table driven, key state kept in locals. Returns bytearray.
+    NOTE each keystream byte depends on the previous plaintext byte so there is
+    no block/translate() shortcut, this is as tight as a pure Python loop gets.
+    """
+    crctab = CRC_TABLE
+    stream = ZIPCRYPTO_STREAM_TABLE
+    key0, key1, key2 = keys
+    plain = []
+    append = plain.append
+    for c in bytearray(data):
+        c ^= stream[key2 & 0xFFFF]
+        append(c)
+        key0 = crctab[(key0 ^ c) & 0xff] ^ (key0 >> 8)
+        key1 = ((key1 + (key0 & 0xff)) * 134775813 + 1) & 0xFFFFFFFF
+        key2 = crctab[(key2 ^ (key1 >> 24)) & 0xff] ^ (key2 >> 8)
+    return bytearray(plain)
+
+
 def zip_decrypt(data, pw, args):
     """
     The very weak 'zip' encryption
@@ -298,38 +407,12 @@ def zip_decrypt(data, pw, args):
     This encryption can be cracked using tools like pkcrack.
     Pkcrack does a known plaintext attack, requiring 13 bytes of plaintext.
     """
-    def make_crc_tab(poly):
-        def calcentry(v, poly):
-            for _ in range(8):
-                v = (v>>1) ^ (poly if v&1 else 0)
-            return v
-        return [ calcentry(byte, poly) for byte in range(256) ]
-
-    crctab = make_crc_tab(0xedb88320)
-
-    def crc32(crc, byte):
-        return crctab[(crc^byte)&0xff] ^ (crc>>8)
-
-    def updatekeys(keys, byte):
-        keys[0] = crc32(keys[0], byte)
-        keys[1] = ((keys[1] + (keys[0]&0xFF)) * 134775813 + 1)&0xFFFFFFFF
-        keys[2] = crc32(keys[2], keys[1]>>24)
-
-    keys = [ 0x12345678, 0x23456789, 0x34567890 ]
-    for c in pw:
-        updatekeys(keys, ord(c))  # TODO not sure this will work with non-single byte encoded passwords, e.g. utf-8
+    keys = zipcrypto_keys(pw)
 
     if args.verbose:
-        print("keys: %08x %08x %08x" % tuple(keys))
-
-    plain = bytearray()
-    for b in bytearray(data):
-        xor = (keys[2] | 2)&0xFFFF
-        xor = ((xor * (xor^1))>>8) & 0xFF
-        b = b ^ xor
-        plain.append(b)
-        updatekeys(keys, b)
-    return plain
+        print("keys: %08x %08x %08x" % keys)
+
+    return zipcrypto_decrypt(keys, data)
 
 
 def decryptfile(data, password, args):
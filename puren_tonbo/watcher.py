@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: us-ascii -*-
+# vim:ts=4:sw=4:softtabstop=4:smarttab:expandtab
+"""Watch a directory of notes for changes
+
+Linux inotify via ctypes (no external dependencies), with a polling
+fallback for other platforms (or when inotify is not available, e.g.
+out of watches). Both have the same API:
+
+    watcher = get_watcher(note_root, ignore_folders=['.git'])
+    while True:
+        for filename in watcher.changes(timeout=None):
+            print(filename)  # absolute pathname, file or directory, may no longer exist
+
+If events are lost (inotify queue overflow) note_root itself is reported,
+callers should treat that as "everything may have changed".
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+
+log = logging.getLogger(__name__)
+
+
+# from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len - followed by len bytes of (nul padded) name
+
+SETTLE_TIME = 0.2  # seconds to wait for more events after the first, so a save (write temp, rename, delete backup) is one batch
+
+
+_libc = None
+
+
+def get_libc():
+    global _libc
+    if _libc is None:
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        _libc = ctypes.CDLL(libc_name, use_errno=True)
+    return _libc
+
+
+def inotify_available():
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        libc = get_libc()
+        return hasattr(libc, 'inotify_init1') and hasattr(libc, 'inotify_add_watch')
+    except OSError:
+        return False
+
+
+def walk_directories(note_root, ignore_folders):
+    """Iterator of note_root and all directories under it, skipping ignore_folders"""
+    for dirpath, dirnames, filenames in os.walk(note_root):
+        dirnames[:] = [dirname for dirname in dirnames if dirname not in ignore_folders]
+        yield dirpath
+
+
+class InotifyWatcher(object):
+    """Recursive watch of note_root using Linux inotify, via ctypes"""
+
+    def __init__(self, note_root, ignore_folders=None):
+        self.note_root = os.path.abspath(note_root)
+        self.ignore_folders = ignore_folders or ['.git']
+        self.libc = get_libc()
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            error_number = ctypes.get_errno()
+            raise OSError(error_number, 'inotify_init1: %s' % os.strerror(error_number))
+        self.watches = {}  # watch descriptor -> directory pathname
+        for dirpath in walk_directories(self.note_root, self.ignore_folders):
+            self.add_watch(dirpath)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def add_watch(self, dirpath):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath) if hasattr(os, 'fsencode') else dirpath, WATCH_MASK)
+        if wd < 0:
+            error_number = ctypes.get_errno()
+            if error_number in (errno.ENOENT, errno.ENOTDIR):
+                return  # removed before we got to it
+            raise OSError(error_number, 'inotify_add_watch %s: %s' % (dirpath, os.strerror(error_number)))
+        self.watches[wd] = dirpath
+
+    def read_events(self):
+        """Returns set of changed pathnames from (available) events"""
+        changed = set()
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, name_length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + name_length].rstrip(b'\0')
+            offset += name_length
+            if mask & IN_Q_OVERFLOW:
+                log.warning('inotify queue overflow, events lost')
+                changed.add(self.note_root)
+                continue
+            dirpath = self.watches.get(wd)
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)  # watched directory removed
+                continue
+            if dirpath is None:
+                continue
+            if not name:
+                changed.add(dirpath)  # event on the watched directory itself, e.g. IN_DELETE_SELF
+                continue
+            name = os.fsdecode(name) if hasattr(os, 'fsdecode') else name
+            pathname = os.path.join(dirpath, name)
+            changed.add(pathname)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and name not in self.ignore_folders:
+                # new directory, watch it (and any sub directories). Files may have been created before the watch was added
+                for new_dirpath in walk_directories(pathname, self.ignore_folders):
+                    self.add_watch(new_dirpath)
+                    changed.add(new_dirpath)
+                    for entry in os.listdir(new_dirpath):
+                        changed.add(os.path.join(new_dirpath, entry))
+        return changed
+
+    def changes(self, timeout=None):
+        """Block until changes (or timeout seconds), returns set of changed pathnames (empty on timeout)"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = self.read_events()
+        while True:
+            readable, _, _ = select.select([self.fd], [], [], SETTLE_TIME)
+            if not readable:
+                return changed
+            changed.update(self.read_events())
+
+
+class PollingWatcher(object):
+    """Portable (slow) watcher, periodically walks note_root comparing file mtime and size"""
+
+    def __init__(self, note_root, ignore_folders=None, poll_interval=2.0):
+        self.note_root = os.path.abspath(note_root)
+        self.ignore_folders = ignore_folders or ['.git']
+        self.poll_interval = poll_interval
+        self.snapshot = self.take_snapshot()
+
+    def close(self):
+        pass
+
+    def take_snapshot(self):
+        snapshot = {}
+        for dirpath in walk_directories(self.note_root, self.ignore_folders):
+            snapshot[dirpath] = None
+            try:
+                names = os.listdir(dirpath)
+            except OSError:
+                continue  # removed during walk
+            for name in names:
+                pathname = os.path.join(dirpath, name)
+                try:
+                    stat_info = os.stat(pathname)
+                except OSError:
+                    continue
+                if os.path.isfile(pathname):
+                    snapshot[pathname] = (stat_info.st_mtime, stat_info.st_size)
+        return snapshot
+
+    def changes(self, timeout=None):
+        """Block until changes (or timeout seconds), returns set of changed pathnames (empty on timeout)"""
+        start_time = time.time()
+        while True:
+            snapshot = self.take_snapshot()
+            old_snapshot, self.snapshot = self.snapshot, snapshot
+            changed = set(pathname for pathname in snapshot if old_snapshot.get(pathname, 0) != snapshot[pathname])
+            changed.update(pathname for pathname in old_snapshot if pathname not in snapshot)
+            if changed:
+                return changed
+            if timeout is not None and time.time() - start_time >= timeout:
+                return set()
+            time.sleep(self.poll_interval)
+
+
+def get_watcher(note_root, ignore_folders=None, use_polling=False, poll_interval=2.0):
+    """Returns an InotifyWatcher if possible, else a PollingWatcher"""
+    if not use_polling and inotify_available():
+        try:
+            return InotifyWatcher(note_root, ignore_folders=ignore_folders)
+        except OSError as info:
+            # e.g. ENOSPC fs.inotify.max_user_watches exceeded
+            log.warning('inotify not usable, falling back to polling: %r', info)
+    return PollingWatcher(note_root, ignore_folders=ignore_folders, poll_interval=poll_interval)
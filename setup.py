@@ -127,6 +127,8 @@ setup(
     #py_modules=[''], # TODO scripts
     entry_points={
         'console_scripts': [
+            'ptagent = puren_tonbo.tools.ptagent:main',
+            'ptagent_client = puren_tonbo.agent_client:main',
             'ptcat = puren_tonbo.tools.ptcat:main',
             'ptcipher = puren_tonbo.tools.ptcipher:main',
             'ptconfig = puren_tonbo.tools.ptconfig:main',
@@ -134,6 +136,8 @@ setup(
             'ptgrep = puren_tonbo.tools.ptgrep:main',
             'ptnewline_check = puren_tonbo.tools.ptnewline_check:main',
             'ptrecrypt = puren_tonbo.tools.ptrecrypt:main',
+            'ptverify = puren_tonbo.tools.ptverify:main',
+            'ptwatch = puren_tonbo.tools.ptwatch:main',
             'ptig = puren_tonbo.tools.ptig:main',
             'pttkview = puren_tonbo.tools.pttkview:main',  # Assume tk available
             #'ptwebcp = puren_tonbo.tools.ptwebcp:main',  # Assume CherryPy (or dietcherrypy) and Markdown